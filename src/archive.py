@@ -0,0 +1,344 @@
+"""Packed archive storage mode for cloud copies.
+
+Instead of mirroring thousands of files into the Drive folder, a project can
+be stored as one compressed archive (zip, or tar + zstd when the optional
+``zstandard`` package is installed). A small JSON index under
+``_omni_sync/archives`` plus the usual ``_omni_sync/projects/<name>/omni.json``
+let the registry and manifest readers see the project without unpacking.
+"""
+import datetime
+import json
+import os
+import shutil
+import struct
+import tarfile
+import time
+import zipfile
+from typing import Callable, Dict, List, Optional
+
+from transfer import CLOUD_META_DIRNAME, IgnoreRules, record_excluded, walk_filtered
+
+ARCHIVES_DIRNAME = "archives"
+PROJECTS_DIRNAME = "projects"
+STORAGE_FOLDER = "folder"
+STORAGE_ARCHIVE = "archive"
+STORAGE_BLOBS = "blobs"
+FORMAT_ZIP = "zip"
+FORMAT_TAR_ZST = "tar.zst"
+ARCHIVE_EXTENSIONS = {FORMAT_ZIP: ".omni.zip", FORMAT_TAR_ZST: ".omni.tar.zst"}
+STREAM_CHUNK = 1024 * 1024
+# Zip's own timestamps have 2-second resolution; the NTFS extra field keeps
+# exact mtimes (as 100 ns FILETIME ticks) so unpacked files still match the
+# size/mtime delta checks.
+_NTFS_EXTRA_TAG = 0x000A
+_NTFS_TIMES_TAG = 0x0001
+_FILETIME_EPOCH = 116444736000000000
+
+
+def _load_manifest(project_path: str) -> dict:
+    manifest = os.path.join(project_path, "omni.json")
+    if not os.path.exists(manifest):
+        return {}
+    try:
+        with open(manifest, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def storage_mode(project_path: str) -> str:
+    """Per-project "storage" in omni.json, falling back to CLOUD_STORAGE_MODE.
+
+    One of folder, archive or blobs (see blobstore).
+    """
+    mode = _load_manifest(project_path).get("storage") or os.getenv("CLOUD_STORAGE_MODE", STORAGE_FOLDER)
+    mode = str(mode).strip().lower()
+    return mode if mode in (STORAGE_ARCHIVE, STORAGE_BLOBS) else STORAGE_FOLDER
+
+
+def _zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def archive_format(project_path: str) -> str:
+    fmt = _load_manifest(project_path).get("archive_format") or os.getenv("ARCHIVE_FORMAT", FORMAT_ZIP)
+    fmt = str(fmt).strip().lower()
+    if fmt == FORMAT_TAR_ZST and _zstd_available():
+        return FORMAT_TAR_ZST
+    return FORMAT_ZIP
+
+
+def archive_index_path(drive_root: str, name: str) -> str:
+    return os.path.join(drive_root, CLOUD_META_DIRNAME, ARCHIVES_DIRNAME, f"{name}.json")
+
+
+def cloud_manifest_path(drive_root: str, name: str) -> str:
+    """Cloud-side omni.json for projects without a folder copy."""
+    return os.path.join(drive_root, CLOUD_META_DIRNAME, PROJECTS_DIRNAME, name, "omni.json")
+
+
+def archive_info(drive_root: Optional[str], name: str) -> Optional[dict]:
+    if not drive_root:
+        return None
+    path = archive_index_path(drive_root, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(info, dict) or not info.get("archive"):
+        return None
+    if not os.path.exists(os.path.join(drive_root, info["archive"])):
+        return None
+    return info
+
+
+def list_archived(drive_root: Optional[str]) -> List[str]:
+    if not drive_root:
+        return []
+    folder = os.path.join(drive_root, CLOUD_META_DIRNAME, ARCHIVES_DIRNAME)
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    return [n[:-5] for n in names if n.endswith(".json")]
+
+
+def _write_json(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _iter_files(src: str, rules: Optional[IgnoreRules] = None, excluded: Optional[List[str]] = None):
+    for root, dirs, files in walk_filtered(src, rules, excluded):
+        dirs.sort()
+        rel_root = os.path.relpath(root, src)
+        rel_root = "" if rel_root == "." else rel_root.replace(os.sep, "/")
+        if not files and not dirs and rel_root:
+            yield rel_root + "/", root
+        for fname in sorted(files):
+            rel = f"{rel_root}/{fname}" if rel_root else fname
+            yield rel, os.path.join(root, fname)
+
+
+def _ntfs_extra(st: os.stat_result) -> bytes:
+    ticks = [ns // 100 + _FILETIME_EPOCH for ns in (st.st_mtime_ns, st.st_atime_ns, st.st_ctime_ns)]
+    times = struct.pack("<HHQQQ", _NTFS_TIMES_TAG, 24, *ticks)
+    return struct.pack("<HHI", _NTFS_EXTRA_TAG, 4 + len(times), 0) + times
+
+
+def _zip_mtime_ns(member: zipfile.ZipInfo) -> int:
+    """Exact mtime from the NTFS extra field, else the 2-second DOS timestamp."""
+    extra = member.extra
+    while len(extra) >= 4:
+        tag, size = struct.unpack_from("<HH", extra)
+        body = extra[4:4 + size]
+        extra = extra[4 + size:]
+        if tag != _NTFS_EXTRA_TAG:
+            continue
+        body = body[4:]
+        while len(body) >= 4:
+            attr, attr_size = struct.unpack_from("<HH", body)
+            if attr == _NTFS_TIMES_TAG and attr_size >= 24 and len(body) >= 12:
+                ticks = struct.unpack_from("<Q", body, 4)[0]
+                return (ticks - _FILETIME_EPOCH) * 100
+            body = body[4 + attr_size:]
+    return int(time.mktime(member.date_time + (0, 0, -1)) * 1_000_000_000)
+
+
+def _pack_zip(src: str, out_path: str, rules: Optional[IgnoreRules], excluded: List[str]) -> Dict[str, int]:
+    files = 0
+    total = 0
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1, allowZip64=True) as zf:
+        for rel, path in _iter_files(src, rules, excluded):
+            if rel.endswith("/"):
+                zf.writestr(zipfile.ZipInfo(rel), b"")
+                continue
+            # write streams the file at the archive's compresslevel and records
+            # its mode; the exact mtime goes in the central directory entry,
+            # which is the copy readers consult.
+            zf.write(path, rel)
+            info = zf.getinfo(rel)
+            info.extra = _ntfs_extra(os.stat(path))
+            files += 1
+            total += info.file_size
+    return {"files": files, "bytes": total}
+
+
+def _pack_tar_zst(src: str, out_path: str, rules: Optional[IgnoreRules], excluded: List[str]) -> Dict[str, int]:
+    import zstandard
+    files = 0
+    total = 0
+    with open(out_path, "wb") as raw:
+        cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+        with cctx.stream_writer(raw, closefd=False) as zout:
+            # "w|" streams the tar straight into the compressor, no temp tar.
+            with tarfile.open(fileobj=zout, mode="w|") as tf:
+                for rel, path in _iter_files(src, rules, excluded):
+                    tf.add(path, arcname=rel.rstrip("/"), recursive=False)
+                    if not rel.endswith("/"):
+                        files += 1
+                        total += os.path.getsize(path)
+    return {"files": files, "bytes": total}
+
+
+def pack_project(
+    src: str,
+    drive_root: str,
+    name: str,
+    fmt: Optional[str] = None,
+    log: Optional[Callable[[str], None]] = None,
+    rules: Optional[IgnoreRules] = None,
+) -> dict:
+    """Write src as a single archive in drive_root and publish its index.
+
+    The archive is written under a temporary name and renamed into place, so
+    a crash never leaves a truncated archive that looks valid. Any older
+    folder-mode copy of the project is removed once the archive is in place.
+    Paths matched by ``rules`` are left out and listed as "excluded_paths".
+    """
+    fmt = fmt or archive_format(src)
+    archive_name = name + ARCHIVE_EXTENSIONS[fmt]
+    out_path = os.path.join(drive_root, archive_name)
+    tmp_path = out_path + ".partial"
+    os.makedirs(drive_root, exist_ok=True)
+    started = time.time()
+    excluded: List[str] = []
+    try:
+        if fmt == FORMAT_TAR_ZST:
+            counts = _pack_tar_zst(src, tmp_path, rules, excluded)
+        else:
+            counts = _pack_zip(src, tmp_path, rules, excluded)
+        os.replace(tmp_path, out_path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    manifest = _load_manifest(src)
+    if excluded or "excluded_paths" in manifest:
+        manifest["excluded_paths"] = sorted(set(excluded))
+    info = {
+        "name": name,
+        "format": fmt,
+        "archive": archive_name,
+        "archive_bytes": os.path.getsize(out_path),
+        "files": counts["files"],
+        "bytes": counts["bytes"],
+        "created": datetime.datetime.now().isoformat(),
+        "manifest": manifest,
+    }
+    _write_json(archive_index_path(drive_root, name), info)
+    if manifest:
+        _write_json(cloud_manifest_path(drive_root, name), manifest)
+    for other_fmt, ext in ARCHIVE_EXTENSIONS.items():
+        if other_fmt != fmt:
+            _remove_quietly(os.path.join(drive_root, name + ext))
+    folder_copy = os.path.join(drive_root, name)
+    if os.path.isdir(folder_copy):
+        shutil.rmtree(folder_copy, ignore_errors=True)
+    if log:
+        log(f"Packed {name}: {counts['files']} files, {counts['bytes']} -> {info['archive_bytes']} bytes "
+            f"({fmt}, {time.time() - started:.1f}s)")
+    return info
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def remove_archive(drive_root: str, name: str) -> None:
+    """Drop a stale archive once the project is stored as a folder again."""
+    for ext in ARCHIVE_EXTENSIONS.values():
+        _remove_quietly(os.path.join(drive_root, name + ext))
+    _remove_quietly(archive_index_path(drive_root, name))
+
+
+def _safe_target(dst: str, rel: str) -> Optional[str]:
+    target = os.path.abspath(os.path.join(dst, rel))
+    root = os.path.abspath(dst)
+    if target != root and not target.startswith(root + os.sep):
+        return None
+    return target
+
+
+def _unpack_zip(archive_path: str, dst: str, log: Optional[Callable[[str], None]]) -> int:
+    count = 0
+    with zipfile.ZipFile(archive_path) as zf:
+        for member in zf.infolist():
+            target = _safe_target(dst, member.filename)
+            if target is None:
+                if log:
+                    log(f"Skipping unsafe archive member: {member.filename}")
+                continue
+            if member.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zf.open(member) as fsrc, open(target, "wb") as fdst:
+                shutil.copyfileobj(fsrc, fdst, STREAM_CHUNK)
+            # Permission bits (e.g. gradlew's executable bit) from the packing host.
+            mode = (member.external_attr >> 16) & 0o777
+            if mode:
+                os.chmod(target, mode)
+            mtime_ns = _zip_mtime_ns(member)
+            os.utime(target, ns=(mtime_ns, mtime_ns))
+            count += 1
+    return count
+
+
+def _unpack_tar_zst(archive_path: str, dst: str, log: Optional[Callable[[str], None]]) -> int:
+    import zstandard
+    count = 0
+    with open(archive_path, "rb") as raw:
+        dctx = zstandard.ZstdDecompressor()
+        with dctx.stream_reader(raw) as zin:
+            with tarfile.open(fileobj=zin, mode="r|") as tf:
+                for member in tf:
+                    if _safe_target(dst, member.name) is None or member.issym() or member.islnk():
+                        if log:
+                            log(f"Skipping unsafe archive member: {member.name}")
+                        continue
+                    tf.extract(member, dst, set_attrs=True, filter="data")
+                    if member.isfile():
+                        count += 1
+    return count
+
+
+def unpack_project(
+    drive_root: str,
+    name: str,
+    dst: str,
+    log: Optional[Callable[[str], None]] = None,
+) -> int:
+    """Stream-extract a packed project into dst; returns the file count."""
+    info = archive_info(drive_root, name)
+    if not info:
+        raise FileNotFoundError(f"No archive for {name}")
+    archive_path = os.path.join(drive_root, info["archive"])
+    os.makedirs(dst, exist_ok=True)
+    if info.get("format") == FORMAT_TAR_ZST:
+        count = _unpack_tar_zst(archive_path, dst, log)
+    else:
+        count = _unpack_zip(archive_path, dst, log)
+    excluded = (info.get("manifest") or {}).get("excluded_paths")
+    if excluded:
+        record_excluded(dst, excluded)
+    if log:
+        log(f"Unpacked {name}: {count} files from {info['archive']}")
+    return count
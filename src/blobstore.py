@@ -0,0 +1,381 @@
+"""Content-addressed blob store for cloud copies.
+
+Files are stored once under ``_omni_sync/blobs/<aa>/<sha256>`` and each
+project is described by a manifest in ``_omni_sync/manifests/<name>.json``
+mapping relative paths to blob hashes. Forks that share wrappers, vendored
+code or large assets only upload (and occupy Drive space for) the bytes that
+differ. Activation materializes the tree from blobs, cloning (reflink), kernel-side copying or,
+when BLOB_HARDLINKS=1, hard-linking instead of copying where the filesystem
+allows it.
+
+Uploads, manifest writes and garbage collection run under one lock per
+store (``_omni_sync/blobs.lock``, shared with other processes), so GC never
+deletes a blob that a concurrent store found already present but has not
+referenced from its manifest yet.
+"""
+import datetime
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set
+
+import archive
+import transfer
+from transfer import CLOUD_META_DIRNAME, IgnoreRules, TransferJournal
+
+BLOBS_DIRNAME = "blobs"
+MANIFESTS_DIRNAME = "manifests"
+BLOB_HASH = "sha256"
+STORE_LOCK_FILENAME = "blobs.lock"
+# The holder refreshes the lock file's mtime; one left by a crashed process expires.
+LOCK_HEARTBEAT_SECONDS = 30
+LOCK_STALE_SECONDS = 600
+LOCK_POLL_SECONDS = 0.5
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def _hardlinks_enabled() -> bool:
+    # Off by default: a hard link shares the blob, so an in-place edit of the
+    # local file would change the stored content for every project.
+    return os.getenv("BLOB_HARDLINKS", "0").strip() == "1"
+
+
+def blob_path(drive_root: str, digest: str) -> str:
+    return os.path.join(drive_root, CLOUD_META_DIRNAME, BLOBS_DIRNAME, digest[:2], digest)
+
+
+def manifest_path(drive_root: str, name: str) -> str:
+    return os.path.join(drive_root, CLOUD_META_DIRNAME, MANIFESTS_DIRNAME, f"{name}.json")
+
+
+def manifest_info(drive_root: Optional[str], name: str) -> Optional[dict]:
+    if not drive_root:
+        return None
+    path = manifest_path(drive_root, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        return None
+    return data
+
+
+def list_stored(drive_root: Optional[str]) -> List[str]:
+    if not drive_root:
+        return []
+    folder = os.path.join(drive_root, CLOUD_META_DIRNAME, MANIFESTS_DIRNAME)
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    return [n[:-5] for n in names if n.endswith(".json")]
+
+
+def _lock_is_stale(path: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS
+    except OSError:
+        return False
+
+
+@contextmanager
+def store_lock(drive_root: str):
+    """Hold the store's lock: threads of this process queue on a mutex, other
+    processes (the GUI and the agent) on an exclusively created lock file."""
+    meta = os.path.join(drive_root, CLOUD_META_DIRNAME)
+    path = os.path.join(meta, STORE_LOCK_FILENAME)
+    with _local_locks_guard:
+        local = _local_locks.setdefault(os.path.abspath(path), threading.Lock())
+    with local:
+        os.makedirs(meta, exist_ok=True)
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if _lock_is_stale(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                time.sleep(LOCK_POLL_SECONDS)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "host": socket.gethostname(), "since": time.time()}, f)
+        done = threading.Event()
+
+        def heartbeat() -> None:
+            while not done.wait(LOCK_HEARTBEAT_SECONDS):
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+        beat = threading.Thread(target=heartbeat, name="omni-blob-lock", daemon=True)
+        beat.start()
+        try:
+            yield
+        finally:
+            done.set()
+            beat.join()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _manifest_hashes(data: Optional[dict]) -> Set[str]:
+    if not data:
+        return set()
+    return {entry["hash"] for entry in data.get("files", {}).values() if entry.get("hash")}
+
+
+def _upload_blob(src_path: str, target: str, throttle: Optional[transfer.Throttle] = None) -> None:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Unique temp name: two projects may upload the same new blob concurrently.
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # Hash while uploading: a file edited since it was hashed must not be
+    # published under the old digest.
+    digest = transfer.copy_file(src_path, tmp, algorithm=BLOB_HASH)
+    if digest != os.path.basename(target):
+        os.remove(tmp)
+        raise OSError(f"content changed during upload (expected {os.path.basename(target)}, got {digest})")
+    os.replace(tmp, target)
+    if throttle is not None:
+        throttle.consume(os.path.getsize(target))
+
+
+def store_project(
+    src: str,
+    drive_root: str,
+    name: str,
+    rules: Optional[IgnoreRules] = None,
+    workers: Optional[int] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """Hash src, upload blobs not yet in the store and publish the manifest.
+
+    Hashes from the previous manifest are reused for files whose size and
+    mtime did not change. Raises OSError if any blob fails to upload, so the
+    caller never deletes the local tree on a partial store. Hashing runs
+    unlocked; from the "already stored?" check to GC the store lock is held.
+    """
+    workers = workers or transfer.copy_workers_for(drive_root)
+    excluded: List[str] = []
+    dirs, files = transfer.scan_tree(src, rules, excluded)
+    previous = manifest_info(drive_root, name)
+    old_files = previous.get("files", {}) if previous else {}
+
+    def hash_one(rel: str) -> str:
+        entry = files[rel]
+        old = old_files.get(rel)
+        if old and old.get("hash") and old.get("size") == entry["size"] and old.get("mtime") == entry["mtime"]:
+            return old["hash"]
+        return transfer.file_digest(os.path.join(src, rel.replace("/", os.sep)), BLOB_HASH)
+
+    rels = list(files)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-hash",
+                            initializer=transfer.pool_initializer()) as pool:
+        for rel, digest in zip(rels, pool.map(hash_one, rels)):
+            files[rel]["hash"] = digest
+
+    with store_lock(drive_root):
+        return _publish(src, drive_root, name, dirs, files, excluded, previous, workers, log)
+
+
+def _publish(src: str, drive_root: str, name: str, dirs: List[str], files: Dict[str, dict],
+             excluded: List[str], previous: Optional[dict], workers: int,
+             log: Optional[Callable[[str], None]]) -> dict:
+    # One upload per distinct hash, and only if the store does not have it yet.
+    missing: Dict[str, str] = {}
+    for rel, entry in files.items():
+        digest = entry["hash"]
+        if digest not in missing and not os.path.exists(blob_path(drive_root, digest)):
+            missing[digest] = os.path.join(src, rel.replace("/", os.sep))
+    errors = []
+    uploaded_bytes = 0
+    throttle = transfer.current_throttle()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-blob",
+                            initializer=transfer.pool_initializer()) as pool:
+        futures = {
+            pool.submit(_upload_blob, path, blob_path(drive_root, digest), throttle): path
+            for digest, path in missing.items()
+        }
+        for future, path in futures.items():
+            try:
+                future.result()
+                uploaded_bytes += os.path.getsize(path)
+            except Exception as e:
+                errors.append((path, str(e)))
+                if log:
+                    log(f"Blob upload failed: {path} ({e})")
+    if errors:
+        raise OSError(f"{len(errors)} blob(s) failed to upload, first: {errors[0][0]} ({errors[0][1]})")
+
+    manifest = archive._load_manifest(src)
+    if excluded or "excluded_paths" in manifest:
+        manifest["excluded_paths"] = sorted(set(excluded))
+    data = {
+        "name": name,
+        "created": datetime.datetime.now().isoformat(),
+        "dirs": dirs,
+        "files": files,
+        "bytes": sum(e["size"] for e in files.values()),
+        "uploaded_bytes": uploaded_bytes,
+        "manifest": manifest,
+    }
+    archive._write_json(manifest_path(drive_root, name), data)
+    if manifest:
+        archive._write_json(archive.cloud_manifest_path(drive_root, name), manifest)
+
+    archive.remove_archive(drive_root, name)
+    folder_copy = os.path.join(drive_root, name)
+    if os.path.isdir(folder_copy):
+        shutil.rmtree(folder_copy, ignore_errors=True)
+    _collect_garbage(drive_root, _manifest_hashes(previous) - _manifest_hashes(data))
+    if log:
+        log(f"Stored {name}: {len(files)} files, {len(missing)} new blob(s), "
+            f"{uploaded_bytes} of {data['bytes']} bytes uploaded")
+    return data
+
+
+def collect_garbage(drive_root: str, candidates: Set[str]) -> int:
+    """Delete candidate blobs that no manifest references any more."""
+    if not candidates:
+        return 0
+    with store_lock(drive_root):
+        return _collect_garbage(drive_root, candidates)
+
+
+def _collect_garbage(drive_root: str, candidates: Set[str]) -> int:
+    # Caller holds store_lock.
+    if not candidates:
+        return 0
+    referenced: Set[str] = set()
+    for other in list_stored(drive_root):
+        referenced |= _manifest_hashes(manifest_info(drive_root, other))
+    removed = 0
+    for digest in candidates - referenced:
+        try:
+            os.remove(blob_path(drive_root, digest))
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def remove_manifest(drive_root: str, name: str) -> None:
+    """Drop a project's manifest (it is stored another way now) and its orphaned blobs."""
+    if manifest_info(drive_root, name) is None:
+        return
+    with store_lock(drive_root):
+        data = manifest_info(drive_root, name)
+        if data is None:
+            return
+        try:
+            os.remove(manifest_path(drive_root, name))
+        except OSError:
+            return
+        _collect_garbage(drive_root, _manifest_hashes(data))
+
+
+def _materialize_file(blob: str, target: str, mtime: float) -> None:
+    if os.path.lexists(target):
+        os.remove(target)
+    if _hardlinks_enabled():
+        try:
+            os.link(blob, target)
+            return
+        except OSError:
+            pass
+    transfer.fast_copy_file(blob, target)
+    os.utime(target, (mtime, mtime))
+
+
+def _unchanged(target: str, entry: dict) -> bool:
+    """A file already in place (e.g. a warm-cached tree) with the manifest's size and mtime."""
+    try:
+        st = os.stat(target)
+    except OSError:
+        return False
+    return st.st_size == entry.get("size") and abs(st.st_mtime - entry.get("mtime", 0)) < 1.0
+
+
+def materialize(
+    drive_root: str,
+    name: str,
+    dst: str,
+    journal: Optional[TransferJournal] = None,
+    workers: Optional[int] = None,
+    log: Optional[Callable[[str], None]] = None,
+    on_file: Optional[Callable[[transfer.CopyStats], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> transfer.CopyStats:
+    """Rebuild a stored project in dst from its manifest and the blob store."""
+    data = manifest_info(drive_root, name)
+    if data is None:
+        raise FileNotFoundError(f"No blob manifest for {name}")
+    workers = workers or transfer.copy_workers_for(dst)
+    stats = transfer.CopyStats()
+    stats.cancel = cancel
+    stats.files_total = len(data["files"])
+    stats.bytes_total = sum(e.get("size", 0) for e in data["files"].values())
+    os.makedirs(dst, exist_ok=True)
+    for rel in data.get("dirs", []):
+        os.makedirs(os.path.join(dst, rel.replace("/", os.sep)), exist_ok=True)
+    throttle = transfer.current_throttle()
+    # Bound in-flight work like copy_tree instead of queueing every file at once.
+    slots = threading.BoundedSemaphore(workers * 4)
+
+    def place(rel: str, entry: dict) -> None:
+        target = os.path.join(dst, rel.replace("/", os.sep))
+        try:
+            if stats.cancelled:
+                stats._record(False, error=(target, "cancelled"))
+            elif (journal is not None and journal.is_done(target)) or _unchanged(target, entry):
+                stats._add_bytes(entry.get("size", 0))
+                stats._record(False)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _materialize_file(blob_path(drive_root, entry["hash"]), target, entry.get("mtime", 0))
+                if throttle is not None:
+                    throttle.consume(entry.get("size", 0), cancel)
+                if journal is not None:
+                    journal.mark_done(target)
+                stats._add_bytes(entry.get("size", 0))
+                stats._record(True, entry.get("size", 0))
+        except Exception as e:
+            stats._record(False, error=(target, str(e)))
+            if log:
+                log(f"Materialize failed: {target} ({e})")
+        finally:
+            slots.release()
+        if on_file:
+            try:
+                on_file(stats)
+            except Exception:
+                pass
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-blob",
+                            initializer=transfer.pool_initializer()) as pool:
+        for rel, entry in data["files"].items():
+            slots.acquire()
+            pool.submit(place, rel, entry)
+
+    excluded = (data.get("manifest") or {}).get("excluded_paths")
+    if excluded:
+        transfer.record_excluded(dst, excluded)
+    if log:
+        log(f"Materialized {name}: {stats.files_copied} files from blob store")
+    return stats
@@ -0,0 +1,171 @@
+"""Git-aware transfer stage for folder-mode cloud copies.
+
+A working repository keeps thousands of loose objects under ``.git/objects``
+and the copy engine would push each one through the Drive client. Before
+deactivation the repository can be:
+
+- ``repack``: packed into a single packfile (``git repack -a -d -k``), so the
+  object store shrinks to a handful of files and still syncs as a folder.
+- ``bundle``: serialized into one ``.git/omni-objects.bundle`` covering every
+  ref, reflog entry and the index, with ``.git/objects`` left out of the copy.
+  Activation unbundles it back into ``.git/objects`` and runs ``git fsck``.
+
+Selected per project with "git_transfer" in omni.json or GIT_TRANSFER
+(off, repack, bundle; default off). Needs the optional ``gitpython`` package
+and a git executable; without them the stage is skipped.
+"""
+import json
+import os
+import shutil
+from typing import Callable, List, Optional
+
+from transfer import IgnoreRules
+
+GIT_OFF = "off"
+GIT_REPACK = "repack"
+GIT_BUNDLE = "bundle"
+BUNDLE_FILENAME = "omni-objects.bundle"
+OBJECTS_REL = ".git/objects"
+
+
+def _git_available() -> bool:
+    try:
+        import git  # noqa: F401
+    except ImportError:
+        return False
+    return shutil.which("git") is not None
+
+
+def git_transfer_mode(project_path: str) -> str:
+    mode = None
+    manifest = os.path.join(project_path, "omni.json")
+    if os.path.exists(manifest):
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                mode = data.get("git_transfer")
+        except Exception:
+            pass
+    mode = str(mode or os.getenv("GIT_TRANSFER", GIT_OFF)).strip().lower()
+    return mode if mode in (GIT_REPACK, GIT_BUNDLE) else GIT_OFF
+
+
+def bundle_path(project_path: str) -> str:
+    return os.path.join(project_path, ".git", BUNDLE_FILENAME)
+
+
+def _bundle_supported(git_dir: str) -> bool:
+    # Borrowed or truncated history can't be captured by a self-contained bundle.
+    return not (
+        os.path.exists(os.path.join(git_dir, "objects", "info", "alternates"))
+        or os.path.exists(os.path.join(git_dir, "shallow"))
+    )
+
+
+def repack(project_path: str) -> None:
+    """Pack loose objects (unreachable ones included, nothing is dropped)."""
+    import git
+    cmd = git.Git(project_path)
+    cmd.repack("-a", "-d", "-k", "-q")
+    cmd.prune_packed()
+
+
+def create_bundle(project_path: str) -> str:
+    """Write and verify the bundle; returns its path."""
+    import git
+    cmd = git.Git(project_path)
+    path = bundle_path(project_path)
+    # --reflog/--indexed-objects keep reflogs and staged content valid after restore.
+    cmd.bundle("create", path, "--all", "--reflog", "--indexed-objects")
+    cmd.bundle("verify", "-q", path)
+    return path
+
+
+def prepare(
+    project_path: str,
+    rules: IgnoreRules,
+    log: Optional[Callable[[str], None]] = None,
+) -> IgnoreRules:
+    """Run the configured git stage before a folder copy; returns the rules to copy with.
+
+    Any git failure is logged and leaves the repository to be copied as-is.
+    """
+    mode = git_transfer_mode(project_path)
+    git_dir = os.path.join(project_path, ".git")
+    if mode == GIT_OFF or not os.path.isdir(git_dir):
+        return rules
+    if not _git_available():
+        if log:
+            log("Git transfer skipped: gitpython or git not available")
+        return rules
+    if mode == GIT_BUNDLE and _bundle_supported(git_dir):
+        try:
+            create_bundle(project_path)
+            if log:
+                log(f"Git transfer: bundled {project_path} into {BUNDLE_FILENAME}")
+            return rules.extended([f"/{OBJECTS_REL}/"])
+        except Exception as e:
+            _remove_quietly(bundle_path(project_path))
+            if log:
+                log(f"Git bundle failed, repacking instead: {e}")
+    try:
+        repack(project_path)
+        if log:
+            log(f"Git transfer: repacked {project_path}")
+    except Exception as e:
+        if log:
+            log(f"Git repack failed, copying loose objects: {e}")
+    return rules
+
+
+def user_excluded(excluded: List[str]) -> List[str]:
+    """Excluded paths minus the object store the bundle stands in for."""
+    return [p for p in excluded if p.rstrip("/") != OBJECTS_REL]
+
+
+def restore(project_path: str, log: Optional[Callable[[str], None]] = None) -> bool:
+    """Rebuild .git/objects from a transferred bundle and check the repository.
+
+    Returns False (keeping the bundle for a retry) if unbundling or fsck fails.
+    """
+    path = bundle_path(project_path)
+    if not os.path.exists(path):
+        return True
+    if not _git_available():
+        if log:
+            log(f"Git bundle not restored (gitpython or git not available): {path}")
+        return False
+    import git
+    git_dir = os.path.join(project_path, ".git")
+    pack_dir = os.path.join(git_dir, "objects", "pack")
+    scratch = os.path.join(git_dir, "omni-unbundle.tmp")
+    try:
+        os.makedirs(pack_dir, exist_ok=True)
+        os.makedirs(os.path.join(git_dir, "objects", "info"), exist_ok=True)
+        # The project's refs point at objects that don't exist yet, so git
+        # refuses to work in it; unbundle into a scratch repo and adopt its packs.
+        shutil.rmtree(scratch, ignore_errors=True)
+        git.Git().init("--bare", "-q", scratch)
+        git.Git(scratch).bundle("unbundle", path)
+        scratch_packs = os.path.join(scratch, "objects", "pack")
+        for fname in os.listdir(scratch_packs):
+            os.replace(os.path.join(scratch_packs, fname), os.path.join(pack_dir, fname))
+        git.Git(project_path).fsck("--connectivity-only", "--no-progress")
+    except Exception as e:
+        if log:
+            log(f"Git bundle restore failed for {project_path}: {e}")
+        return False
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    _remove_quietly(path)
+    if log:
+        log(f"Git transfer: restored repository from {BUNDLE_FILENAME}")
+    return True
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,399 @@
+"""Shared transfer job scheduler.
+
+Activate/deactivate work from the GUI and the remote agent is submitted here
+instead of running on ad-hoc threads. Jobs run in priority order (user clicks
+before bulk operations) on a small worker pool, with at most
+JOB_DISK_CONCURRENCY jobs touching the same disk at once so "Deactivate All"
+does not thrash a spinning or network drive. Bulk jobs also run at low CPU
+and I/O priority (JOB_BULK_PRIORITY) under an optional shared bytes/second
+cap (JOB_BULK_MAX_MBPS), so the IDE and builds stay responsive. Queued jobs are persisted and
+re-submitted on the next start; cancellation is cooperative through
+``Job.cancel_event``, which the copy engine checks between files.
+"""
+import datetime
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+import transfer
+
+PRIORITY_USER = 0
+PRIORITY_BULK = 10
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+ACTIVE_STATES = (STATE_QUEUED, STATE_RUNNING)
+
+DEFAULT_JOB_WORKERS = 4
+DEFAULT_DISK_CONCURRENCY = 2
+FINISHED_JOBS_KEPT = 200
+# Set in Job.args for members of run_batch: the caller does the once-per-batch follow-up.
+BATCH_ARG = "batch"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def disk_key(path: Optional[str]) -> Optional[str]:
+    """Identify the physical volume of path: drive letter on Windows, st_dev elsewhere."""
+    if not path:
+        return None
+    drive, _ = os.path.splitdrive(os.path.abspath(path))
+    if drive:
+        return drive.upper()
+    existing = transfer._existing_ancestor(path)
+    if not existing:
+        return None
+    try:
+        return f"dev:{os.stat(existing).st_dev}"
+    except OSError:
+        return None
+
+
+class Job:
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        priority: int = PRIORITY_USER,
+        disks: Iterable[Optional[str]] = (),
+        args: Optional[dict] = None,
+        job_id: Optional[str] = None,
+    ):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.priority = priority
+        self.disks = sorted({d for d in disks if d})
+        self.args = args or {}
+        self.state = STATE_QUEUED
+        self.created = datetime.datetime.now().isoformat()
+        self.started: Optional[str] = None
+        self.finished: Optional[str] = None
+        self.message = ""
+        self.result = None
+        self.progress: dict = {}
+        self._phase_started = time.time()
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+        self._scheduler: Optional["JobScheduler"] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def batched(self) -> bool:
+        return bool(self.args.get(BATCH_ARG))
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"{self.kind} {self.name} cancelled")
+
+    def update(self, **progress) -> None:
+        """Merge progress fields (phase, files_done, ...) and notify listeners."""
+        if "phase" in progress and progress["phase"] != self.progress.get("phase"):
+            self._phase_started = time.time()
+            for key in ("files_done", "files_total", "bytes_done", "bytes_total"):
+                self.progress.pop(key, None)
+        self.progress.update(progress)
+        if self._scheduler is not None:
+            self._scheduler._emit(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _rates(self) -> dict:
+        """Throughput and ETA for the current phase, from bytes when known, else files."""
+        p = self.progress
+        elapsed = time.time() - self._phase_started
+        if self.state != STATE_RUNNING or elapsed <= 0 or "files_done" not in p:
+            return {}
+        rates = {"elapsed_seconds": round(elapsed, 1)}
+        bytes_done = p.get("bytes_done", 0)
+        rates["throughput_bps"] = int(bytes_done / elapsed)
+        if p.get("bytes_total") and bytes_done:
+            rates["eta_seconds"] = round((p["bytes_total"] - bytes_done) * elapsed / bytes_done, 1)
+        elif p.get("files_total") and p.get("files_done"):
+            rates["eta_seconds"] = round((p["files_total"] - p["files_done"]) * elapsed / p["files_done"], 1)
+        return rates
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "priority": self.priority,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "message": self.message,
+            # Moving-average rates reported by the copy engine win over the phase average.
+            "progress": {**self._rates(), **self.progress},
+        }
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        state_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        disk_limit: Optional[int] = None,
+    ):
+        self.state_path = state_path
+        self.max_workers = max(1, max_workers or transfer._int_env("JOB_WORKERS", DEFAULT_JOB_WORKERS))
+        self.disk_limit = max(1, disk_limit or transfer._int_env("JOB_DISK_CONCURRENCY", DEFAULT_DISK_CONCURRENCY))
+        self._handlers: Dict[str, Callable[[Job], object]] = {}
+        self._listeners: List[Callable[[dict], None]] = []
+        self._jobs: Dict[str, Job] = {}
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._disk_busy: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    # --- registration -----------------------------------------------------
+
+    def register(self, kind: str, handler: Callable[[Job], object]) -> None:
+        """Handler runs on a worker thread and returns the job result."""
+        self._handlers[kind] = handler
+
+    def subscribe(self, listener: Callable[[dict], None]) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[dict], None]) -> None:
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            pass
+
+    # --- submission -------------------------------------------------------
+
+    def submit(
+        self,
+        kind: str,
+        name: str,
+        priority: int = PRIORITY_USER,
+        paths: Iterable[Optional[str]] = (),
+        args: Optional[dict] = None,
+    ) -> Job:
+        """Queue a job; an identical queued/running job is returned instead of a duplicate."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        with self._cond:
+            for job in self._jobs.values():
+                if job.kind == kind and job.name == name and job.state in ACTIVE_STATES:
+                    if priority < job.priority and job.state == STATE_QUEUED:
+                        job.priority = priority
+                        self._push(job)
+                    return job
+            job = Job(kind, name, priority, (disk_key(p) for p in paths), args)
+            self._add(job)
+        self._emit(job)
+        return job
+
+    def run_batch(
+        self,
+        operations: Iterable[tuple],
+        priority: int = PRIORITY_BULK,
+        paths: Iterable[Optional[str]] = (),
+    ) -> List[Job]:
+        """Submit (kind, name) operations together and wait for all of them.
+
+        The worker pool and per-disk caps pipeline the transfers; members are
+        flagged ``batched`` so handlers skip per-job follow-up work (such as the
+        Firestore sync) and the caller runs it once at the end.
+        """
+        paths = list(paths)
+        submitted = [self.submit(kind, name, priority, paths, {BATCH_ARG: True}) for kind, name in operations]
+        for job in submitted:
+            job.wait()
+        return submitted
+
+    def _add(self, job: Job) -> None:
+        job._scheduler = self
+        self._jobs[job.id] = job
+        self._push(job)
+        self._persist()
+        self._ensure_workers()
+        self._cond.notify_all()
+
+    def _push(self, job: Job) -> None:
+        # Re-prioritised jobs are pushed again; stale heap entries are skipped on pop.
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job.id, job.priority))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, active_only: bool = False) -> List[Job]:
+        with self._cond:
+            jobs = list(self._jobs.values())
+        if active_only:
+            jobs = [j for j in jobs if j.state in ACTIVE_STATES]
+        return jobs
+
+    def cancel(self, job_id: str) -> bool:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ACTIVE_STATES:
+                return False
+            job.cancel_event.set()
+            if job.state == STATE_QUEUED:
+                self._finish(job, STATE_CANCELLED, "Cancelled before start")
+        self._emit(job)
+        return True
+
+    # --- persistence ------------------------------------------------------
+
+    def _persist(self) -> None:
+        if not self.state_path:
+            return
+        pending = [
+            {"id": j.id, "kind": j.kind, "name": j.name, "priority": j.priority, "disks": j.disks, "args": j.args}
+            for j in self._jobs.values()
+            if j.state in ACTIVE_STATES
+        ]
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp = f"{self.state_path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"jobs": pending}, f, indent=2)
+            os.replace(tmp, self.state_path)
+        except OSError:
+            pass
+
+    def restore(self) -> List[Job]:
+        """Re-queue jobs persisted by a previous run (interrupted ones resume via their journals)."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return []
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                saved = json.load(f).get("jobs", [])
+        except Exception:
+            return []
+        restored = []
+        with self._cond:
+            for item in saved:
+                if item.get("kind") not in self._handlers or item.get("id") in self._jobs:
+                    continue
+                # Nobody waits on a restored batch member, so it does its own follow-up.
+                args = {k: v for k, v in (item.get("args") or {}).items() if k != BATCH_ARG}
+                job = Job(item["kind"], item.get("name", ""), item.get("priority", PRIORITY_BULK),
+                          item.get("disks", []), args, job_id=item.get("id"))
+                self._add(job)
+                restored.append(job)
+        for job in restored:
+            self._emit(job)
+        return restored
+
+    # --- execution --------------------------------------------------------
+
+    def _ensure_workers(self) -> None:
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.max_workers:
+            t = threading.Thread(target=self._worker, name=f"omni-job-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _disks_free(self, job: Job) -> bool:
+        return all(self._disk_busy.get(d, 0) < self.disk_limit for d in job.disks)
+
+    def _next_runnable(self) -> Optional[Job]:
+        deferred = []
+        chosen = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            job = self._jobs.get(entry[2])
+            if job is None or job.state != STATE_QUEUED or entry[3] != job.priority:
+                continue
+            if self._disks_free(job):
+                chosen = job
+                break
+            deferred.append(entry)
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return chosen
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_runnable()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_runnable()
+                job.state = STATE_RUNNING
+                job.started = datetime.datetime.now().isoformat()
+                for d in job.disks:
+                    self._disk_busy[d] = self._disk_busy.get(d, 0) + 1
+            self._emit(job)
+            state, message, result = STATE_DONE, "", None
+            try:
+                result = self._call_handler(job)
+                if isinstance(result, dict) and result.get("status") == "error":
+                    state, message = STATE_FAILED, result.get("message", "")
+                elif isinstance(result, dict):
+                    message = result.get("message", "")
+            except JobCancelled as e:
+                state, message = STATE_CANCELLED, str(e)
+            except Exception as e:
+                state, message = STATE_FAILED, str(e)
+            if job.cancelled and state == STATE_FAILED:
+                state = STATE_CANCELLED
+            with self._cond:
+                for d in job.disks:
+                    self._disk_busy[d] -= 1
+                job.result = result
+                self._finish(job, state, message)
+                self._cond.notify_all()
+            self._emit(job)
+
+    def _call_handler(self, job: Job):
+        handler = self._handlers[job.kind]
+        if job.priority < PRIORITY_BULK:
+            return handler(job)
+        # Bulk work runs on a throwaway thread lowered to background CPU/I/O
+        # priority: niceness can't be raised back without privileges, and the
+        # copy workers and git subprocesses it starts inherit the lower priority.
+        outcome: dict = {}
+
+        def run() -> None:
+            try:
+                with transfer.background_io():
+                    outcome["result"] = handler(job)
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=run, name=f"omni-bulk-{job.id[:8]}", daemon=True)
+        thread.start()
+        thread.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
+
+    def _finish(self, job: Job, state: str, message: str) -> None:
+        job.state = state
+        job.message = message
+        job.finished = datetime.datetime.now().isoformat()
+        self._persist()
+        job._done.set()
+        finished = [j for j in self._jobs.values() if j.state not in ACTIVE_STATES]
+        for old in finished[:-FINISHED_JOBS_KEPT]:
+            self._jobs.pop(old.id, None)
+
+    def _emit(self, job: Job) -> None:
+        snapshot = job.to_dict()
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception:
+                pass
@@ -20,6 +20,15 @@ import traceback
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+import archive
+import blobstore
+import gitpack
+import jobs
+import projectstats
+import statestore
+import transfer
+import warmcache
+
 # --- CONFIG ---
 APP_NAME = "OmniProjectSync"
 VERSION = "4.8.0"
@@ -36,7 +45,11 @@ STARTUP_LOG = os.path.join(BASE_DIR, "omnisync_startup.log")
 
 ENV_PATH = os.path.join(BASE_DIR, "secrets.env")
 CONFIG_DIR = os.path.join(BASE_DIR, "config")
-LOCAL_REGISTRY_PATH = os.path.join(CONFIG_DIR, "project_registry.json")
+TRANSFER_JOURNAL_DIR = os.path.join(CONFIG_DIR, transfer.JOURNAL_DIRNAME)
+GLOBAL_IGNORE_PATH = os.path.join(CONFIG_DIR, "omniignore")
+JOB_STATE_PATH = os.path.join(CONFIG_DIR, "gui_jobs.json")
+# Category moves are written together this long after the last one.
+CATEGORY_FLUSH_MS = 1000
 ASSET_PATH = os.path.join(BASE_DIR, "assets")
 ICON_PATH = os.path.join(ASSET_PATH, "app_icon.png")
 
@@ -86,6 +99,10 @@ def bring_to_front(win, parent=None):
     except Exception:
         pass
 
+def state_store():
+    """The state database shared with the remote agent (imports the legacy JSON files once)."""
+    return statestore.StateStore.open(CONFIG_DIR)
+
 def load_registry(app):
     """Load merged registry without relying on instance attr lookup quirks."""
     try:
@@ -966,7 +983,7 @@ class ProjectCard(ctk.CTkFrame):
 
     def _populate_controls(self):
         # Re-create buttons every time to ensure fresh state/bindings
-        if self.status == "Local":
+        if self.status != "Cloud":
             self._btn("Folder", lambda: os.startfile(os.path.join(os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE), self.name)), color="gray", icon=self.app.icons.get("folder"))
             self._btn("Studio", lambda: self.app.open_studio(self.name), color="#3DDC84", text_color="black", icon=self.app.icons.get("android_studio"))
             self._btn("AntiG", lambda: self.app.open_antigravity(self.name), color="#9333ea", icon=self.app.icons.get("antigravity"))
@@ -1014,6 +1031,12 @@ class ProjectCard(ctk.CTkFrame):
             icon = "⏳"
             col = "gray"
             text = f"{icon} {self.name} (Working...)"
+        elif self.status == "Hydrating":
+            # Usable already; the rest of the files arrive in the background.
+            pct = self.app._hydration_percent(self.name)
+            icon = "📥"
+            col = "#38bdf8"
+            text = f"{icon} {self.name} (Hydrating{f' {pct}%' if pct is not None else '...'})"
         else:
             icon = "☁️" if self.status == "Cloud" else "📂"
             col = "#facc15" if self.status == "Cloud" else "#4ade80"
@@ -1023,6 +1046,21 @@ class ProjectCard(ctk.CTkFrame):
         self.lbl.pack(side="left")
         self.lbl.bind("<Button-1>", self.toggle)
 
+        # Last indexed size; Cloud projects keep the figure from when they were local.
+        if hasattr(self, 'size_lbl'):
+            self.size_lbl.destroy()
+        stats = self.app.project_stats.get(self.name)
+        if stats:
+            self.size_lbl = ctk.CTkLabel(self.header, text=transfer.format_size(stats["bytes"]),
+                                         font=("", 11), text_color="gray")
+            self.size_lbl.pack(side="right")
+            self.size_lbl.bind("<Button-1>", self.toggle)
+            largest = ", ".join(f"{d['path']} {transfer.format_size(d['bytes'])}" for d in stats["largest"][:3])
+            modified = datetime.datetime.fromtimestamp(stats["modified"]).strftime("%Y-%m-%d %H:%M") \
+                if stats["modified"] else "-"
+            ToolTip(self.size_lbl, f"{stats['files']:,} files, last modified {modified}"
+                                   + (f"\nLargest: {largest}" if largest else ""))
+
 class ProjectManagerApp(ctk.CTk):
     def _load_icons(self):
         self.icons = {}
@@ -1095,8 +1133,10 @@ class ProjectManagerApp(ctk.CTk):
                 for name, status in registry.items():
                     if name.lower() in HIDDEN_PROJECTS: continue
                     
-                    project_path = os.path.join(root, name) if status == "Local" else os.path.join(drive_root or "", name)
+                    project_path = os.path.join(root, name) if status != "Cloud" else os.path.join(drive_root or "", name)
                     manifest_path = os.path.join(project_path, "omni.json")
+                    if status == "Cloud" and drive_root and not os.path.exists(manifest_path):
+                        manifest_path = archive.cloud_manifest_path(drive_root, name)
                     
                     project_data = {
                         "name": name,
@@ -1268,6 +1308,16 @@ class ProjectManagerApp(ctk.CTk):
         self._cloud_meta_error_logged = False
         self._portable_cleanup_scheduled = False
         self.queue = queue.Queue()
+        self.scheduler = jobs.JobScheduler(state_path=JOB_STATE_PATH)
+        self.scheduler.register("activate", self._activate_job)
+        self.scheduler.register("deactivate", self._deactivate_job)
+        self.scheduler.register(transfer.HYDRATE_OP, self._hydrate_job)
+        self.scheduler.subscribe(self._on_job_event)
+        self.scheduler.subscribe(lambda event: state_store().record_job(event, "gui"))
+        self.category_index = statestore.CategoryIndex(state_store())
+        self._category_flush_id = None
+        self.project_stats = {}
+        self.stats_indexer = None
         self.agent_process = None
         self.login_window = None
         if not getattr(sys, "frozen", False):
@@ -1358,6 +1408,24 @@ class ProjectManagerApp(ctk.CTk):
         if not os.path.exists(CONFIG_DIR): os.makedirs(CONFIG_DIR)
         self._init_firebase()
         self.reload_config()
+        # Re-queue transfers that were pending when the app last closed.
+        for job in self.scheduler.restore():
+            self.log(f"↩️ Resuming queued {job.kind} of {job.name}")
+        workspace = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
+        # Profile activations whose background hydration never finished.
+        for name, op in transfer.pending_journals(TRANSFER_JOURNAL_DIR).items():
+            if op == transfer.HYDRATE_OP:
+                self.scheduler.submit(op, name, priority=jobs.PRIORITY_BULK, paths=[workspace, self._drive_root()])
+        # Finish deleting projects tombstoned before the last shutdown.
+        transfer.resume_tombstones([workspace, warmcache.cache_dir(workspace)], log=self._background_log)
+        # Sizes for the project cards, indexed at low priority.
+        self.stats_indexer = projectstats.StatsIndexer(
+            state_store(), workspace,
+            local_projects=lambda: [n for n, s in self._load_local_reg().items() if s != "Cloud"],
+            on_update=lambda names: self.after(0, self._refresh_projects),
+            log=self._background_log,
+        )
+        self.stats_indexer.start()
 
     def _init_compact_ui(self):
         # 1. Header
@@ -1396,49 +1464,32 @@ class ProjectManagerApp(ctk.CTk):
         self.progress_bar.pack(fill="x", pady=(5,0))
 
     def _load_categories(self):
-        path = os.path.join(CONFIG_DIR, "categories.json")
-        if os.path.exists(path):
-            try:
-                with open(path, "r") as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-
-    def _save_categories(self, data):
-        path = os.path.join(CONFIG_DIR, "categories.json")
+        # Data structure: {"CategoryName": ["proj1", "proj2"], ...}
+        # Reloaded from the store only if the agent changed it since.
         try:
-            with open(path, "w") as f:
-                json.dump(data, f, indent=4)
-        except:
+            self.category_index.refresh()
+        except Exception:
             pass
+        return self.category_index.categories()
 
     def _get_project_category(self, project_name):
-        cats = self._load_categories()
-        # Data structure: {"CategoryName": ["proj1", "proj2"], ...}
-        for cat, projects in cats.items():
-            if project_name in projects:
-                return cat
-        return "Uncategorized"
+        # Memory only: callers refresh once via _load_categories.
+        return self.category_index.category_of(project_name) or "Uncategorized"
 
     def _set_project_category(self, project_name, new_category):
-        cats = self._load_categories()
-        # Remove from old
-        for cat in cats:
-            if project_name in cats[cat]:
-                cats[cat].remove(project_name)
-        
-        # Add to new
-        if new_category not in cats:
-            cats[new_category] = []
-        if project_name not in cats[new_category]:
-            cats[new_category].append(project_name)
-        
-        # Cleanup empty
-        clean_cats = {k: v for k, v in cats.items() if v or k == new_category}
-        self._save_categories(clean_cats)
+        self.category_index.move(project_name, new_category)
+        # Several quick moves reach the database in one transaction.
+        if self._category_flush_id is None:
+            self._category_flush_id = self.after(CATEGORY_FLUSH_MS, self._flush_categories)
         self._refresh_projects()
 
+    def _flush_categories(self):
+        self._category_flush_id = None
+        try:
+            self.category_index.flush()
+        except Exception as e:
+            self.log(f"⚠️ Failed to save categories: {e}", "red")
+
 
     def show_menu(self):
         menu_items = [
@@ -1462,7 +1513,7 @@ class ProjectManagerApp(ctk.CTk):
             try:
                 with os.scandir(path) as it:
                     for entry in it:
-                        if entry.is_dir():
+                        if entry.is_dir() and entry.name not in (transfer.TRASH_DIRNAME, warmcache.CACHE_DIRNAME):
                             folders.add(entry.name)
             except Exception:
                 pass
@@ -1475,6 +1526,8 @@ class ProjectManagerApp(ctk.CTk):
         # Scan folders to keep registry fresh without touching UI.
         local_folders = self._scan_folders(root)
         cloud_folders = self._scan_folders(drive_root)
+        cloud_folders.update(archive.list_archived(drive_root))
+        cloud_folders.update(blobstore.list_stored(drive_root))
 
         registry = {}
         registry.update(self._load_cloud_reg())
@@ -1503,7 +1556,7 @@ class ProjectManagerApp(ctk.CTk):
     def _project_path_for_status(self, name, status):
         root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
         drive_root = self._drive_root()
-        if status == "Local":
+        if status != "Cloud":
             return os.path.join(root, name)
         if not drive_root:
             return None
@@ -1525,11 +1578,10 @@ class ProjectManagerApp(ctk.CTk):
 
     def _load_project_manifest(self, manifest_path):
         data = {"external_paths": [], "software": [], "app_state_paths": []}
-        if manifest_path and os.path.exists(manifest_path):
+        if manifest_path:
             try:
-                with open(manifest_path, "r", encoding="utf-8") as f:
-                    loaded = json.load(f)
-                if isinstance(loaded, dict):
+                loaded = state_store().manifest(manifest_path)
+                if loaded:
                     data.update(loaded)
             except Exception:
                 pass
@@ -1548,6 +1600,7 @@ class ProjectManagerApp(ctk.CTk):
             os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
             with open(manifest_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=4)
+            state_store().put_manifest(manifest_path, data)
             return True
         except Exception as e:
             self.log(f"⚠️ Failed to save manifest: {e}", "red")
@@ -1590,11 +1643,11 @@ class ProjectManagerApp(ctk.CTk):
         return True
 
     def _is_app_used_by_any_projects(self, app_id):
-        for proj in self._get_projects_snapshot():
-            manifest_path = proj.get("manifest_path")
-            if self._project_has_software(manifest_path, app_id):
-                return True
-        return False
+        paths = {p.get("manifest_path") for p in self._get_projects_snapshot() if p.get("manifest_path")}
+        store = state_store()
+        for path in paths:
+            store.manifest(path)  # re-index files edited since they were last read
+        return bool(store.manifest_paths_using(app_id) & paths)
 
     def _uninstall_app_if_unused(self, app_id):
         if self._is_app_used_by_any_projects(app_id):
@@ -1654,10 +1707,13 @@ class ProjectManagerApp(ctk.CTk):
             pass
 
     def _load_local_reg(self):
-        return self._load_json(LOCAL_REGISTRY_PATH)
+        return state_store().statuses()
 
     def _save_local_reg(self, data):
-        self._save_json(LOCAL_REGISTRY_PATH, data)
+        try:
+            state_store().save_statuses(data)
+        except Exception as e:
+            self.log(f"⚠️ Failed to save registry: {e}", "red")
 
     def _load_cloud_reg(self):
         return self._load_json(self._cloud_registry_path())
@@ -1836,12 +1892,20 @@ class ProjectManagerApp(ctk.CTk):
         local_names = [n for n, s in reg.items() if s == "Local"]
         if not local_names:
             self.log("ℹ️ No local projects to deactivate.")
-        for name in local_names:
-            local_path = os.path.join(root, name)
-            dest_path = os.path.join(drive_root, name)
-            if os.path.exists(local_path):
-                self.log(f"☁️ Deactivating {name}...")
-                self._robust_move_to_backup(local_path, dest_path, name)
+        # One batch, like the agent's /api/projects/batch: bulk jobs queue behind
+        # user clicks, the scheduler caps per-disk concurrency, and Firestore is
+        # synced once at the end instead of after every project.
+        names = [n for n in local_names if os.path.exists(os.path.join(root, n))]
+        for name in names:
+            self._set_card_busy(name)
+        finished = self.scheduler.run_batch(
+            [("deactivate", name) for name in names], priority=jobs.PRIORITY_BULK, paths=[root, drive_root],
+        )
+        failed = [job.name for job in finished if job.state != jobs.STATE_DONE]
+        if failed:
+            self.log(f"⚠️ {len(failed)} project(s) not deactivated: {', '.join(failed)}", "orange")
+        if len(failed) < len(finished):
+            self.sync_to_firestore()
 
         if cleanup and self._is_portable_mode():
             self.log("🧹 Scheduling self-cleanup...")
@@ -1855,6 +1919,10 @@ class ProjectManagerApp(ctk.CTk):
     def _refresh_projects(self):
         for w in self.project_list.winfo_children(): w.destroy()
         self.category_frames = {}
+        try:
+            self.project_stats = state_store().project_stats()
+        except Exception:
+            self.project_stats = {}
 
         root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
         if not os.path.exists(root): os.makedirs(root)
@@ -1866,16 +1934,20 @@ class ProjectManagerApp(ctk.CTk):
         # 1. Scan Local
         local_folders = self._scan_folders(root)
 
-        # 2. Scan Cloud (Drive)
+        # 2. Scan Cloud (Drive), including packed projects
         cloud_folders = self._scan_folders(drive_root)
+        cloud_folders.update(archive.list_archived(drive_root))
+        cloud_folders.update(blobstore.list_stored(drive_root))
 
         # 3. Build Registry
         registry = {}
         registry.update(self._load_cloud_reg())
         registry.update(self._load_local_reg())
-        for f in local_folders: registry[f] = "Local"
+        pending = transfer.pending_journals(TRANSFER_JOURNAL_DIR)
+        pending_status = {"activate": "Cloud", transfer.HYDRATE_OP: "Hydrating"}
+        for f in local_folders: registry[f] = pending_status.get(pending.get(f), "Local")
         for f in cloud_folders:
-            if registry.get(f) != "Local": registry[f] = "Cloud"
+            if f not in local_folders: registry[f] = "Cloud"
 
         self._save_reg(registry)
 
@@ -1922,11 +1994,12 @@ class ProjectManagerApp(ctk.CTk):
         self.sync_to_firestore()
 
     def _show_category_menu(self, event, project_name):
+        categories = self._load_categories()
         menu_items = []
         current_cat = self._get_project_category(project_name)
         
         # Existing categories
-        cats = sorted(list(self._load_categories().keys()))
+        cats = sorted(list(categories.keys()))
         if "Uncategorized" not in cats: cats.append("Uncategorized")
         
         for cat in cats:
@@ -1944,64 +2017,154 @@ class ProjectManagerApp(ctk.CTk):
             self._set_project_category(project_name, new_cat.strip())
 
 
-    def deactivate_project(self, name):
+    # --- TRANSFER JOBS ---
+    def _set_card_busy(self, name):
         card = self.project_cards.get(name)
-        if card and card.busy:
-            self.log(f"⚠️ Operation already in progress for {name}.")
-            return
-
         if card:
             card.set_busy(True)
 
-        def task():
-            try:
-                self.log(f"☁️ Deactivating {name}...")
-                root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
-                local_path = os.path.join(root, name)
-
-                backup_path = self._drive_root()
-                if not backup_path:
-                    self.log("❌ Error: No Drive Path set in settings.", "red")
-                    return
-                try:
-                    os.makedirs(backup_path, exist_ok=True)
-                except Exception as e:
-                    self.log(f"❌ Error: Drive Path unavailable ({e})", "red")
-                    return
+    def _submit_project_job(self, kind, name, priority=jobs.PRIORITY_USER):
+        self._set_card_busy(name)
+        root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
+        return self.scheduler.submit(kind, name, priority=priority, paths=[root, self._drive_root()])
 
-                dest_path = os.path.join(backup_path, name)
-                self._robust_move_to_backup(local_path, dest_path, name)
-            finally:
-                if card:
-                    self.after(0, lambda: card.set_busy(False))
+    def _on_job_event(self, event):
+        # Called from scheduler threads; hop to the Tk thread for UI work.
+        if event["state"] in jobs.ACTIVE_STATES:
+            return
+        if event["state"] == jobs.STATE_DONE and event["kind"] in ("activate", transfer.HYDRATE_OP) \
+                and self.stats_indexer is not None:
+            self.stats_indexer.kick(event["name"])
+        def finish():
+            card = self.project_cards.get(event["name"])
+            if card:
+                card.set_busy(False)
+            if event["state"] == jobs.STATE_CANCELLED:
+                self.log(f"⏹️ {event['kind'].capitalize()} of {event['name']} cancelled.")
+        self.after(0, finish)
+
+    def _confirm_cancel(self, name):
+        active = [j for j in self.scheduler.list_jobs(active_only=True) if j.name == name]
+        if not active:
+            self.log(f"⚠️ Operation already in progress for {name}.")
+            return
+        if messagebox.askyesno("Transfer in progress", f"Cancel the running transfer for {name}?"):
+            for job in active:
+                self.scheduler.cancel(job.id)
 
-        threading.Thread(target=task, daemon=True).start()
+    def deactivate_project(self, name):
+        card = self.project_cards.get(name)
+        if card and card.busy:
+            self._confirm_cancel(name)
+            return
+        self._submit_project_job("deactivate", name)
+
+    def _deactivate_job(self, job):
+        name = job.name
+        if transfer.pending_journals(TRANSFER_JOURNAL_DIR).get(name) == transfer.HYDRATE_OP:
+            # Syncing a partial tree would delete the not-yet-hydrated files from the backup.
+            self.log(f"⚠️ {name} is still hydrating; deactivate it once it is fully local.", "orange")
+            return {"status": "error", "message": "Project is still hydrating"}
+        self.log(f"☁️ Deactivating {name}...")
+        root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
+        local_path = os.path.join(root, name)
 
-    def _copy_with_progress(self, src, dst):
-        # Count files first for progress
-        total_files = 0
-        for root, dirs, files in os.walk(src):
-            total_files += len(files)
+        backup_path = self._drive_root()
+        if not backup_path:
+            self.log("❌ Error: No Drive Path set in settings.", "red")
+            return {"status": "error", "message": "No Drive Path set"}
+        try:
+            os.makedirs(backup_path, exist_ok=True)
+        except Exception as e:
+            self.log(f"❌ Error: Drive Path unavailable ({e})", "red")
+            return {"status": "error", "message": str(e)}
 
-        copied_files = 0
+        dest_path = os.path.join(backup_path, name)
+        if not self._robust_move_to_backup(local_path, dest_path, name, job=job):
+            return {"status": "error", "message": "Transfer failed"}
+        return {"status": "ok", "message": "Deactivated"}
 
-        def copy_progress(s, d):
-            nonlocal copied_files
-            shutil.copy2(s, d)
-            copied_files += 1
+    def _copy_with_progress(self, src, dst, index_path=None, journal=None, rules=None, job=None, checksum_path=None,
+                            compress=False, mirrors=None):
+        logged = [0]
 
-            # Update visual progress bar and log text
-            pct = copied_files / total_files if total_files > 0 else 0
+        def copy_progress(stats):
+            # Byte-based, so one large file moves the bar instead of freezing it.
+            pct = stats.fraction
             self.after(0, lambda: self.progress_bar.set(pct))
+            progress = stats.progress()
+            if job is not None:
+                job.update(**progress)
+
+            decile = int(pct * 10)
+            if decile > logged[0]:
+                logged[0] = decile
+                eta = progress["eta_seconds"]
+                eta_text = f", ETA {int(eta // 60)}m{int(eta % 60):02d}s" if eta is not None else ""
+                msg = (f"   ⏳ Syncing... {int(pct * 100)}% "
+                       f"({transfer.format_size(stats.bytes_done)}/{transfer.format_size(stats.bytes_total)}, "
+                       f"{transfer.format_size(progress['throughput_bps'])}/s{eta_text})")
+                self.after(0, lambda: self.log(msg))
+
+        # The tree is enumerated once; with an index only changed files move.
+        if mirrors:
+            # Each file is read once and written to the backup and every mirror.
+            primary = transfer.SyncTarget(dst, index_path, checksum_path)
+            transfer.sync_targets(
+                src, [primary] + mirrors, on_file=copy_progress, journal=journal, rules=rules,
+                cancel=job.cancel_event if job else None, compress=compress,
+            )
+            stats = primary.stats
+        else:
+            stats = transfer.sync_tree(
+                src, dst, index_path=index_path, on_file=copy_progress, journal=journal, rules=rules,
+                cancel=job.cancel_event if job else None, checksum_path=checksum_path, compress=compress,
+            )
+        self.after(0, lambda: self.progress_bar.set(0)) # Reset when done
+        if stats.cancelled:
+            raise jobs.JobCancelled("Transfer cancelled; it will resume from where it stopped")
+        if stats.files_skipped:
+            self.log(f"   ⏭️ {stats.files_skipped} unchanged file(s) skipped.")
+        if stats.compressed:
+            self.log(f"   🗜️ {len(stats.compressed)} file(s) compressed, {transfer.format_size(stats.bytes_saved)} saved.")
+        if stats.excluded:
+            self.log(f"   🚫 {len(stats.excluded)} path(s) excluded by .omniignore.")
+        if stats.errors:
+            first_path, first_err = stats.errors[0]
+            raise OSError(f"{len(stats.errors)} file(s) failed to copy, first: {first_path} ({first_err})")
+        return stats
+
+    def _background_log(self, m):
+        self.after(0, lambda: self.log(m))
+
+    def _remove_local(self, src):
+        # Tombstone rename is instant; the tree is deleted in the background.
+        if transfer.remove_tree_later(src, log=self._background_log):
+            self.log(f"🗑️ Local copy moved to trash, deleting in background...")
+        else:
+            self.log(f"🗑️ Cleaning local storage (Force unlocking Git)...")
+            shutil.rmtree(src, onerror=force_remove_readonly)
 
-            if copied_files % max(1, int(total_files / 10)) == 0:
-                 pct_int = int(pct * 100)
-                 self.after(0, lambda: self.log(f"   ⏳ Syncing... {pct_int}% ({copied_files}/{total_files})"))
+    def _retire_local(self, name, src):
+        # Keep the tree in the warm cache (instant rename) when WARM_CACHE_MB allows it.
+        cache = warmcache.WarmCache.for_workspace(os.path.dirname(src))
+        if cache and cache.put(name, src, log=self._background_log):
+            self.log(f"🗃️ Local copy kept in warm cache for a fast re-activation.")
+        else:
+            self._remove_local(src)
 
-        shutil.copytree(src, dst, dirs_exist_ok=True, copy_function=copy_progress)
-        self.after(0, lambda: self.progress_bar.set(0)) # Reset when done
+    def _record_target_status(self, name, statuses, drive_root, state, message=""):
+        # Same per-target record as the agent; only kept once mirrors are configured.
+        if statuses or transfer.mirror_roots():
+            statuses[os.path.abspath(drive_root)] = transfer.target_status(state, message)
+            try:
+                state_store().record_targets(name, statuses)
+            except Exception as e:
+                self.log(f"⚠️ Failed to save backup target status: {e}", "orange")
 
-    def _robust_move_to_backup(self, src, dst, name):
+    def _robust_move_to_backup(self, src, dst, name, job=None):
+        mirror_status = {}
+        drive_root = os.path.dirname(dst)
         try:
             # 1. Process External Resources (Move into project Assets folder)
             self._backup_project_resources(src)
@@ -2009,57 +2172,243 @@ class ProjectManagerApp(ctk.CTk):
             # 1.5 Uninstall unused software
             self._uninstall_software_if_unused(src, name)
 
-            # 2. Copy Tree (Safely across drives)
-            self.log(f"📤 Syncing to backup: {dst}")
-            self._copy_with_progress(src, dst)
-
-            # 3. Force Delete Local
-            self.log(f"🗑️ Cleaning local storage (Force unlocking Git)...")
-            shutil.rmtree(src, onerror=force_remove_readonly)
-
+            index_path = transfer.project_index_path(drive_root, name)
+            rules = transfer.IgnoreRules.for_project(src, GLOBAL_IGNORE_PATH)
+            mode = archive.storage_mode(src)
+            mirrors, mirror_status = transfer.mirror_targets(name, drive_root)
+            for root in mirror_status:
+                self.log(f"⚠️ Mirror {root} not reachable; skipped.", "orange")
+            if mirrors and mode in (archive.STORAGE_ARCHIVE, archive.STORAGE_BLOBS):
+                self.log(f"⚠️ {mode} storage is not mirrored; only {drive_root} is updated.", "orange")
+                for target in mirrors:
+                    mirror_status[target.root] = transfer.target_status("skipped", f"{mode} storage is not mirrored")
+                mirrors = []
+            if mode == archive.STORAGE_ARCHIVE:
+                # 2. Packed mode: one archive instead of thousands of uploads.
+                self.log(f"📦 Packing to backup archive...")
+                archive.pack_project(src, drive_root, name, log=self.log, rules=rules)
+                transfer.invalidate_index(index_path)
+                blobstore.remove_manifest(drive_root, name)
+                self._remove_local(src)
+            elif mode == archive.STORAGE_BLOBS:
+                # 2. Blob mode: only content the store has never seen is uploaded.
+                self.log(f"🧩 Storing in deduplicated blob store...")
+                blobstore.store_project(src, drive_root, name, rules=rules, log=self.log)
+                transfer.invalidate_index(index_path)
+                self._retire_local(name, src)
+            elif not mirrors and transfer.rename_tree(src, dst):
+                # 2. Same volume: a single rename replaces copy + delete.
+                self.log(f"⚡ Moved to backup (same volume): {dst}")
+                transfer.invalidate_index(index_path)
+                archive.remove_archive(drive_root, name)
+                blobstore.remove_manifest(drive_root, name)
+            else:
+                # 2. Copy Tree (Safely across drives), resuming an interrupted attempt
+                journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "deactivate", name, src, dst)
+                try:
+                    if journal.resumed:
+                        self.log(f"↩️ Resuming interrupted transfer ({len(journal.done)} files done)")
+                    self.log(f"📤 Syncing to backup: {dst}")
+                    checksum_path = transfer.project_checksum_path(drive_root, name)
+                    rules = gitpack.prepare(src, rules, log=self.log)
+                    stats = self._copy_with_progress(src, dst, index_path=index_path, journal=journal, rules=rules,
+                                                     job=job, checksum_path=checksum_path,
+                                                     compress=transfer.compression_enabled(), mirrors=mirrors)
+                    transfer.record_excluded(dst, gitpack.user_excluded(stats.excluded))
+                    # A failed mirror is reported on its own; only the main backup gates the delete.
+                    statuses = transfer.settle_mirrors(src, mirrors, rules, gitpack.user_excluded(stats.excluded),
+                                                       log=self.log)
+                    mirror_status.update(statuses)
+                    for root, status in statuses.items():
+                        if status["state"] == "ok":
+                            self.log(f"🪞 Mirrored to {root}.")
+
+                    # 3. Verify against the checksums taken during the copy, then force delete local
+                    problems = transfer.verify_copy(src, dst, checksum_path, rules)
+                    if problems:
+                        rel, problem = problems[0]
+                        raise OSError(f"{len(problems)} file(s) not confirmed in backup, first: {rel} ({problem}); "
+                                      f"local copy kept")
+                    self.log(f"🔒 Backup verified against copy checksums.")
+                    self._retire_local(name, src)
+                finally:
+                    journal.close()
+                journal.complete()
+                archive.remove_archive(drive_root, name)
+                blobstore.remove_manifest(drive_root, name)
+
+            self._record_target_status(name, mirror_status, drive_root, "ok")
             self.log(f"✅ {name} Offloaded Successfully.")
             reg = load_registry(self); reg[name] = "Cloud"; self._save_reg(reg)
             self.after(0, self._refresh_projects)
-            self.sync_to_firestore()
+            if not (job and job.batched):
+                self.sync_to_firestore()
+            return True
         except Exception as e:
+            self._record_target_status(name, mirror_status, drive_root, "failed", str(e))
             self.log(f"❌ Transfer Failed: {e}", "red")
+            return False
 
     def activate_project(self, name):
         card = self.project_cards.get(name)
         if card and card.busy:
-            self.log(f"⚠️ Operation already in progress for {name}.")
+            self._confirm_cancel(name)
             return
+        self._submit_project_job("activate", name)
 
-        if card:
-            card.set_busy(True)
-
-        def task():
-            try:
-                self.log(f"🚀 Activating {name}...")
-                root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
-                local_path = os.path.join(root, name)
-                root_backup = self._drive_root()
-                if not root_backup:
-                    self.log("❌ Error: No Drive Path set in settings.", "red")
-                    return
-                backup_path = os.path.join(root_backup, name)
+    def _activate_job(self, job):
+        name = job.name
+        self.log(f"🚀 Activating {name}...")
+        root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
+        local_path = os.path.join(root, name)
+        root_backup = self._drive_root()
+        if not root_backup:
+            self.log("❌ Error: No Drive Path set in settings.", "red")
+            return {"status": "error", "message": "No Drive Path set"}
+        backup_path = os.path.join(root_backup, name)
 
-                if not os.path.exists(backup_path):
-                    self.log(f"❌ Backup not found at {backup_path}", "red")
-                    return
+        if (not os.path.exists(backup_path) and not archive.archive_info(root_backup, name)
+                and not blobstore.manifest_info(root_backup, name)):
+            self.log(f"❌ Backup not found at {backup_path}", "red")
+            return {"status": "error", "message": "Backup not found"}
 
-                self._robust_move_to_local(backup_path, local_path, name)
-            finally:
-                if card:
-                    self.after(0, lambda: card.set_busy(False))
+        if not self._robust_move_to_local(backup_path, local_path, name, job=job):
+            return {"status": "error", "message": "Restore failed"}
+        return {"status": "ok", "message": "Activated"}
 
-        threading.Thread(target=task, daemon=True).start()
+    def _hydrate_job(self, job):
+        name = job.name
+        root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
+        local_path = os.path.join(root, name)
+        root_backup = self._drive_root()
+        if transfer.pending_journals(TRANSFER_JOURNAL_DIR).get(name) != transfer.HYDRATE_OP:
+            return {"status": "ok", "message": "Already fully local"}
+        if not root_backup or not os.path.isdir(os.path.join(root_backup, name)):
+            return {"status": "error", "message": "Backup not found"}
+        backup_path = os.path.join(root_backup, name)
+        self.log(f"📥 Hydrating the rest of {name} in the background...")
+
+        def hydrate_progress(stats):
+            job.update(**stats.progress())
+            card = self.project_cards.get(name)
+            if card and stats.files_done % 50 == 0:
+                self.after(0, card.update_visual_state)
+
+        journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, transfer.HYDRATE_OP, name, backup_path, local_path)
+        try:
+            # Profile files may already be edited locally: only fill in what is missing.
+            stats = transfer.copy_tree(backup_path, local_path, log=self._background_log, journal=journal,
+                                       on_file=hydrate_progress, cancel=job.cancel_event, skip_existing=True)
+        finally:
+            journal.close()
+        if stats.cancelled:
+            raise jobs.JobCancelled("Hydration cancelled; it resumes on the next start")
+        if not stats.ok:
+            self.log(f"❌ Hydrating {name}: {len(stats.errors)} file(s) failed to copy; retry to resume.", "red")
+            return {"status": "error", "message": "Hydration failed"}
+        if not gitpack.restore(local_path, log=self._background_log):
+            self.log(f"⚠️ Git objects are still in .git/{gitpack.BUNDLE_FILENAME}; restore before using the repo.", "orange")
+        journal.complete()
+        self.log(f"✅ {name} fully local ({stats.files_copied} remaining file(s) copied).")
+        reg = load_registry(self); reg[name] = "Local"; self._save_reg(reg)
+        self.after(0, self._refresh_projects)
+        self.sync_to_firestore()
+        return {"status": "ok", "message": "Hydrated"}
+
+    def _hydration_percent(self, name):
+        for job in self.scheduler.list_jobs(active_only=True):
+            if job.kind == transfer.HYDRATE_OP and job.name == name:
+                progress = job.progress
+                if progress.get("bytes_total"):
+                    return int(progress.get("bytes_done", 0) * 100 / progress["bytes_total"])
+                return job.args.get("percent")
+        return None
 
-    def _robust_move_to_local(self, src, dst, name):
+    def _robust_move_to_local(self, src, dst, name, job=None):
         try:
-            self.log(f"⬇️ Restoring from {src}...")
-            # We can use the same progress copy here
-            self._copy_with_progress(src, dst)
+            profile = None
+            cache = warmcache.WarmCache.for_workspace(os.path.dirname(dst))
+            packed = archive.archive_info(os.path.dirname(src), name)
+            stored = None if packed else blobstore.manifest_info(os.path.dirname(src), name)
+            if packed:
+                self.log(f"📦 Extracting {packed['archive']}...")
+                journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "activate", name, packed["archive"], dst)
+                try:
+                    archive.unpack_project(os.path.dirname(src), name, dst, log=self.log)
+                finally:
+                    journal.close()
+                journal.complete()
+            elif stored:
+                if cache and cache.take(name, dst):
+                    self.log(f"🗃️ Warm cache hit, materializing changes only...")
+                    rules = transfer.IgnoreRules.for_project(dst, GLOBAL_IGNORE_PATH)
+                    transfer.prune_extraneous(dst, stored["files"], stored.get("dirs", []), rules, log=self.log)
+                journal = transfer.TransferJournal.open(
+                    TRANSFER_JOURNAL_DIR, "activate", name, blobstore.manifest_path(os.path.dirname(src), name), dst
+                )
+                try:
+                    self.log(f"🧩 Materializing from blob store...")
+                    stats = blobstore.materialize(os.path.dirname(src), name, dst, journal=journal, log=self.log,
+                                                 cancel=job.cancel_event if job else None)
+                finally:
+                    journal.close()
+                if stats.cancelled:
+                    raise jobs.JobCancelled("Restore cancelled; it will resume from where it stopped")
+                if not stats.ok:
+                    raise OSError(f"{len(stats.errors)} file(s) failed to materialize; retry to resume")
+                journal.complete()
+            elif (not transfer.has_compressed(transfer.project_index_path(os.path.dirname(src), name))
+                  and transfer.rename_tree(src, dst)):
+                self.log(f"⚡ Restored from {src} (same volume)")
+                transfer.invalidate_index(transfer.project_index_path(os.path.dirname(src), name))
+            else:
+                warm = cache is not None and cache.take(name, dst)
+                if warm:
+                    self.log(f"🗃️ Warm cache hit, copying changes only...")
+                profile = None if warm else transfer.activation_profile(src)
+                journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "activate", name, src, dst)
+                try:
+                    if journal.resumed:
+                        self.log(f"↩️ Resuming interrupted restore ({len(journal.done)} files done)")
+                    if profile is not None:
+                        # Only the profile's subtrees now; _hydrate_job copies the rest.
+                        self.log(f"⬇️ Restoring activation profile files from {src}...")
+                        stats, total_bytes = transfer.copy_profile(
+                            src, dst, profile, log=self._background_log, journal=journal,
+                            on_file=lambda s: self.after(0, lambda: self.progress_bar.set(s.fraction)),
+                            cancel=job.cancel_event if job else None,
+                        )
+                        self.after(0, lambda: self.progress_bar.set(0))
+                        if stats.cancelled:
+                            raise jobs.JobCancelled("Restore cancelled; it will resume from where it stopped")
+                        if stats.errors:
+                            first_path, first_err = stats.errors[0]
+                            raise OSError(f"{len(stats.errors)} file(s) failed to copy, first: {first_path} ({first_err})")
+                    else:
+                        self.log(f"⬇️ Restoring from {src}...")
+                        # We can use the same progress copy here
+                        self._copy_with_progress(src, dst, journal=journal, job=job)
+                finally:
+                    journal.close()
+                if warm:
+                    # Drop files deleted from the backup since; ignored build outputs stay.
+                    cloud_dirs, cloud_files = transfer.scan_tree(src)
+                    rules = transfer.IgnoreRules.for_project(dst, GLOBAL_IGNORE_PATH)
+                    transfer.prune_extraneous(dst, cloud_files, cloud_dirs, rules, log=self.log)
+                if profile is not None:
+                    # Marks the project "Hydrating" until _hydrate_job has copied the rest.
+                    transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, transfer.HYDRATE_OP, name, src, dst).close()
+                    hydrated = int(stats.bytes_total * 100 / total_bytes) if total_bytes else 100
+                    self.log(f"   📥 Profile files ready ({hydrated}% of the project); hydrating the rest in the background.")
+                journal.complete()
+            if cache:
+                cache.discard(name, log=self._background_log)
+
+            if not gitpack.restore(dst, log=self.log):
+                self.log(f"⚠️ Git objects are still in .git/{gitpack.BUNDLE_FILENAME}; restore before using the repo.", "orange")
+            excluded = transfer.read_excluded(dst)
+            if excluded:
+                self.log(f"🔧 Regenerate excluded paths: {', '.join(excluded)}")
 
             # Restore resources/installs
             self._restore_project_resources(dst)
@@ -2069,11 +2418,18 @@ class ProjectManagerApp(ctk.CTk):
             # shutil.rmtree(src, onerror=force_remove_readonly)
 
             self.log(f"✅ {name} Restored & Ready.")
-            reg = load_registry(self); reg[name] = "Local"; self._save_reg(reg)
+            reg = load_registry(self); reg[name] = "Hydrating" if profile is not None else "Local"; self._save_reg(reg)
+            if profile is not None:
+                root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
+                self.scheduler.submit(transfer.HYDRATE_OP, name, priority=jobs.PRIORITY_BULK,
+                                      paths=[root, self._drive_root()], args={"percent": hydrated})
             self.after(0, self._refresh_projects)
-            self.sync_to_firestore()
+            if not (job and job.batched):
+                self.sync_to_firestore()
+            return True
         except Exception as e:
             self.log(f"❌ Restore Failed: {e}", "red")
+            return False
 
     # --- RESOURCE HANDLERS ---
     def _backup_project_resources(self, project_path):
@@ -2137,9 +2493,8 @@ class ProjectManagerApp(ctk.CTk):
             pass
 
     def _check_install_software(self, project_path):
-        manifest = os.path.join(project_path, "omni.json")
-        if not os.path.exists(manifest): return
-        with open(manifest, "r") as f: data = json.load(f)
+        data = state_store().manifest(os.path.join(project_path, "omni.json"))
+        if data is None: return
         for app in data.get("software", []):
             self.log(f"   > Checking Software: {app}")
             try:
@@ -2164,17 +2519,15 @@ class ProjectManagerApp(ctk.CTk):
         # Get all other active projects
         root = os.getenv("LOCAL_WORKSPACE_ROOT", DEFAULT_WORKSPACE)
         all_projects = load_registry(self)
-        other_active_projects = [p for p, s in all_projects.items() if s == "Local" and p != name]        
+        other_active_projects = [p for p, s in all_projects.items() if s != "Cloud" and p != name]        
 
         # Get all software dependencies from other active projects
         other_dependencies = set()
+        store = state_store()
         for project_name in other_active_projects:
-            other_manifest_path = os.path.join(root, project_name, "omni.json")
-            if os.path.exists(other_manifest_path):
-                with open(other_manifest_path, "r") as f:
-                    other_data = json.load(f)
-                for s in other_data.get("software", []):
-                    other_dependencies.add(s)
+            other_data = store.manifest(os.path.join(root, project_name, "omni.json"))
+            if other_data:
+                other_dependencies.update(other_data.get("software", []))
 
         # Uninstall software if it's not a dependency of any other active project
         for app in software_to_uninstall:
@@ -2287,6 +2640,9 @@ class ProjectManagerApp(ctk.CTk):
             pass
 
     def exit_app(self):
+        self._flush_categories()
+        if self.stats_indexer is not None:
+            self.stats_indexer.stop()
         if os.getenv(PORTABLE_AUTO_CLEAN_ENV, "").strip() == "1":
             self._schedule_self_cleanup()
         if self.tray_icon:
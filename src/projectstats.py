@@ -0,0 +1,197 @@
+"""Background indexer for per-project size, file count and last-modified time.
+
+Every PROJECT_STATS_INTERVAL seconds (default 600, 0 disables) a
+low-priority thread walks each local project and stores in the state
+store:
+
+- ``bytes`` and ``files``;
+- ``modified``, the newest file mtime;
+- ``largest``, the biggest top-level folders.
+
+The walk is incremental. Each directory's listing is cached with that
+directory's mtime. An unchanged directory costs one stat, and only
+directories that gained, lost or renamed entries are listed again. An
+existing file edited in place does not change its directory's mtime, so
+each project also gets a full rescan every FULL_RESCAN_HOURS. Cloud
+projects keep the stats from when they were last local.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import statestore
+import transfer
+
+DEFAULT_INTERVAL_SECONDS = 600
+FULL_RESCAN_HOURS = 24
+LARGEST_DIRS = 5
+
+
+def stats_interval() -> int:
+    return max(0, transfer._int_env("PROJECT_STATS_INTERVAL", DEFAULT_INTERVAL_SECONDS))
+
+
+def _list_dir(path: str, mtime_ns: int) -> dict:
+    """One directory's own files and subdirectories (symlinks are not followed)."""
+    files = 0
+    size = 0
+    newest = 0.0
+    subdirs: List[str] = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            files += 1
+            size += st.st_size
+            newest = max(newest, st.st_mtime)
+    return {"m": mtime_ns, "n": files, "b": size, "t": newest, "d": subdirs}
+
+
+def scan_project(path: str, previous: Optional[Dict[str, dict]] = None) -> Tuple[Dict[str, dict], int]:
+    """Walk path, reusing previous entries of unchanged directories.
+
+    Returns the new per-directory cache (keyed by "/" relative path, "" for
+    the root) and how many directories had to be listed.
+    """
+    previous = previous or {}
+    dirs: Dict[str, dict] = {}
+    listed = 0
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        full = os.path.join(path, rel.replace("/", os.sep)) if rel else path
+        try:
+            mtime_ns = os.stat(full).st_mtime_ns
+            cached = previous.get(rel)
+            if cached is not None and cached.get("m") == mtime_ns:
+                entry = cached
+            else:
+                entry = _list_dir(full, mtime_ns)
+                listed += 1
+        except OSError:
+            continue
+        dirs[rel] = entry
+        stack.extend(f"{rel}/{d}" if rel else d for d in entry["d"])
+    return dirs, listed
+
+
+def summarize(dirs: Dict[str, dict]) -> dict:
+    top: Dict[str, int] = {}
+    for rel, entry in dirs.items():
+        if rel:
+            head = rel.split("/", 1)[0]
+            top[head] = top.get(head, 0) + entry["b"]
+    largest = sorted(top.items(), key=lambda item: item[1], reverse=True)[:LARGEST_DIRS]
+    return {
+        "bytes": sum(e["b"] for e in dirs.values()),
+        "files": sum(e["n"] for e in dirs.values()),
+        "modified": max((e["t"] for e in dirs.values()), default=0.0),
+        "largest": [{"path": name, "bytes": size} for name, size in largest if size],
+    }
+
+
+def index_project(store: statestore.StateStore, name: str, path: str, force: bool = False) -> Optional[dict]:
+    """Bring one project's stats up to date; returns them, or None if path is gone."""
+    if not os.path.isdir(path):
+        return None
+    state = store.stats_state(name)
+    now = time.time()
+    full = force or state is None or now - state["full_scan"] >= FULL_RESCAN_HOURS * 3600
+    dirs, _listed = scan_project(path, None if full else state["dirs"])
+    stats = summarize(dirs)
+    stats["scanned"] = now
+    store.put_project_stats(name, stats, dirs, now if full else state["full_scan"])
+    return stats
+
+
+class StatsIndexer:
+    """Keeps project_stats current for the projects local_projects() returns.
+
+    Both the GUI and the agent may run one. A project scanned less than
+    ``interval`` ago by either of them is skipped.
+    """
+
+    def __init__(
+        self,
+        store: statestore.StateStore,
+        workspace_root: str,
+        local_projects: Callable[[], Iterable[str]],
+        on_update: Optional[Callable[[List[str]], None]] = None,
+        interval: Optional[int] = None,
+        log: Optional[Callable[[str], None]] = None,
+    ):
+        self.store = store
+        self.workspace_root = workspace_root
+        self.local_projects = local_projects
+        self.on_update = on_update
+        self.interval = stats_interval() if interval is None else interval
+        self.log = log
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._due: set = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="omni-stats", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def kick(self, name: Optional[str] = None) -> None:
+        """Index soon: name regardless of its last scan (e.g. just activated), else a normal pass."""
+        if name:
+            self._due.add(name)
+        self._wake.set()
+
+    def run_once(self) -> List[str]:
+        """One pass; returns the projects whose stats changed."""
+        known = self.store.project_stats()
+        changed = []
+        now = time.time()
+        for name in sorted(self.local_projects()):
+            if self._stop.is_set():
+                break
+            forced = name in self._due
+            self._due.discard(name)
+            previous = known.get(name)
+            if not forced and previous and now - previous["scanned"] < self.interval:
+                continue
+            try:
+                stats = index_project(self.store, name, os.path.join(self.workspace_root, name), force=forced)
+            except Exception as e:
+                if self.log:
+                    self.log(f"Stats: {name} not indexed ({e})")
+                continue
+            if stats is None:
+                continue
+            if previous is None or any(stats[k] != previous[k] for k in ("bytes", "files", "modified", "largest")):
+                changed.append(name)
+        return changed
+
+    def _run(self) -> None:
+        # A dedicated thread, so it can stay at background priority for good.
+        transfer.lower_thread_priority()
+        while not self._stop.is_set():
+            changed = self.run_once()
+            if changed and self.on_update:
+                try:
+                    self.on_update(changed)
+                except Exception:
+                    pass
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -2,6 +2,7 @@ import asyncio
 import datetime
 import hashlib
 import json
+import math
 import os
 import re
 import secrets
@@ -13,16 +14,26 @@ import threading
 import time
 import uuid
 import sys
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, List, Optional
 from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import firebase_admin
 from firebase_admin import credentials, firestore
 from starlette.concurrency import run_in_threadpool
 
+import archive
+import blobstore
+import gitpack
+import jobs
+import projectstats
+import statestore
+import transfer
+import warmcache
+import watcher
+
 APP_NAME = "OmniProjectSync Remote Agent"
 VERSION = "4.8.0"
 def get_base_dir() -> str:
@@ -35,7 +46,9 @@ def get_base_dir() -> str:
 BASE_DIR = get_base_dir()
 ENV_PATH = os.path.join(BASE_DIR, "secrets.env")
 CONFIG_DIR = os.path.join(BASE_DIR, "config")
-LOCAL_REGISTRY_PATH = os.path.join(CONFIG_DIR, "project_registry.json")
+TRANSFER_JOURNAL_DIR = os.path.join(CONFIG_DIR, transfer.JOURNAL_DIRNAME)
+GLOBAL_IGNORE_PATH = os.path.join(CONFIG_DIR, "omniignore")
+JOB_STATE_PATH = os.path.join(CONFIG_DIR, "agent_jobs.json")
 
 DEFAULT_WORKSPACE = r"C:\\Projects"
 PROTECTED_PATHS = [r"C:\\Windows", r"C:\\Program Files", r"C:\\Program Files (x86)", r"C:\\"]
@@ -418,6 +431,8 @@ def sync_to_firestore():
 
         # Sync projects
         registry = compute_registry()
+        target_status = load_target_status()
+        project_stats = state_store().project_stats()
         projects_ref = user_ref.collection("projects")
         batch = db.batch()
 
@@ -425,22 +440,26 @@ def sync_to_firestore():
             if name.lower() in HIDDEN_PROJECTS:
                 continue
 
-            project_path = os.path.join(LOCAL_WORKSPACE_ROOT, name) if status == "Local" else os.path.join(DRIVE_ROOT_FOLDER_ID or "", name)
+            project_path = os.path.join(LOCAL_WORKSPACE_ROOT, name) if status != "Cloud" else os.path.join(DRIVE_ROOT_FOLDER_ID or "", name)
             manifest_path = os.path.join(project_path, "omni.json")
+            if status == "Cloud" and DRIVE_ROOT_FOLDER_ID and not os.path.exists(manifest_path):
+                # Packed projects keep their manifest in the cloud meta folder.
+                manifest_path = archive.cloud_manifest_path(DRIVE_ROOT_FOLDER_ID, name)
 
             project_data = {
                 "name": name,
                 "status": status,
                 "updated_at": firestore.SERVER_TIMESTAMP
             }
+            if name in target_status:
+                project_data["backup_targets"] = _target_list(target_status[name])
+            if name in project_stats:
+                project_data["stats"] = project_stats[name]
 
-            if os.path.exists(manifest_path):
-                try:
-                    with open(manifest_path, "r", encoding="utf-8") as f:
-                        manifest = json.load(f)
-                    project_data.update(manifest)
-                except Exception:
-                    pass
+            # Indexed in the state store; only re-read when the file changed.
+            manifest = state_store().manifest(manifest_path)
+            if manifest:
+                project_data.update(manifest)
 
             doc_ref = projects_ref.document(name)
             batch.set(doc_ref, project_data, merge=True)
@@ -485,8 +504,14 @@ _project_locks_lock = threading.Lock()
 _project_locks: Dict[str, threading.Lock] = {}
 
 _registry_lock = threading.Lock()
-_registry_cache: Optional[Dict[str, str]] = None
-_registry_mtime: float = 0.0
+# Kept current by _registry_watcher: compute_registry serves _registry_live
+# while no change was seen since it was computed (generation unchanged).
+_registry_live: Optional[Dict[str, str]] = None
+_registry_generation = 0
+_registry_live_generation = -1
+_registry_live_data_version = -1
+_registry_watcher: Optional[watcher.DirectoryWatcher] = None
+_stats_indexer: Optional[projectstats.StatsIndexer] = None
 
 
 def log(msg: str) -> None:
@@ -541,56 +566,154 @@ def is_path_safe(path: str) -> bool:
             return False
     return True
 
-def load_registry() -> Dict[str, str]:
-    global _registry_cache, _registry_mtime
-    if not os.path.exists(LOCAL_REGISTRY_PATH):
-        return {}
-    try:
-        mtime = os.path.getmtime(LOCAL_REGISTRY_PATH)
-        if _registry_cache is not None and mtime == _registry_mtime:
-            return _registry_cache.copy()
+def is_valid_project_name(name) -> bool:
+    """A single folder name directly under the workspace (it is also joined into
+    the Drive root and journal file names, so no separators, "." or "..")."""
+    if not isinstance(name, str) or not name or name in (".", ".."):
+        return False
+    if any(sep in name for sep in ("/", "\\", os.sep, "\0")):
+        return False
+    root = os.path.abspath(LOCAL_WORKSPACE_ROOT)
+    return os.path.dirname(os.path.abspath(os.path.join(root, name))) == root
 
-        with open(LOCAL_REGISTRY_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            _registry_cache = data
-            _registry_mtime = mtime
-            return data.copy()
+def state_store() -> statestore.StateStore:
+    """The state database shared with the GUI (imports the legacy JSON files once)."""
+    return statestore.StateStore.open(CONFIG_DIR)
+
+
+def load_target_status() -> Dict[str, Dict[str, dict]]:
+    """Per-project outcome of the last deactivation for each backup target root."""
+    try:
+        return state_store().target_statuses()
     except Exception:
         return {}
 
-def save_registry(registry: Dict[str, str]) -> None:
-    global _registry_cache, _registry_mtime
-    os.makedirs(CONFIG_DIR, exist_ok=True)
-    with open(LOCAL_REGISTRY_PATH, "w", encoding="utf-8") as f:
-        json.dump(registry, f, indent=2)
 
-    _registry_cache = registry.copy()
+def _target_list(statuses: Dict[str, dict]) -> List[dict]:
+    # A list, not a map: root paths make awkward Firestore/JSON keys.
+    return [{"root": root, **status} for root, status in sorted(statuses.items())]
+
+
+def record_target_status(name: str, statuses: Dict[str, dict]) -> None:
+    if statuses:
+        state_store().record_targets(name, statuses)
+        mark_projects_dirty()
+
+
+def load_registry() -> Dict[str, str]:
     try:
-        _registry_mtime = os.path.getmtime(LOCAL_REGISTRY_PATH)
+        return state_store().statuses()
     except Exception:
-        _registry_mtime = 0.0
+        return {}
+
+def save_registry(registry: Dict[str, str]) -> None:
+    global _registry_live
+    # Only rows that changed are written, in one transaction.
+    state_store().save_statuses(registry)
+    if _registry_live is not None:
+        _registry_live = registry.copy()
+    mark_projects_dirty()
+
+def invalidate_registry() -> None:
+    """Mark the in-memory registry stale; the next compute_registry rescans."""
+    global _registry_generation
+    _registry_generation += 1
+
+
+def _refresh_registry() -> None:
+    invalidate_registry()
+    compute_registry()
+    mark_projects_dirty()
+
+
+def start_registry_watcher() -> str:
+    """Keep the registry in memory, rescanning only when the watcher sees a change."""
+    global _registry_watcher
+    if _registry_watcher is not None and _registry_watcher.running:
+        return _registry_watcher.mode
+    w = watcher.DirectoryWatcher(_refresh_registry, log=log)
+    w.watch(LOCAL_WORKSPACE_ROOT, dirs_only=True)
+    w.watch(TRANSFER_JOURNAL_DIR)
+    mode = w.start()
+    if mode != watcher.WATCH_OFF:
+        _registry_watcher = w
+        _refresh_registry()
+    return mode
+
+
+def stop_registry_watcher() -> None:
+    global _registry_watcher, _registry_live
+    if _registry_watcher is not None:
+        _registry_watcher.stop()
+        _registry_watcher = None
+    _registry_live = None
+
+
+def start_stats_indexer() -> bool:
+    """Index size/file count/last modified of local projects in the background."""
+    global _stats_indexer
+    if _stats_indexer is None:
+        _stats_indexer = projectstats.StatsIndexer(
+            state_store(), LOCAL_WORKSPACE_ROOT,
+            local_projects=lambda: [n for n, s in compute_registry().items() if s != "Cloud"],
+            on_update=mark_projects_dirty,
+            log=log,
+        )
+    return _stats_indexer.start()
 
-def compute_registry() -> Dict[str, str]:
+
+def stop_stats_indexer() -> None:
+    global _stats_indexer
+    if _stats_indexer is not None:
+        _stats_indexer.stop()
+        _stats_indexer = None
+
+
+def compute_registry(rescan: bool = False) -> Dict[str, str]:
+    """Project name -> Local/Cloud/Hydrating.
+
+    Served from memory while the watcher runs and has seen no change and
+    the GUI has not written the state store since; pass rescan after this
+    process changed the workspace or journals itself, since the watcher may
+    not have reported it yet.
+    """
+    global _registry_live, _registry_live_generation, _registry_live_data_version
     with _registry_lock:
+        watching = _registry_watcher is not None and _registry_watcher.running
+        data_version = state_store().data_version() if watching else -1
+        if watching and not rescan and _registry_live is not None \
+                and _registry_live_generation == _registry_generation \
+                and _registry_live_data_version == data_version:
+            return _registry_live.copy()
+        generation = _registry_generation
         os.makedirs(LOCAL_WORKSPACE_ROOT, exist_ok=True)
         local_folders = set()
         # Optimization: Use os.scandir to avoid multiple system calls for isdir checks
         with os.scandir(LOCAL_WORKSPACE_ROOT) as it:
             for entry in it:
-                if entry.is_dir():
+                if entry.is_dir() and entry.name not in (transfer.TRASH_DIRNAME, warmcache.CACHE_DIRNAME):
                     local_folders.add(entry.name)
 
         registry = load_registry()
         original_registry = registry.copy()
+        # A half-copied activation is not usable yet; keep reporting it as Cloud.
+        # A profile activation is usable while the rest hydrates in the background.
+        pending = transfer.pending_journals(TRANSFER_JOURNAL_DIR)
+        pending_status = {"activate": "Cloud", transfer.HYDRATE_OP: "Hydrating"}
 
         for name in local_folders:
-            registry[name] = "Local"
+            registry[name] = pending_status.get(pending.get(name), "Local")
         for name in list(registry.keys()):
             if name not in local_folders:
                 registry[name] = "Cloud"
 
         if registry != original_registry:
             save_registry(registry)
+        if watching:
+            # A change seen during the scan bumped the generation: rescan next time.
+            _registry_live = registry.copy()
+            _registry_live_generation = generation
+            _registry_live_data_version = data_version
         return registry
 
 def force_remove_readonly(func, path, excinfo):
@@ -600,6 +723,18 @@ def force_remove_readonly(func, path, excinfo):
         pass
     func(path)
 
+def remove_local_tree(path: str) -> None:
+    """Tombstone path for background deletion, or delete it now if that fails."""
+    if not transfer.remove_tree_later(path, log=log):
+        shutil.rmtree(path, onerror=force_remove_readonly)
+
+
+def retire_local_tree(name: str, path: str) -> None:
+    """Keep a deactivated tree in the warm cache when enabled, else delete it."""
+    cache = warmcache.WarmCache.for_workspace(LOCAL_WORKSPACE_ROOT)
+    if cache is None or not cache.put(name, path, log=log):
+        remove_local_tree(path)
+
 def backup_external_resources(project_path: str) -> None:
     manifest = os.path.join(project_path, "omni.json")
     if not os.path.exists(manifest):
@@ -664,13 +799,8 @@ def restore_external_resources(project_path: str) -> None:
         pass
 
 def check_install_software(project_path: str) -> None:
-    manifest = os.path.join(project_path, "omni.json")
-    if not os.path.exists(manifest):
-        return
-    try:
-        with open(manifest, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
+    data = state_store().manifest(os.path.join(project_path, "omni.json"))
+    if data is None:
         return
     for app_id in data.get("software", []):
         log(f"Check software: {app_id}")
@@ -686,36 +816,8 @@ def check_install_software(project_path: str) -> None:
         except Exception:
             pass
 
-def _is_same_file(src_path: str, dst_path: str) -> bool:
-    try:
-        src_stat = os.stat(src_path)
-        dst_stat = os.stat(dst_path)
-    except Exception:
-        return False
-    if src_stat.st_size != dst_stat.st_size:
-        return False
-    # Allow small timestamp drift across filesystems.
-    return abs(src_stat.st_mtime - dst_stat.st_mtime) < 1.0
-
-def copy_tree(src: str, dst: str) -> None:
-    if not os.path.exists(src):
-        return
-    for root, _dirs, files in os.walk(src):
-        rel = os.path.relpath(root, src)
-        dest_root = dst if rel == "." else os.path.join(dst, rel)
-        try:
-            os.makedirs(dest_root, exist_ok=True)
-        except Exception:
-            continue
-        for fname in files:
-            src_path = os.path.join(root, fname)
-            dst_path = os.path.join(dest_root, fname)
-            try:
-                if os.path.exists(dst_path) and _is_same_file(src_path, dst_path):
-                    continue
-                shutil.copy2(src_path, dst_path)
-            except Exception as e:
-                log(f"Copy failed: {src_path} -> {dst_path} ({e})")
+def copy_tree(src: str, dst: str) -> transfer.CopyStats:
+    return transfer.copy_tree(src, dst, log=log)
 
 def find_android_studio() -> Optional[str]:
     candidates = [
@@ -742,7 +844,22 @@ def open_studio_project(name: str) -> Dict[str, str]:
         return {"status": "error", "message": str(e)}
     return {"status": "ok", "message": "Studio launched"}
 
-def deactivate_project(name: str) -> Dict[str, str]:
+def _job_phase(job: Optional[jobs.Job], phase: str) -> None:
+    if job is not None:
+        job.check_cancelled()
+        job.update(phase=phase)
+
+
+def _job_progress(job: Optional[jobs.Job]):
+    if job is None:
+        return None
+
+    def on_file(stats: transfer.CopyStats) -> None:
+        job.update(**stats.progress())
+    return on_file
+
+
+def deactivate_project(name: str, job: Optional[jobs.Job] = None) -> Dict[str, str]:
     lock = get_project_lock(name)
     with lock:
         local_path = os.path.join(LOCAL_WORKSPACE_ROOT, name)
@@ -752,39 +869,344 @@ def deactivate_project(name: str) -> Dict[str, str]:
             return {"status": "error", "message": "DRIVE_ROOT_FOLDER_ID not configured"}
         if not is_path_safe(local_path):
             return {"status": "error", "message": "Unsafe project path"}
+        if transfer.pending_journals(TRANSFER_JOURNAL_DIR).get(name) == transfer.HYDRATE_OP:
+            # Syncing a partial tree would delete the not-yet-hydrated files from the cloud copy.
+            return {"status": "error", "message": "Project is still hydrating; deactivate it once it is fully local"}
         dest_path = os.path.join(DRIVE_ROOT_FOLDER_ID, name)
         os.makedirs(DRIVE_ROOT_FOLDER_ID, exist_ok=True)
         log(f"Deactivate project: {name}")
+        _job_phase(job, "resources")
         backup_external_resources(local_path)
-        copy_tree(local_path, dest_path)
-        shutil.rmtree(local_path, onerror=force_remove_readonly)
-        reg = compute_registry()
+        _job_phase(job, "copy")
+        index_path = transfer.project_index_path(DRIVE_ROOT_FOLDER_ID, name)
+        rules = transfer.IgnoreRules.for_project(local_path, GLOBAL_IGNORE_PATH)
+        mode = archive.storage_mode(local_path)
+        mirrors, mirror_status = transfer.mirror_targets(name, DRIVE_ROOT_FOLDER_ID)
+        if mirrors and mode in (archive.STORAGE_ARCHIVE, archive.STORAGE_BLOBS):
+            for target in mirrors:
+                mirror_status[target.root] = transfer.target_status("skipped", f"{mode} storage is not mirrored")
+            mirrors = []
+        if mode == archive.STORAGE_ARCHIVE:
+            archive.pack_project(local_path, DRIVE_ROOT_FOLDER_ID, name, log=log, rules=rules)
+            transfer.invalidate_index(index_path)
+            blobstore.remove_manifest(DRIVE_ROOT_FOLDER_ID, name)
+            _job_phase(job, "delete")
+            remove_local_tree(local_path)
+        elif mode == archive.STORAGE_BLOBS:
+            blobstore.store_project(local_path, DRIVE_ROOT_FOLDER_ID, name, rules=rules, log=log)
+            transfer.invalidate_index(index_path)
+            _job_phase(job, "delete")
+            retire_local_tree(name, local_path)
+        elif not mirrors and transfer.rename_tree(local_path, dest_path, log=log):
+            # With mirrors the tree is read anyway, so the rename would save nothing.
+            transfer.invalidate_index(index_path)
+            archive.remove_archive(DRIVE_ROOT_FOLDER_ID, name)
+            blobstore.remove_manifest(DRIVE_ROOT_FOLDER_ID, name)
+            log(f"Deactivate {name}: renamed on same volume")
+        else:
+            journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "deactivate", name, local_path, dest_path)
+            if journal.resumed:
+                log(f"Deactivate {name}: resuming ({len(journal.done)} files already done)")
+            checksum_path = transfer.project_checksum_path(DRIVE_ROOT_FOLDER_ID, name)
+            rules = gitpack.prepare(local_path, rules, log=log)
+            try:
+                if mirrors:
+                    # Every source file is read once and written to the cloud copy and all mirrors.
+                    primary = transfer.SyncTarget(dest_path, index_path, checksum_path, root=DRIVE_ROOT_FOLDER_ID)
+                    transfer.sync_targets(
+                        local_path, [primary] + mirrors, log=log, journal=journal, rules=rules,
+                        on_file=_job_progress(job), cancel=job.cancel_event if job else None,
+                        compress=transfer.compression_enabled(),
+                    )
+                    stats = primary.stats
+                    mirror_status.update(transfer.settle_mirrors(
+                        local_path, mirrors, rules, gitpack.user_excluded(stats.excluded), log=log,
+                    ))
+                else:
+                    stats = transfer.sync_tree(
+                        local_path, dest_path, index_path=index_path, log=log, journal=journal, rules=rules,
+                        on_file=_job_progress(job), cancel=job.cancel_event if job else None,
+                        checksum_path=checksum_path, compress=transfer.compression_enabled(),
+                    )
+                log(f"Deactivate {name}: copied {stats.files_copied}, unchanged {stats.files_skipped}, "
+                    f"excluded {len(stats.excluded)}")
+                if stats.compressed:
+                    log(f"Deactivate {name}: compressed {len(stats.compressed)} file(s), "
+                        f"saved {transfer.format_size(stats.bytes_saved)}")
+                if stats.cancelled:
+                    raise jobs.JobCancelled(f"Deactivate {name} cancelled; retry to resume")
+                if not stats.ok:
+                    message = f"{len(stats.errors)} file(s) failed to copy; retry to resume"
+                    _record_primary_status(name, mirror_status, "failed", message)
+                    return {"status": "error", "message": message}
+                transfer.record_excluded(dest_path, gitpack.user_excluded(stats.excluded))
+                _job_phase(job, "verify")
+                problems = transfer.verify_copy(local_path, dest_path, checksum_path, rules)
+                if problems:
+                    rel, problem = problems[0]
+                    log(f"Deactivate {name}: {len(problems)} file(s) not confirmed, first: {rel} ({problem})")
+                    message = f"{len(problems)} file(s) not confirmed in cloud copy; local copy kept"
+                    _record_primary_status(name, mirror_status, "failed", message)
+                    return {"status": "error", "message": message}
+                _job_phase(job, "delete")
+                retire_local_tree(name, local_path)
+            finally:
+                journal.close()
+            journal.complete()
+            archive.remove_archive(DRIVE_ROOT_FOLDER_ID, name)
+            blobstore.remove_manifest(DRIVE_ROOT_FOLDER_ID, name)
+        _record_primary_status(name, mirror_status, "ok")
+        _job_phase(job, "registry")
+        reg = compute_registry(rescan=True)
         reg[name] = "Cloud"
         save_registry(reg)
         return {"status": "ok", "message": "Deactivated"}
 
-def activate_project(name: str) -> Dict[str, str]:
+
+def _record_primary_status(name: str, statuses: Dict[str, dict], state: str, message: str = "") -> None:
+    # Only tracked once mirrors are configured; the registry status covers the single-target case.
+    if statuses or transfer.mirror_roots():
+        statuses[os.path.abspath(DRIVE_ROOT_FOLDER_ID)] = transfer.target_status(state, message)
+        record_target_status(name, statuses)
+
+def activate_project(name: str, job: Optional[jobs.Job] = None) -> Dict[str, str]:
     lock = get_project_lock(name)
     with lock:
         if not DRIVE_ROOT_FOLDER_ID:
             return {"status": "error", "message": "DRIVE_ROOT_FOLDER_ID not configured"}
         backup_path = os.path.join(DRIVE_ROOT_FOLDER_ID, name)
         local_path = os.path.join(LOCAL_WORKSPACE_ROOT, name)
-        if not os.path.exists(backup_path):
+        index_path = transfer.project_index_path(DRIVE_ROOT_FOLDER_ID, name)
+        packed = archive.archive_info(DRIVE_ROOT_FOLDER_ID, name)
+        stored = None if packed else blobstore.manifest_info(DRIVE_ROOT_FOLDER_ID, name)
+        if not packed and not stored and not os.path.exists(backup_path):
             return {"status": "error", "message": "Backup not found"}
         if not is_path_safe(local_path):
             return {"status": "error", "message": "Unsafe project path"}
         os.makedirs(LOCAL_WORKSPACE_ROOT, exist_ok=True)
+        cache = warmcache.WarmCache.for_workspace(LOCAL_WORKSPACE_ROOT)
+        hydrated = None
         log(f"Activate project: {name}")
-        copy_tree(backup_path, local_path)
+        _job_phase(job, "copy")
+        if packed:
+            # The journal only marks the extraction as pending for compute_registry.
+            journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "activate", name, packed["archive"], local_path)
+            try:
+                archive.unpack_project(DRIVE_ROOT_FOLDER_ID, name, local_path, log=log)
+            finally:
+                journal.close()
+            journal.complete()
+        elif stored:
+            warm = cache is not None and cache.take(name, local_path)
+            if warm:
+                log(f"Activate {name}: warm cache hit, materializing changes only")
+                rules = transfer.IgnoreRules.for_project(local_path, GLOBAL_IGNORE_PATH)
+                transfer.prune_extraneous(local_path, stored["files"], stored.get("dirs", []), rules, log=log)
+            manifest = blobstore.manifest_path(DRIVE_ROOT_FOLDER_ID, name)
+            journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "activate", name, manifest, local_path)
+            try:
+                stats = blobstore.materialize(DRIVE_ROOT_FOLDER_ID, name, local_path, journal=journal, log=log,
+                                             on_file=_job_progress(job), cancel=job.cancel_event if job else None)
+            finally:
+                journal.close()
+            if stats.cancelled:
+                raise jobs.JobCancelled(f"Activate {name} cancelled; retry to resume")
+            if not stats.ok:
+                return {"status": "error", "message": f"{len(stats.errors)} file(s) failed to copy; retry to resume"}
+            journal.complete()
+        elif not transfer.has_compressed(index_path) and transfer.rename_tree(backup_path, local_path, log=log):
+            transfer.invalidate_index(index_path)
+            log(f"Activate {name}: renamed on same volume")
+        else:
+            warm = cache is not None and cache.take(name, local_path)
+            if warm:
+                log(f"Activate {name}: warm cache hit, copying changes only")
+            profile = None if warm else transfer.activation_profile(backup_path, job.args.get("profile") if job else None)
+            journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, "activate", name, backup_path, local_path)
+            if journal.resumed:
+                log(f"Activate {name}: resuming ({len(journal.done)} files already done)")
+            try:
+                if profile is not None:
+                    stats, total_bytes = transfer.copy_profile(
+                        backup_path, local_path, profile, log=log, journal=journal,
+                        on_file=_job_progress(job), cancel=job.cancel_event if job else None,
+                    )
+                else:
+                    stats = transfer.copy_tree(backup_path, local_path, log=log, journal=journal,
+                                               on_file=_job_progress(job), cancel=job.cancel_event if job else None)
+            finally:
+                journal.close()
+            if stats.cancelled:
+                raise jobs.JobCancelled(f"Activate {name} cancelled; retry to resume")
+            if not stats.ok:
+                return {"status": "error", "message": f"{len(stats.errors)} file(s) failed to copy; retry to resume"}
+            if warm:
+                # Files deleted from the cloud copy since; ignored build outputs stay.
+                cloud_dirs, cloud_files = transfer.scan_tree(backup_path)
+                rules = transfer.IgnoreRules.for_project(local_path, GLOBAL_IGNORE_PATH)
+                transfer.prune_extraneous(local_path, cloud_files, cloud_dirs, rules, log=log)
+                log(f"Activate {name}: {stats.files_copied} changed file(s) copied from cloud")
+            if profile is not None:
+                # The hydrate journal keeps the project "Hydrating" until the rest has landed.
+                transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, transfer.HYDRATE_OP, name,
+                                              backup_path, local_path).close()
+                hydrated = int(stats.bytes_total * 100 / total_bytes) if total_bytes else 100
+                log(f"Activate {name}: profile files local ({hydrated}% of the project), hydrating the rest")
+            journal.complete()
+        if cache:
+            cache.discard(name, log=log)
+        if not gitpack.restore(local_path, log=log):
+            log(f"Activate {name}: git objects still in {gitpack.BUNDLE_FILENAME}; restore it before using the repository")
+        excluded = transfer.read_excluded(local_path)
+        if excluded:
+            log(f"Activate {name}: regenerate excluded paths: {', '.join(excluded)}")
+        _job_phase(job, "resources")
         restore_external_resources(local_path)
         check_install_software(local_path)
-        reg = compute_registry()
-        reg[name] = "Local"
+        _job_phase(job, "registry")
+        reg = compute_registry(rescan=True)
+        hydrating = reg.get(name) == "Hydrating"
+        reg[name] = "Hydrating" if hydrating else "Local"
         save_registry(reg)
+        if hydrating:
+            submit_project_job(transfer.HYDRATE_OP, name, jobs.PRIORITY_BULK,
+                               args={"percent": hydrated} if hydrated is not None else None)
+            return {"status": "ok", "message": "Activated; hydrating the rest in the background"}
         return {"status": "ok", "message": "Activated"}
 
 
+def hydrate_project(name: str, job: Optional[jobs.Job] = None) -> Dict[str, str]:
+    """Copy whatever a profile activation left in the cloud; the project stays usable meanwhile."""
+    lock = get_project_lock(name)
+    with lock:
+        if not DRIVE_ROOT_FOLDER_ID:
+            return {"status": "error", "message": "DRIVE_ROOT_FOLDER_ID not configured"}
+        backup_path = os.path.join(DRIVE_ROOT_FOLDER_ID, name)
+        local_path = os.path.join(LOCAL_WORKSPACE_ROOT, name)
+        if transfer.pending_journals(TRANSFER_JOURNAL_DIR).get(name) != transfer.HYDRATE_OP:
+            return {"status": "ok", "message": "Already fully local"}
+        if not os.path.isdir(backup_path) or not os.path.isdir(local_path):
+            return {"status": "error", "message": "Backup or local project not found"}
+        _job_phase(job, "copy")
+        journal = transfer.TransferJournal.open(TRANSFER_JOURNAL_DIR, transfer.HYDRATE_OP, name, backup_path, local_path)
+        try:
+            # Profile files may already be edited locally: only fill in what is missing.
+            stats = transfer.copy_tree(backup_path, local_path, log=log, journal=journal,
+                                       on_file=_job_progress(job), cancel=job.cancel_event if job else None,
+                                       skip_existing=True)
+        finally:
+            journal.close()
+        if stats.cancelled:
+            raise jobs.JobCancelled(f"Hydrate {name} cancelled; it resumes on the next start")
+        if not stats.ok:
+            return {"status": "error", "message": f"{len(stats.errors)} file(s) failed to copy; retry to resume"}
+        if not gitpack.restore(local_path, log=log):
+            log(f"Hydrate {name}: git objects still in {gitpack.BUNDLE_FILENAME}; restore it before using the repository")
+        journal.complete()
+        log(f"Hydrate {name}: {stats.files_copied} remaining file(s) copied")
+        _job_phase(job, "registry")
+        reg = compute_registry(rescan=True)
+        reg[name] = "Local"
+        save_registry(reg)
+        return {"status": "ok", "message": "Hydrated"}
+
+
+def hydration_percent(name: str) -> Optional[int]:
+    """How much of a Hydrating project is local, from its background job."""
+    for job in scheduler.list_jobs(active_only=True):
+        if job.kind == transfer.HYDRATE_OP and job.name == name:
+            progress = job.progress
+            if progress.get("bytes_total"):
+                return int(progress.get("bytes_done", 0) * 100 / progress["bytes_total"])
+            return job.args.get("percent")
+    return None
+
+
+def _run_project_job(job: jobs.Job) -> Dict[str, str]:
+    handler = {
+        "activate": activate_project,
+        "deactivate": deactivate_project,
+        transfer.HYDRATE_OP: hydrate_project,
+    }[job.kind]
+    result = handler(job.name, job=job)
+    if result.get("status") == "ok" and job.kind != "deactivate" and _stats_indexer is not None:
+        _stats_indexer.kick(job.name)
+    if result.get("status") == "ok" and not job.batched:
+        job.update(phase="sync")
+        sync_to_firestore()
+    return result
+
+
+scheduler = jobs.JobScheduler(state_path=JOB_STATE_PATH)
+scheduler.register("activate", _run_project_job)
+scheduler.register("deactivate", _run_project_job)
+scheduler.register(transfer.HYDRATE_OP, _run_project_job)
+scheduler.subscribe(lambda event: state_store().record_job(event, "agent"))
+# Status and hydration progress of the project list follow the jobs.
+scheduler.subscribe(lambda event: mark_projects_dirty())
+
+
+def submit_project_job(
+    kind: str,
+    name: str,
+    priority: int = jobs.PRIORITY_USER,
+    args: Optional[dict] = None,
+) -> jobs.Job:
+    return scheduler.submit(kind, name, priority=priority, paths=[LOCAL_WORKSPACE_ROOT, DRIVE_ROOT_FOLDER_ID],
+                            args=args)
+
+
+BATCH_ACTIONS = ("activate", "deactivate", "open")
+
+
+def run_project_batch(operations: List[dict], priority: int = jobs.PRIORITY_USER) -> List[Dict[str, str]]:
+    """Run activate/deactivate/open operations with one Firestore sync at the end.
+
+    Transfers go through the scheduler together (pipelined across its worker
+    pool); opens run afterwards so a project activated in the same batch can
+    be opened. Results are returned in request order.
+    """
+    results: List[Optional[Dict[str, str]]] = [None] * len(operations)
+    transfers = []
+    seen = set()
+    for i, op in enumerate(operations):
+        op = op if isinstance(op, dict) else {}
+        name, action = op.get("name"), op.get("action")
+        base = {"name": name, "action": action}
+        if not name or action not in BATCH_ACTIONS:
+            results[i] = dict(base, status="error", message=f"Expected a name and one of: {', '.join(BATCH_ACTIONS)}")
+        elif not is_valid_project_name(name):
+            results[i] = dict(base, status="error", message="Invalid project name")
+        elif action != "open" and not DRIVE_ROOT_FOLDER_ID:
+            results[i] = dict(base, status="error", message="DRIVE_ROOT_FOLDER_ID not configured")
+        elif action != "open" and name in seen:
+            results[i] = dict(base, status="error", message="Duplicate transfer for project in batch")
+        elif action != "open":
+            seen.add(name)
+            transfers.append((i, action, name))
+
+    finished = scheduler.run_batch(
+        [(action, name) for _, action, name in transfers], priority=priority,
+        paths=[LOCAL_WORKSPACE_ROOT, DRIVE_ROOT_FOLDER_ID],
+    )
+    for (i, action, name), job in zip(transfers, finished):
+        results[i] = {
+            "name": name,
+            "action": action,
+            "status": "ok" if job.state == jobs.STATE_DONE else "error",
+            "message": job.message,
+            "job_id": job.id,
+            "state": job.state,
+        }
+    for i, op in enumerate(operations):
+        if results[i] is None:
+            results[i] = dict(open_studio_project(op["name"]), name=op["name"], action="open")
+
+    if any(r["status"] == "ok" for r in results):
+        sync_to_firestore()
+    return results
+
+
 class CommandSession:
     def __init__(self, session_id: str, ws: WebSocket):
         self.session_id = session_id
@@ -934,9 +1356,12 @@ async def api_ide_projects(request: Request):
     require_token_from_request(request)
     try:
         resp = await proxy_to_plugin("GET", "/api/projects")
-        return resp.json()
+        data = resp.json()
     except Exception as e:
         return {"projects": [], "error": str(e)}
+    # The plugin has no versions; a content hash still saves the phone the download.
+    body = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return _conditional_json(request, data, f'"{hashlib.sha256(body).hexdigest()[:16]}"')
 
 @app.post("/api/projects/ide/close")
 async def api_ide_close_project(request: Request):
@@ -949,37 +1374,300 @@ async def api_ide_close_project(request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/projects")
-async def get_projects(request: Request):
-    require_token_from_request(request)
-    registry = await run_in_threadpool(compute_registry)
+PROJECT_CHANGES_TIMEOUT = 25.0
+# While clients wait, how often the feed checks the state store for GUI writes.
+PROJECT_CHANGES_INTERVAL = 1.0
+# Coalesces bursts of job progress events into one recompute.
+PROJECT_FEED_MIN_GAP = 0.25
+PROJECT_CHANGE_HISTORY = 1000
+
+
+class ProjectFeed:
+    """Versioned project list for conditional GETs and /api/projects/changes.
+
+    Every change to an item bumps the version. Versions start at the agent's
+    start time in milliseconds so they keep increasing across restarts; a
+    cursor from before the oldest remembered change gets the full list.
+    Long-poll clients await wait() on their event loop, holding no thread;
+    update() wakes them through call_soon_threadsafe when the version moves.
+    """
+
+    def __init__(self, history: int = PROJECT_CHANGE_HISTORY):
+        self._lock = threading.RLock()
+        self._waiters: set = set()
+        self.version = int(time.time() * 1000)
+        self._floor = self.version
+        self._items: Dict[str, dict] = {}
+        self._changes: List[tuple] = []
+        self._history = history
+        self._primed = False
+
+    def update(self, items: List[dict]) -> int:
+        """Record the current items; returns the version they are at."""
+        current = {item["name"]: item for item in items}
+        with self._lock:
+            changed = sorted(n for n in set(current) | set(self._items) if current.get(n) != self._items.get(n))
+            if changed and self._primed:
+                self.version += 1
+                self._changes.extend((self.version, n) for n in changed)
+                if len(self._changes) > self._history:
+                    dropped = self._changes[:-self._history]
+                    self._changes = self._changes[-self._history:]
+                    self._floor = dropped[-1][0]
+                for loop, future in self._waiters:
+                    try:
+                        loop.call_soon_threadsafe(_resolve, future)
+                    except RuntimeError:
+                        pass  # that client's loop is already closed
+            self._items = current
+            self._primed = True
+            return self.version
+
+    @property
+    def waiters(self) -> int:
+        return len(self._waiters)
+
+    async def wait(self, since: int, timeout: float) -> Optional[dict]:
+        """Wait until the version moves past since (or timeout), then as changes_since."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if since != self.version:
+                return self.changes_since(since)
+            waiter = (loop, loop.create_future())
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        return self.changes_since(since)
+
+    def changes_since(self, since: int) -> Optional[dict]:
+        """Deltas after since, the full list if since is unknown, None when nothing changed."""
+        with self._lock:
+            if since == self.version:
+                return None
+            if since < self._floor or since > self.version:
+                return {"version": self.version, "reset": True,
+                        "projects": [self._items[n] for n in sorted(self._items)]}
+            names = sorted({n for v, n in self._changes if v > since})
+            return {
+                "version": self.version,
+                "changes": [self._items[n] for n in names if n in self._items],
+                "removed": [n for n in names if n not in self._items],
+            }
+
+
+def _resolve(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+project_feed = ProjectFeed()
+
+
+def _project_items() -> List[dict]:
+    registry = compute_registry()
+    target_status = load_target_status()
+    project_stats = state_store().project_stats()
     projects = []
     for name, status in sorted(registry.items()):
         if name.lower() in HIDDEN_PROJECTS:
             continue
-        projects.append({"name": name, "status": status})
-    return {"projects": projects}
+        item = {"name": name, "status": status}
+        if status == "Hydrating":
+            item["progress"] = hydration_percent(name)
+        if name in target_status:
+            item["targets"] = _target_list(target_status[name])
+        if name in project_stats:
+            # Without the scan time, so an unchanged rescan is not a change.
+            item["stats"] = {k: v for k, v in project_stats[name].items() if k != "scanned"}
+        projects.append(item)
+    return projects
+
+
+def project_snapshot() -> tuple:
+    """(version, items) for the current project list."""
+    items = _project_items()
+    return project_feed.update(items), items
+
+
+_projects_dirty = threading.Event()
+_project_feed_stop = threading.Event()
+_project_feed_thread: Optional[threading.Thread] = None
+
+
+def mark_projects_dirty(_event: Optional[dict] = None) -> None:
+    """Something behind the project list changed; the feed thread recomputes it once."""
+    _projects_dirty.set()
+
+
+def _project_feed_loop() -> None:
+    # One recompute per change for all waiting clients, instead of one per client per second.
+    data_version = None
+    while not _project_feed_stop.is_set():
+        dirty = _projects_dirty.wait(PROJECT_CHANGES_INTERVAL)
+        if _project_feed_stop.is_set():
+            break
+        try:
+            current = state_store().data_version()
+            # GUI writes only show up in the state store; check them while someone waits.
+            if dirty or (project_feed.waiters and current != data_version):
+                _projects_dirty.clear()
+                project_snapshot()
+                _project_feed_stop.wait(PROJECT_FEED_MIN_GAP)
+            data_version = current
+        except Exception as e:
+            log(f"Project feed refresh failed: {e}")
+
+
+def start_project_feed() -> None:
+    global _project_feed_thread
+    if _project_feed_thread is not None and _project_feed_thread.is_alive():
+        return
+    _project_feed_stop.clear()
+    try:
+        project_snapshot()
+    except Exception as e:
+        log(f"Project feed refresh failed: {e}")
+    _project_feed_thread = threading.Thread(target=_project_feed_loop, name="omni-feed", daemon=True)
+    _project_feed_thread.start()
+
+
+def stop_project_feed() -> None:
+    global _project_feed_thread
+    _project_feed_stop.set()
+    _projects_dirty.set()
+    if _project_feed_thread is not None:
+        _project_feed_thread.join(timeout=5)
+        _project_feed_thread = None
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match") or ""
+    tags = {t.strip() for t in header.split(",")}
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _conditional_json(request: Request, content: dict, etag: str):
+    """304 with no body when the client already has this version."""
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=content, headers={"ETag": etag})
+
+
+@app.get("/api/projects")
+async def get_projects(request: Request):
+    require_token_from_request(request)
+    version, projects = await run_in_threadpool(project_snapshot)
+    return _conditional_json(request, {"projects": projects, "version": version}, f'"{version}"')
+
+
+@app.get("/api/projects/changes")
+async def get_project_changes(request: Request):
+    """Long-poll: answer as soon as the list moves past ?since=, or empty after ?timeout= seconds."""
+    require_token_from_request(request)
+    try:
+        since = int(request.query_params.get("since", "0"))
+        timeout = float(request.query_params.get("timeout", PROJECT_CHANGES_TIMEOUT))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be a version number")
+    if not math.isfinite(timeout):
+        raise HTTPException(status_code=400, detail="timeout must be a finite number of seconds")
+    timeout = min(max(timeout, 0.0), PROJECT_CHANGES_TIMEOUT)
+    # The feed thread keeps project_feed current; waiting holds no worker thread.
+    delta = await project_feed.wait(since, timeout)
+    if delta is not None:
+        return delta
+    return {"version": since, "changes": [], "removed": []}
+
+
+async def _start_project_job(kind: str, name: str, request: Request):
+    """Queue the job and answer at once; ?wait=1 keeps the old blocking behaviour.
+
+    ?profile=<name> activates only that omni.json profile's subtrees first.
+    """
+    if not DRIVE_ROOT_FOLDER_ID:
+        raise HTTPException(status_code=400, detail="DRIVE_ROOT_FOLDER_ID not configured")
+    if not is_valid_project_name(name):
+        raise HTTPException(status_code=400, detail="Invalid project name")
+    profile = request.query_params.get("profile")
+    job = submit_project_job(kind, name, args={"profile": profile} if profile else None)
+    if request.query_params.get("wait", "").lower() in ("1", "true", "yes"):
+        await run_in_threadpool(job.wait)
+        if job.state != jobs.STATE_DONE:
+            raise HTTPException(status_code=400, detail=job.message)
+        return dict(job.result, job_id=job.id)
+    return JSONResponse(
+        status_code=202,
+        content={"status": "ok", "message": "Queued", "job_id": job.id, "job": job.to_dict()},
+    )
 
 
 @app.post("/api/projects/{name}/activate")
 async def api_activate_project(name: str, request: Request):
     require_token_from_request(request)
-    loop = asyncio.get_running_loop()
-    result = await loop.run_in_executor(None, activate_project, name)
-    if result.get("status") != "ok":
-        raise HTTPException(status_code=400, detail=result.get("message"))
-    await run_in_threadpool(sync_to_firestore)
-    return result
+    return await _start_project_job("activate", name, request)
 
 
 @app.post("/api/projects/{name}/deactivate")
 async def api_deactivate_project(name: str, request: Request):
     require_token_from_request(request)
-    result = await run_in_threadpool(deactivate_project, name)
-    if result.get("status") != "ok":
-        raise HTTPException(status_code=400, detail=result.get("message"))
-    await run_in_threadpool(sync_to_firestore)
-    return result
+    return await _start_project_job("deactivate", name, request)
+
+
+@app.post("/api/projects/batch")
+async def api_project_batch(request: Request):
+    require_token_from_request(request)
+    data = await request.json()
+    operations = data.get("operations") if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        raise HTTPException(status_code=400, detail="operations must be a non-empty list")
+    results = await run_in_threadpool(run_project_batch, operations)
+    failed = sum(1 for r in results if r["status"] != "ok")
+    return {
+        "status": "ok" if not failed else "error",
+        "message": f"{len(results) - failed} of {len(results)} operation(s) succeeded",
+        "results": results,
+    }
+
+
+@app.get("/api/jobs")
+async def api_list_jobs(request: Request):
+    require_token_from_request(request)
+    return {"jobs": [job.to_dict() for job in scheduler.list_jobs()]}
+
+
+@app.get("/api/transfers")
+async def api_transfer_history(request: Request):
+    """Finished transfers from both the agent and the GUI, newest first; ?project= narrows it."""
+    require_token_from_request(request)
+    try:
+        limit = min(max(int(request.query_params.get("limit", "50")), 1), 500)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="limit must be a number")
+    project = request.query_params.get("project") or None
+    history = await run_in_threadpool(state_store().transfers, project, limit)
+    return {"transfers": history}
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_get_job(job_id: str, request: Request):
+    require_token_from_request(request)
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def api_cancel_job(job_id: str, request: Request):
+    require_token_from_request(request)
+    if not scheduler.cancel(job_id):
+        raise HTTPException(status_code=404, detail="No active job with that id")
+    return {"status": "ok", "message": "Cancellation requested"}
 
 
 @app.post("/api/projects/{name}/open-studio")
@@ -1022,6 +1710,62 @@ async def api_command(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+JOB_EVENT_INTERVAL = 0.5
+
+
+@app.websocket("/ws/jobs")
+async def ws_jobs(ws: WebSocket):
+    """Stream job events; ?job=<id> narrows the stream to a single job."""
+    try:
+        require_token_from_ws(ws)
+    except HTTPException:
+        await ws.close(code=1008)
+        return
+
+    await ws.accept()
+    loop = asyncio.get_running_loop()
+    only = ws.query_params.get("job")
+    events: asyncio.Queue = asyncio.Queue()
+    last_sent: Dict[str, tuple] = {}
+
+    def listener(event: dict) -> None:
+        if only and event["id"] != only:
+            return
+        # Per-file progress is throttled; state and phase changes always go out.
+        key = (event["state"], event["progress"].get("phase"))
+        now = time.monotonic()
+        previous = last_sent.get(event["id"])
+        if previous and previous[0] == key and now - previous[1] < JOB_EVENT_INTERVAL:
+            return
+        last_sent[event["id"]] = (key, now)
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def drain_client() -> None:
+        try:
+            while True:
+                await ws.receive_text()
+        except Exception:
+            pass
+
+    scheduler.subscribe(listener)
+    receiver = asyncio.create_task(drain_client())
+    try:
+        for job in scheduler.list_jobs(active_only=not only):
+            if not only or job.id == only:
+                await ws.send_text(json.dumps({"type": "job", "job": job.to_dict()}))
+        while not receiver.done():
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            await ws.send_text(json.dumps({"type": "job", "job": event}))
+    except Exception:
+        pass
+    finally:
+        scheduler.unsubscribe(listener)
+        receiver.cancel()
+
+
 @app.websocket("/ws/terminal")
 async def ws_terminal(ws: WebSocket):
     try:
@@ -1187,9 +1931,30 @@ def startup_sequence():
         local_ip = get_local_ip()
         print(f"[startup] Tunnel pending - local access only: http://{local_ip}:{REMOTE_PORT}")
 
+    mode = start_registry_watcher()
+    print(f"[startup] Project registry watcher: {mode}")
+    start_project_feed()
+    if start_stats_indexer():
+        print(f"[startup] Project stats indexed every {_stats_indexer.interval}s")
+
     # Initial sync to Firebase (will be re-synced when tunnel is ready)
     sync_to_firestore()
 
+    # Re-queue transfers that were waiting or running when the agent stopped.
+    restored = scheduler.restore()
+    if restored:
+        print(f"[startup] Resuming {len(restored)} queued transfer job(s)")
+
+    # Profile activations whose background hydration never finished.
+    for name, op in transfer.pending_journals(TRANSFER_JOURNAL_DIR).items():
+        if op == transfer.HYDRATE_OP:
+            submit_project_job(op, name, jobs.PRIORITY_BULK)
+
+    # Finish deleting projects tombstoned before the last shutdown.
+    pending = transfer.resume_tombstones([LOCAL_WORKSPACE_ROOT, warmcache.cache_dir(LOCAL_WORKSPACE_ROOT)], log=log)
+    if pending:
+        print(f"[startup] Resuming background deletion of {pending} folder(s)")
+
     print("=" * 60)
     print(f"Server ready on port {REMOTE_PORT}")
     if _tunnel and _tunnel.tunnel_url:
@@ -1207,6 +1972,9 @@ def shutdown_sequence():
         _tunnel.stop()
         _tunnel = None
 
+    stop_registry_watcher()
+    stop_project_feed()
+    stop_stats_indexer()
     set_offline_status()
     print("[shutdown] Goodbye!")
 
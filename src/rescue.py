@@ -3,6 +3,8 @@ import shutil
 import stat
 import time
 
+from transfer import fast_copy_file
+
 # --- CONFIG ---
 SOURCE_DIR = r"C:\Projects"
 BACKUP_DIR = r"G:\My Drive\projects"
@@ -47,9 +49,9 @@ def rescue_projects():
             # 1. COPY (Robust copy across drives)
             if os.path.exists(dst_path):
                 print(f"   > Destination already exists. Updating files...")
-                shutil.copytree(src_path, dst_path, dirs_exist_ok=True)
+                shutil.copytree(src_path, dst_path, dirs_exist_ok=True, copy_function=fast_copy_file)
             else:
-                shutil.copytree(src_path, dst_path)
+                shutil.copytree(src_path, dst_path, copy_function=fast_copy_file)
             
             # Verify copy successful before deleting
             if os.path.exists(dst_path):
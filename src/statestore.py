@@ -0,0 +1,480 @@
+"""SQLite state store shared by the GUI and the remote agent.
+
+``config/omni_state.db`` (WAL mode, so one process reads while the other
+writes) replaces the JSON files that were rewritten in full on every change:
+
+- ``projects``: name -> Local/Cloud/Hydrating (was project_registry.json)
+- ``categories`` / ``category_members``: GUI grouping (was categories.json)
+- ``backup_targets``: last outcome per BACKUP_MIRRORS root (was target_status.json)
+- ``transfers``: history of finished activation/deactivation/hydration jobs
+- ``project_stats``: size, file count and largest folders from the stats indexer
+- ``manifests`` / ``software``: an index of each project's omni.json, so
+  "which projects use this app" is one indexed query
+
+omni.json, ``_omni_assets/restore_map.json`` and the cloud registry in
+``_omni_sync`` travel with the project or the Drive folder, so the files stay
+the source of truth; manifests are re-read whenever a file's size or mtime
+no longer matches its row. The legacy JSON files are imported once, on the
+first open, and left in place.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import jobs
+
+STATE_DB_FILENAME = "omni_state.db"
+LEGACY_REGISTRY_FILENAME = "project_registry.json"
+LEGACY_CATEGORIES_FILENAME = "categories.json"
+LEGACY_TARGETS_FILENAME = "target_status.json"
+SCHEMA_VERSION = 2
+BUSY_TIMEOUT_MS = 5000
+TRANSFERS_KEPT = 5000
+FINISHED_STATES = (jobs.STATE_DONE, jobs.STATE_FAILED, jobs.STATE_CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_status ON projects(status);
+CREATE TABLE IF NOT EXISTS categories (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS category_members (
+    project TEXT PRIMARY KEY,
+    category TEXT NOT NULL REFERENCES categories(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS category_members_category ON category_members(category, position);
+CREATE TABLE IF NOT EXISTS manifests (
+    path TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS manifests_project ON manifests(project);
+CREATE TABLE IF NOT EXISTS software (
+    path TEXT NOT NULL REFERENCES manifests(path) ON DELETE CASCADE,
+    app_id TEXT NOT NULL,
+    PRIMARY KEY (path, app_id)
+);
+CREATE INDEX IF NOT EXISTS software_app ON software(app_id);
+CREATE TABLE IF NOT EXISTS backup_targets (
+    project TEXT NOT NULL,
+    root TEXT NOT NULL,
+    state TEXT NOT NULL,
+    message TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (project, root)
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    source TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    project TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created TEXT,
+    started TEXT,
+    finished TEXT,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    PRIMARY KEY (source, job_id)
+);
+CREATE INDEX IF NOT EXISTS transfers_project ON transfers(project, finished);
+CREATE INDEX IF NOT EXISTS transfers_finished ON transfers(finished);
+CREATE TABLE IF NOT EXISTS project_stats (
+    name TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    largest TEXT NOT NULL,
+    scanned REAL NOT NULL,
+    full_scan REAL NOT NULL,
+    dirs TEXT NOT NULL
+);
+"""
+
+_stores_lock = threading.Lock()
+_stores: Dict[str, "StateStore"] = {}
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+class StateStore:
+    """One connection per process and database, serialized by a lock.
+
+    Writes run in ``BEGIN IMMEDIATE`` transactions, so the GUI and the agent
+    never interleave half-applied changes; the busy timeout absorbs the other
+    process holding the write lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL needs shared memory; on a filesystem without it keep the rollback journal.
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    @classmethod
+    def open(cls, config_dir: str) -> "StateStore":
+        """The shared store in config_dir, importing its legacy JSON files on first use."""
+        path = os.path.abspath(os.path.join(config_dir, STATE_DB_FILENAME))
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = cls(path)
+                store.import_legacy(config_dir)
+                _stores[path] = store
+            return store
+
+    def close(self) -> None:
+        with _stores_lock:
+            if _stores.get(self.path) is self:
+                del _stores[self.path]
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def data_version(self) -> int:
+        """Changes when another connection (the other process) commits."""
+        return self._query("PRAGMA data_version")[0][0]
+
+    # --- legacy import -------------------------------------------------
+
+    def import_legacy(self, config_dir: str) -> bool:
+        """Load project_registry.json, categories.json and target_status.json once."""
+        if self._query("SELECT 1 FROM meta WHERE key = 'legacy_imported'"):
+            return False
+        registry = _read_json(os.path.join(config_dir, LEGACY_REGISTRY_FILENAME))
+        categories = _read_json(os.path.join(config_dir, LEGACY_CATEGORIES_FILENAME))
+        targets = _read_json(os.path.join(config_dir, LEGACY_TARGETS_FILENAME))
+        with self._transaction() as conn:
+            # Re-check inside the write lock: the other process may have just imported.
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return False
+            if isinstance(registry, dict):
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO projects (name, status, updated) VALUES (?, ?, ?)",
+                    [(n, s, now) for n, s in registry.items() if isinstance(s, str)],
+                )
+            if isinstance(categories, dict):
+                for position, (category, members) in enumerate(categories.items()):
+                    conn.execute("INSERT OR REPLACE INTO categories (name, position) VALUES (?, ?)",
+                                 (category, position))
+                    for i, project in enumerate(members if isinstance(members, list) else []):
+                        conn.execute("INSERT OR REPLACE INTO category_members (project, category, position) "
+                                     "VALUES (?, ?, ?)", (project, category, i))
+            if isinstance(targets, dict):
+                for project, roots in targets.items():
+                    for root, status in (roots.items() if isinstance(roots, dict) else ()):
+                        self._put_target(conn, project, root, status)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                         (time.strftime("%Y-%m-%dT%H:%M:%S"),))
+        return True
+
+    # --- projects ------------------------------------------------------
+
+    def statuses(self) -> Dict[str, str]:
+        return {row["name"]: row["status"] for row in self._query("SELECT name, status FROM projects")}
+
+    def status(self, name: str) -> Optional[str]:
+        rows = self._query("SELECT status FROM projects WHERE name = ?", (name,))
+        return rows[0]["status"] if rows else None
+
+    def set_status(self, name: str, status: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO projects (name, status, updated) VALUES (?, ?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET status = excluded.status, updated = excluded.updated "
+                         "WHERE projects.status != excluded.status", (name, status, time.time()))
+
+    def save_statuses(self, registry: Dict[str, str], prune: bool = True) -> int:
+        """Make the table match registry, touching only rows that differ; returns rows changed."""
+        with self._transaction() as conn:
+            current = {row[0]: row[1] for row in conn.execute("SELECT name, status FROM projects")}
+            now = time.time()
+            upserts = [(n, s, now) for n, s in registry.items() if current.get(n) != s]
+            conn.executemany("INSERT OR REPLACE INTO projects (name, status, updated) VALUES (?, ?, ?)", upserts)
+            removed = [(n,) for n in current if n not in registry] if prune else []
+            conn.executemany("DELETE FROM projects WHERE name = ?", removed)
+        return len(upserts) + len(removed)
+
+    def remove_project(self, name: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM projects WHERE name = ?", (name,))
+            conn.execute("DELETE FROM category_members WHERE project = ?", (name,))
+            conn.execute("DELETE FROM backup_targets WHERE project = ?", (name,))
+            conn.execute("DELETE FROM project_stats WHERE name = ?", (name,))
+
+    # --- categories ----------------------------------------------------
+
+    def categories(self) -> Dict[str, List[str]]:
+        """{"Category": ["proj", ...]} in the order categories.json used to keep."""
+        result: Dict[str, List[str]] = {}
+        for row in self._query("SELECT name FROM categories ORDER BY position, name"):
+            result[row["name"]] = []
+        for row in self._query("SELECT project, category FROM category_members ORDER BY category, position"):
+            result.setdefault(row["category"], []).append(row["project"])
+        return result
+
+    def category_of(self, project: str) -> Optional[str]:
+        rows = self._query("SELECT category FROM category_members WHERE project = ?", (project,))
+        return rows[0]["category"] if rows else None
+
+    def set_category(self, project: str, category: str) -> None:
+        """Move project into category; categories left empty are dropped (except the target)."""
+        self.set_categories([(project, category)])
+
+    def set_categories(self, moves: List[Tuple[str, str]]) -> None:
+        """Apply (project, category) moves in order, in one transaction."""
+        with self._transaction() as conn:
+            for project, category in moves:
+                self._move(conn, project, category)
+
+    @staticmethod
+    def _move(conn: sqlite3.Connection, project: str, category: str) -> None:
+        if not conn.execute("SELECT 1 FROM categories WHERE name = ?", (category,)).fetchone():
+            position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM categories").fetchone()[0]
+            conn.execute("INSERT INTO categories (name, position) VALUES (?, ?)", (category, position))
+        position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM category_members "
+                                "WHERE category = ?", (category,)).fetchone()[0]
+        conn.execute("INSERT INTO category_members (project, category, position) VALUES (?, ?, ?) "
+                     "ON CONFLICT(project) DO UPDATE SET category = excluded.category, "
+                     "position = excluded.position WHERE category_members.category != excluded.category",
+                     (project, category, position))
+        conn.execute("DELETE FROM categories WHERE name != ? AND name NOT IN "
+                     "(SELECT DISTINCT category FROM category_members)", (category,))
+
+    # --- backup targets ------------------------------------------------
+
+    @staticmethod
+    def _put_target(conn: sqlite3.Connection, project: str, root: str, status: dict) -> None:
+        conn.execute("INSERT OR REPLACE INTO backup_targets (project, root, state, message, updated) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     (project, root, status.get("state", ""), status.get("message", ""), status.get("updated", "")))
+
+    def target_statuses(self) -> Dict[str, Dict[str, dict]]:
+        result: Dict[str, Dict[str, dict]] = {}
+        for row in self._query("SELECT project, root, state, message, updated FROM backup_targets"):
+            result.setdefault(row["project"], {})[row["root"]] = {
+                "state": row["state"], "message": row["message"], "updated": row["updated"],
+            }
+        return result
+
+    def record_targets(self, project: str, statuses: Dict[str, dict]) -> None:
+        with self._transaction() as conn:
+            for root, status in statuses.items():
+                self._put_target(conn, project, root, status)
+
+    # --- transfer history ----------------------------------------------
+
+    def record_job(self, job: dict, source: str) -> bool:
+        """Keep a finished job (a JobScheduler event) in the history; other states are ignored."""
+        if job.get("state") not in FINISHED_STATES:
+            return False
+        progress = job.get("progress") or {}
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transfers (source, job_id, project, kind, state, message, created, "
+                "started, finished, files, bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, job["id"], job.get("name", ""), job.get("kind", ""), job["state"], job.get("message") or "",
+                 job.get("created"), job.get("started"), job.get("finished"),
+                 int(progress.get("files_done", 0)), int(progress.get("bytes_done", 0))),
+            )
+            conn.execute("DELETE FROM transfers WHERE rowid NOT IN "
+                         "(SELECT rowid FROM transfers ORDER BY finished DESC LIMIT ?)", (TRANSFERS_KEPT,))
+        return True
+
+    def transfers(self, project: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """Most recent first."""
+        if project is None:
+            rows = self._query("SELECT * FROM transfers ORDER BY finished DESC LIMIT ?", (limit,))
+        else:
+            rows = self._query("SELECT * FROM transfers WHERE project = ? ORDER BY finished DESC LIMIT ?",
+                               (project, limit))
+        return [dict(row) for row in rows]
+
+    # --- project stats -------------------------------------------------
+
+    def project_stats(self) -> Dict[str, dict]:
+        """name -> {"bytes", "files", "modified", "largest", "scanned"} for every indexed project."""
+        rows = self._query("SELECT name, bytes, files, modified, largest, scanned FROM project_stats")
+        return {
+            row["name"]: {"bytes": row["bytes"], "files": row["files"], "modified": row["modified"],
+                          "largest": json.loads(row["largest"]), "scanned": row["scanned"]}
+            for row in rows
+        }
+
+    def stats_state(self, name: str) -> Optional[dict]:
+        """The indexer's per-directory cache and scan times for one project."""
+        rows = self._query("SELECT scanned, full_scan, dirs FROM project_stats WHERE name = ?", (name,))
+        if not rows:
+            return None
+        return {"scanned": rows[0]["scanned"], "full_scan": rows[0]["full_scan"], "dirs": json.loads(rows[0]["dirs"])}
+
+    def put_project_stats(self, name: str, stats: dict, dirs: dict, full_scan: float) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO project_stats (name, bytes, files, modified, largest, scanned, full_scan, dirs) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, stats["bytes"], stats["files"], stats["modified"], json.dumps(stats["largest"]),
+                 stats["scanned"], full_scan, json.dumps(dirs, separators=(",", ":"))),
+            )
+
+    # --- manifests -----------------------------------------------------
+
+    def manifest(self, path: str) -> Optional[dict]:
+        """omni.json at path, from the index while the file is unchanged; None if missing or invalid."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget_manifest(path)
+            return None
+        rows = self._query("SELECT size, mtime_ns, data FROM manifests WHERE path = ?", (path,))
+        if rows and rows[0]["size"] == st.st_size and rows[0]["mtime_ns"] == st.st_mtime_ns:
+            return json.loads(rows[0]["data"])
+        data = _read_json(path)
+        if not isinstance(data, dict):
+            self._forget_manifest(path)
+            return None
+        self._put_manifest(path, data, st)
+        return data
+
+    def put_manifest(self, path: str, data: dict) -> None:
+        """Index a manifest the caller just wrote to path."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._put_manifest(path, data, st)
+
+    def _put_manifest(self, path: str, data: dict, st: os.stat_result) -> None:
+        project = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        software = {str(a) for a in data.get("software", []) if a} if isinstance(data.get("software"), list) else set()
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO manifests (path, project, size, mtime_ns, data) "
+                         "VALUES (?, ?, ?, ?, ?)", (path, project, st.st_size, st.st_mtime_ns, json.dumps(data)))
+            conn.execute("DELETE FROM software WHERE path = ?", (path,))
+            conn.executemany("INSERT INTO software (path, app_id) VALUES (?, ?)", [(path, a) for a in software])
+
+    def _forget_manifest(self, path: str) -> None:
+        if not self._query("SELECT 1 FROM manifests WHERE path = ?", (path,)):
+            return
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM manifests WHERE path = ?", (path,))
+
+    def manifest_paths_using(self, app_id: str) -> Set[str]:
+        """Indexed manifests that list app_id; call manifest() on candidates first to refresh them."""
+        return {row["path"] for row in self._query("SELECT path FROM software WHERE app_id = ?", (app_id,))}
+
+
+class CategoryIndex:
+    """The GUI's categories in memory, with a project -> category reverse index.
+
+    refresh() reloads only when another process committed to the store since
+    the last load (PRAGMA data_version, the database's equivalent of an mtime
+    check). move() applies at once in memory and queues the change; flush()
+    writes all queued moves in one transaction.
+    """
+
+    def __init__(self, store: StateStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._categories: Dict[str, List[str]] = {}
+        self._by_project: Dict[str, str] = {}
+        self._pending: List[Tuple[str, str]] = []
+
+    def refresh(self) -> None:
+        version = self.store.data_version()
+        with self._lock:
+            if version == self._version:
+                return
+            self._categories = self.store.categories()
+            self._by_project = {p: c for c, members in self._categories.items() for p in members}
+            self._version = version
+            # Queued moves are newer than what was just loaded.
+            for project, category in self._pending:
+                self._apply(project, category)
+
+    def categories(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {c: list(members) for c, members in self._categories.items()}
+
+    def category_of(self, project: str) -> Optional[str]:
+        return self._by_project.get(project)
+
+    def move(self, project: str, category: str) -> None:
+        with self._lock:
+            self._apply(project, category)
+            self._pending.append((project, category))
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def flush(self) -> int:
+        """Write queued moves; returns how many. On failure they stay queued."""
+        with self._lock:
+            moves, self._pending = self._pending, []
+        if not moves:
+            return 0
+        try:
+            self.store.set_categories(moves)
+        except Exception:
+            with self._lock:
+                self._pending = moves + self._pending
+            raise
+        return len(moves)
+
+    def _apply(self, project: str, category: str) -> None:
+        # Same rules as StateStore.set_category.
+        old = self._by_project.get(project)
+        if old == category:
+            return
+        if old is not None:
+            self._categories[old].remove(project)
+        self._categories.setdefault(category, []).append(project)
+        self._by_project[project] = category
+        for name in [c for c, members in self._categories.items() if not members and c != category]:
+            del self._categories[name]
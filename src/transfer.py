@@ -0,0 +1,2346 @@
+"""Shared copy engine used by the remote agent and the desktop GUI.
+
+Directories are created in walk order on the calling thread, file copies are
+fanned out to a bounded worker pool so slow destinations (Drive mounts, NAS
+shares) stay busy instead of waiting on one file at a time.
+"""
+import errno
+import gzip
+import hashlib
+import json
+import os
+import platform
+import queue
+import re
+import shutil
+import stat
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_COPY_WORKERS = 8
+MAX_COPY_WORKERS = 64
+
+CLOUD_META_DIRNAME = "_omni_sync"
+INDEX_DIRNAME = "index"
+INDEX_VERSION = 1
+CHECKSUM_DIRNAME = "checksums"
+CHECKSUM_VERSION = 1
+CHECKSUM_ALGORITHM = "sha256"
+HASH_CHUNK = 1024 * 1024
+
+JOURNAL_DIRNAME = "transfers"
+JOURNAL_SUFFIX = ".journal"
+# Journal op for the background fill-in after a profile activation.
+HYDRATE_OP = "hydrate"
+PART_SUFFIX = ".omnipart"
+NEW_SUFFIX = ".omninew"
+# Per-file gzip in the cloud copy (TRANSFER_COMPRESS=1); `gzip -dN -S .omnigz` undoes it by hand.
+COMPRESSED_SUFFIX = ".omnigz"
+COMPRESS_LEVEL = 6
+COMPRESS_MIN_BYTES = 1024
+# Formats that are already compressed gain nothing from a second pass.
+INCOMPRESSIBLE_EXTENSIONS = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".mp3", ".ogg", ".mp4", ".mkv", ".mov", ".webm",
+    ".zip", ".jar", ".aar", ".apk", ".aab", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".pdf", ".woff", ".woff2", ".pack", ".bundle", COMPRESSED_SUFFIX,
+})
+DEFAULT_CHUNKED_MIN_MB = 64
+COPY_CHUNK = 8 * 1024 * 1024
+PROGRESS_CHUNK = 64 * 1024 * 1024
+ByteCallback = Optional[Callable[[int], None]]
+
+IGNORE_FILENAME = ".omniignore"
+# Regenerable outputs skipped unless a global omniignore file replaces this list.
+DEFAULT_IGNORE_PATTERNS = [
+    "build/",
+    ".gradle/",
+    "node_modules/",
+    ".venv/",
+    "venv/",
+    "__pycache__/",
+    "*.pyc",
+    ".cxx/",
+    ".externalNativeBuild/",
+    ".idea/caches/",
+]
+
+
+def _int_env(name: str, default: int) -> int:
+    """Read integer env var with safe fallback for blank/invalid values."""
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def mirror_roots() -> List[Tuple[str, Optional[int]]]:
+    """BACKUP_MIRRORS: extra backup roots that folder-mode deactivations also write.
+
+    Same format as COPY_WORKERS_OVERRIDES with the count optional:
+    "D:\\NAS\\Projects=4;E:\\Backups". A missing count uses copy_workers_for.
+    """
+    roots = []
+    for part in os.getenv("BACKUP_MIRRORS", "").split(";"):
+        path, sep, count = part.rpartition("=")
+        workers = None
+        if sep and count.strip().isdigit():
+            workers = int(count.strip())
+        else:
+            path = part
+        if path.strip():
+            roots.append((os.path.abspath(path.strip()), workers))
+    return roots
+
+
+def _parse_overrides(raw: str) -> Dict[str, int]:
+    # Format: "G:\\My Drive=4;D:\\Backups=16"
+    overrides = {}
+    for part in raw.split(";"):
+        if "=" not in part:
+            continue
+        path, _, count = part.rpartition("=")
+        path = path.strip()
+        try:
+            overrides[os.path.abspath(path)] = int(count.strip())
+        except ValueError:
+            continue
+    return overrides
+
+
+def copy_workers_for(dst: str) -> int:
+    """Worker count for a destination.
+
+    COPY_WORKERS sets the default; COPY_WORKERS_OVERRIDES maps destination
+    prefixes to their own limit so a throttled sync folder can run narrower
+    than a local SSD.
+    """
+    workers = _int_env("COPY_WORKERS", DEFAULT_COPY_WORKERS)
+    overrides = _parse_overrides(os.getenv("COPY_WORKERS_OVERRIDES", ""))
+    if overrides and dst:
+        abs_dst = os.path.abspath(dst)
+        best = ""
+        for prefix, count in overrides.items():
+            if (abs_dst == prefix or abs_dst.startswith(prefix.rstrip(os.sep) + os.sep)) and len(prefix) > len(best):
+                best = prefix
+                workers = count
+    return max(1, min(workers, MAX_COPY_WORKERS))
+
+
+def is_same_file(src_path: str, dst_path: str, compare_size: bool = True) -> bool:
+    """Size and mtime match; a compressed counterpart can only be compared by mtime."""
+    try:
+        src_stat = os.stat(src_path)
+        dst_stat = os.stat(dst_path)
+    except Exception:
+        return False
+    if compare_size and src_stat.st_size != dst_stat.st_size:
+        return False
+    # Allow small timestamp drift across filesystems.
+    return abs(src_stat.st_mtime - dst_stat.st_mtime) < 1.0
+
+
+def format_size(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+class RateMeter:
+    """Moving-average rate over the last ``window`` seconds of samples."""
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self._samples: deque = deque()
+
+    def add(self, total: int, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self._samples.append((now, total))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def rate(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+        return (b1 - b0) / (t1 - t0) if t1 > t0 else 0.0
+
+
+class CopyStats:
+    """Counters shared between the walker and the copy workers.
+
+    ``bytes_done`` advances while large files are still copying, so progress,
+    throughput and ETA stay byte-accurate (and a stalled mount shows as a
+    flat rate rather than a big file).
+    """
+
+    TICK_INTERVAL = 0.5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files_total = 0
+        self.files_done = 0
+        self.files_copied = 0
+        self.files_skipped = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.bytes_copied = 0
+        self.errors: List[Tuple[str, str]] = []
+        self.excluded: List[str] = []
+        self.digests: Dict[str, str] = {}
+        self.compressed: Set[str] = set()
+        self.bytes_saved = 0
+        self.cancel: Optional[threading.Event] = None
+        self._meter = RateMeter()
+        self._meter.add(0)
+        self._last_sample = 0.0
+        self._last_tick = 0.0
+
+    def _record(self, copied: bool, size: int = 0, error: Optional[Tuple[str, str]] = None) -> int:
+        with self._lock:
+            self.files_done += 1
+            if error:
+                self.errors.append(error)
+            elif copied:
+                self.files_copied += 1
+                self.bytes_copied += size
+            else:
+                self.files_skipped += 1
+            return self.files_done
+
+    def _record_digest(self, src_path: str, digest: str) -> None:
+        with self._lock:
+            self.digests[src_path] = digest
+
+    def _record_compressed(self, src_path: str, saved: int) -> None:
+        with self._lock:
+            self.compressed.add(src_path)
+            self.bytes_saved += saved
+
+    def _add_bytes(self, n: int) -> None:
+        with self._lock:
+            self.bytes_done += n
+            now = time.monotonic()
+            if now - self._last_sample >= 0.2:
+                self._last_sample = now
+                self._meter.add(self.bytes_done, now)
+
+    def _tick_due(self) -> bool:
+        """Rate-limit mid-file progress callbacks."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_tick < self.TICK_INTERVAL:
+                return False
+            self._last_tick = now
+            return True
+
+    def throughput(self) -> float:
+        with self._lock:
+            self._meter.add(self.bytes_done)
+            return self._meter.rate()
+
+    def eta(self) -> Optional[float]:
+        rate = self.throughput()
+        if rate <= 0 or not self.bytes_total:
+            return None
+        return max(0.0, (self.bytes_total - self.bytes_done) / rate)
+
+    def progress(self) -> dict:
+        eta = self.eta()
+        return {
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "throughput_bps": int(self.throughput()),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+    @property
+    def fraction(self) -> float:
+        if self.bytes_total:
+            return min(1.0, self.bytes_done / self.bytes_total)
+        return self.files_done / self.files_total if self.files_total else 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.cancelled
+
+
+# ============================================================================
+# BACKGROUND PRIORITY AND THROTTLE
+# ============================================================================
+
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+PRIORITY_IDLE = "idle"
+BULK_NICE = {PRIORITY_LOW: 10, PRIORITY_IDLE: 19}
+IOPRIO_CLASS_BE = 2
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289,
+                        "aarch64": 30, "arm64": 30, "armv7l": 314}
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+_io_context = threading.local()
+_bulk_throttle: Optional["Throttle"] = None
+_bulk_throttle_lock = threading.Lock()
+
+
+class Throttle:
+    """Bytes-per-second cap shared by every copy worker that consumes from it.
+
+    Each chunk reserves the next slot of wire time and the worker sleeps
+    until its slot ends, so the long-run average stays at ``rate`` no matter
+    how many workers copy at once. Idle time is not banked as burst credit.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, n: int, cancel: Optional[threading.Event] = None) -> None:
+        if n <= 0 or self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + n / self.rate
+            delay = self._next - now
+        if cancel is not None:
+            cancel.wait(delay)
+        else:
+            time.sleep(delay)
+
+
+def bulk_priority() -> str:
+    """JOB_BULK_PRIORITY: low (default: nice 10, lowest best-effort I/O), idle or normal."""
+    mode = os.getenv("JOB_BULK_PRIORITY", PRIORITY_LOW).strip().lower()
+    return mode if mode in (PRIORITY_NORMAL, PRIORITY_IDLE) else PRIORITY_LOW
+
+
+def bulk_throttle() -> Optional[Throttle]:
+    """The process-wide JOB_BULK_MAX_MBPS throttle, or None when unset/0."""
+    global _bulk_throttle
+    rate = max(0, _int_env("JOB_BULK_MAX_MBPS", 0)) * 1024 * 1024
+    if not rate:
+        return None
+    with _bulk_throttle_lock:
+        if _bulk_throttle is None or _bulk_throttle.rate != rate:
+            _bulk_throttle = Throttle(rate)
+        return _bulk_throttle
+
+
+def _set_linux_ioprio(tid: int, mode: str) -> None:
+    number = _IOPRIO_SET_SYSCALLS.get(platform.machine().lower())
+    if number is None:
+        return
+    if mode == PRIORITY_IDLE:
+        value = IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT
+    else:
+        value = (IOPRIO_CLASS_BE << IOPRIO_CLASS_SHIFT) | 7
+    try:
+        import ctypes
+        ctypes.CDLL(None, use_errno=True).syscall(number, IOPRIO_WHO_PROCESS, tid, value)
+    except Exception:
+        pass
+
+
+def lower_thread_priority(mode: Optional[str] = None) -> None:
+    """Drop the calling thread to background CPU and I/O priority.
+
+    Linux renices the thread and sets its I/O class (threads and git
+    subprocesses it starts inherit both); Windows uses background mode.
+    An unprivileged process can't raise niceness back, so only call this
+    on a thread that ends with the bulk work.
+    """
+    mode = mode or bulk_priority()
+    if mode == PRIORITY_NORMAL:
+        return
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN)
+        except Exception:
+            pass
+        return
+    if not sys.platform.startswith("linux"):
+        return
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, max(os.getpriority(os.PRIO_PROCESS, tid), BULK_NICE[mode]))
+    except (AttributeError, OSError):
+        pass
+    _set_linux_ioprio(tid, mode)
+
+
+@contextmanager
+def background_io():
+    """Run the block as bulk work: low priority plus the shared throttle.
+
+    Copy pools started inside the block lower their workers the same way and
+    charge every copied byte to the throttle.
+    """
+    mode = bulk_priority()
+    lower_thread_priority(mode)
+    previous = getattr(_io_context, "settings", None)
+    _io_context.settings = (mode, bulk_throttle())
+    try:
+        yield
+    finally:
+        _io_context.settings = previous
+
+
+def current_throttle() -> Optional[Throttle]:
+    settings = getattr(_io_context, "settings", None)
+    return settings[1] if settings else None
+
+
+def pool_initializer() -> Optional[Callable[[], None]]:
+    """ThreadPoolExecutor initializer carrying the caller's background priority to its workers."""
+    settings = getattr(_io_context, "settings", None)
+    if not settings or settings[0] == PRIORITY_NORMAL:
+        return None
+    mode = settings[0]
+    return lambda: lower_thread_priority(mode)
+
+
+# ============================================================================
+# IGNORE RULES (.omniignore)
+# ============================================================================
+
+def _glob_to_regex(pattern: str) -> str:
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                out.append(pattern[i:end + 1])
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Gitignore-style matcher for project-relative, "/"-separated paths.
+
+    Supports comments, "!" negation (last match wins), trailing "/" for
+    directory-only patterns, leading or inner "/" to anchor at the project
+    root, and "**". An ignored directory is pruned entirely.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []
+        for raw in patterns:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            body = _glob_to_regex(line)
+            regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+            self.rules.append((regex, negate, dir_only))
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def extended(self, patterns: Iterable[str]) -> "IgnoreRules":
+        """A copy with extra patterns appended (so they win over earlier negations)."""
+        merged = IgnoreRules(patterns)
+        merged.rules = self.rules + merged.rules
+        return merged
+
+    def match(self, rel: str, is_dir: bool) -> bool:
+        ignored = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                ignored = not negate
+        return ignored
+
+    @classmethod
+    def for_project(cls, project_path: str, global_file: Optional[str] = None) -> "IgnoreRules":
+        """Global defaults (global_file if present) followed by the project's .omniignore."""
+        patterns = _read_patterns(global_file) if global_file and os.path.exists(global_file) else list(DEFAULT_IGNORE_PATTERNS)
+        patterns += _read_patterns(os.path.join(project_path, IGNORE_FILENAME))
+        return cls(patterns)
+
+
+def _read_patterns(path: str) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def walk_filtered(src: str, rules: Optional[IgnoreRules] = None, excluded: Optional[List[str]] = None):
+    """os.walk that prunes ignored dirs/files; pruned paths go to ``excluded``."""
+    for root, dirnames, filenames in os.walk(src):
+        if rules:
+            rel_root = os.path.relpath(root, src)
+            prefix = "" if rel_root == "." else rel_root.replace(os.sep, "/") + "/"
+            kept = []
+            for d in dirnames:
+                if rules.match(prefix + d, True):
+                    if excluded is not None:
+                        excluded.append(prefix + d + "/")
+                else:
+                    kept.append(d)
+            dirnames[:] = kept
+            files = []
+            for f in filenames:
+                if rules.match(prefix + f, False):
+                    if excluded is not None:
+                        excluded.append(prefix + f)
+                else:
+                    files.append(f)
+            filenames = files
+        yield root, dirnames, filenames
+
+
+def record_excluded(project_path: str, excluded: List[str]) -> None:
+    """Note skipped paths in omni.json so they can be regenerated after activation."""
+    manifest = os.path.join(project_path, "omni.json")
+    data = {}
+    if os.path.exists(manifest):
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                data = loaded
+        except Exception:
+            return
+    paths = sorted(set(excluded))
+    if data.get("excluded_paths", []) == paths or (not paths and "excluded_paths" not in data):
+        return
+    data["excluded_paths"] = paths
+    # Replace rather than rewrite in place: the file may be a hard link into the blob store.
+    tmp = manifest + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp, manifest)
+    except OSError:
+        pass
+
+
+def read_excluded(project_path: str) -> List[str]:
+    try:
+        with open(os.path.join(project_path, "omni.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return []
+    paths = data.get("excluded_paths") if isinstance(data, dict) else None
+    return list(paths) if isinstance(paths, list) else []
+
+
+def activation_profile(project_path: str, profile: Optional[str] = None) -> Optional[IgnoreRules]:
+    """Patterns of the subtrees a profile needs first, from omni.json.
+
+    omni.json may define ``"activation_profiles": {"source": ["src/", "*.gradle"]}``
+    (gitignore-style patterns) and ``"default_activation_profile"``. Returns
+    None for a full activation: no profiles, an unknown name or "full".
+    """
+    try:
+        with open(os.path.join(project_path, "omni.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict):
+        return None
+    profiles = data.get("activation_profiles")
+    name = profile or data.get("default_activation_profile")
+    if not isinstance(profiles, dict) or not name or not isinstance(profiles.get(name), list):
+        return None
+    rules = IgnoreRules(profiles[name])
+    return rules or None
+
+
+def _profile_includes(include: IgnoreRules, rel: str) -> bool:
+    if rel == "omni.json" or include.match(rel, False):
+        return True
+    parts = rel.split("/")
+    return any(include.match("/".join(parts[:i]), True) for i in range(1, len(parts)))
+
+
+class TransferJournal:
+    """Append-only record of finished files for one activate/deactivate.
+
+    Each line is a small JSON object: a header describing the transfer,
+    then {"d": dst_path} per completed file (plus "h", its content hash, when
+    the copy was hashed) and {"o": dst_path, "n": offset} for progress inside
+    large files. A torn final line after a crash is
+    ignored. A journal whose header doesn't match the new attempt is
+    discarded.
+    """
+
+    def __init__(self, path: str, op: str, src: str, dst: str):
+        self.path = path
+        self.op = op
+        self.src = src
+        self.dst = dst
+        self._lock = threading.Lock()
+        self.done: set = set()
+        self.digests: Dict[str, str] = {}
+        self.offsets: Dict[str, int] = {}
+        # A destination that vanished since the crash can't be trusted to resume into.
+        resumed = os.path.isdir(dst) and self._load()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fh = open(path, "a" if resumed else "w", encoding="utf-8")
+        if not resumed:
+            self._write({"op": op, "src": src, "dst": dst, "started": time.time()})
+        self.resumed = resumed
+
+    @classmethod
+    def open(cls, journal_dir: str, op: str, name: str, src: str, dst: str) -> "TransferJournal":
+        return cls(journal_path(journal_dir, op, name), op, src, dst)
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except Exception:
+            return False
+        if not lines:
+            return False
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return False
+        if header.get("op") != self.op or header.get("src") != self.src or header.get("dst") != self.dst:
+            return False
+        for line in lines[1:]:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "d" in rec:
+                self.done.add(rec["d"])
+                self.offsets.pop(rec["d"], None)
+                if rec.get("h"):
+                    self.digests[rec["d"]] = rec["h"]
+            elif "o" in rec:
+                self.offsets[rec["o"]] = int(rec.get("n", 0))
+        return True
+
+    def _write(self, rec: dict, sync: bool = False) -> None:
+        self._fh.write(json.dumps(rec) + "\n")
+        self._fh.flush()
+        if sync:
+            os.fsync(self._fh.fileno())
+
+    def is_done(self, dst_path: str) -> bool:
+        return dst_path in self.done
+
+    def offset(self, dst_path: str) -> int:
+        return self.offsets.get(dst_path, 0)
+
+    def mark_done(self, dst_path: str, digest: Optional[str] = None) -> None:
+        with self._lock:
+            self.done.add(dst_path)
+            self.offsets.pop(dst_path, None)
+            rec = {"d": dst_path}
+            if digest:
+                self.digests[dst_path] = digest
+                rec["h"] = digest
+            self._write(rec)
+
+    def record_offset(self, dst_path: str, offset: int) -> None:
+        with self._lock:
+            self.offsets[dst_path] = offset
+            self._write({"o": dst_path, "n": offset}, sync=True)
+
+    def close(self) -> None:
+        try:
+            self._fh.close()
+        except Exception:
+            pass
+
+    def complete(self) -> None:
+        """Transfer finished: the journal is no longer needed."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def journal_path(journal_dir: str, op: str, name: str) -> str:
+    return os.path.join(journal_dir, f"{op}-{name}{JOURNAL_SUFFIX}")
+
+
+def pending_journals(journal_dir: str) -> Dict[str, str]:
+    """Map project name -> op for transfers that never completed."""
+    pending = {}
+    try:
+        names = os.listdir(journal_dir)
+    except OSError:
+        return pending
+    for fname in names:
+        if not fname.endswith(JOURNAL_SUFFIX):
+            continue
+        op, sep, name = fname[:-len(JOURNAL_SUFFIX)].partition("-")
+        if sep and name:
+            pending[name] = op
+    return pending
+
+
+def _chunked_min_bytes() -> int:
+    return max(1, _int_env("TRANSFER_CHUNKED_MIN_MB", DEFAULT_CHUNKED_MIN_MB)) * 1024 * 1024
+
+
+def _copy_chunked(
+    src_path: str,
+    dst_path: str,
+    journal: TransferJournal,
+    on_bytes: ByteCallback = None,
+    hasher=None,
+) -> None:
+    """Copy a large file through a .omnipart file, journaling each chunk.
+
+    With a hasher the bytes go through userspace so they can be hashed on
+    the way; a resumed copy hashes the already-copied prefix from src.
+    """
+    part = dst_path + PART_SUFFIX
+    try:
+        part_size = os.path.getsize(part)
+    except OSError:
+        part_size = 0
+    offset = min(journal.offset(dst_path), part_size)
+    kernel = hasher is None and hasattr(os, "copy_file_range") and \
+        copy_method_for(src_path, part) in ("reflink", "copy_file_range")
+    with open(src_path, "rb") as fsrc, open(part, "r+b" if offset else "wb") as fdst:
+        if hasher is not None:
+            remaining = offset
+            while remaining > 0:
+                buf = fsrc.read(min(COPY_CHUNK, remaining))
+                if not buf:
+                    break
+                hasher.update(buf)
+                remaining -= len(buf)
+        fsrc.seek(offset)
+        fdst.seek(offset)
+        fdst.truncate()
+        size = os.fstat(fsrc.fileno()).st_size
+        if on_bytes and offset:
+            on_bytes(offset)
+        while offset < size:
+            n = 0
+            if kernel:
+                try:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK, offset, offset)
+                except OSError:
+                    kernel = False
+            if not n:
+                fsrc.seek(offset)
+                fdst.seek(offset)
+                buf = fsrc.read(COPY_CHUNK)
+                if not buf:
+                    break
+                fdst.write(buf)
+                if hasher is not None:
+                    hasher.update(buf)
+                n = len(buf)
+            offset += n
+            fdst.flush()
+            os.fsync(fdst.fileno())
+            journal.record_offset(dst_path, offset)
+            if on_bytes:
+                on_bytes(n)
+    shutil.copystat(src_path, part)
+    os.replace(part, dst_path)
+
+
+# ============================================================================
+# KERNEL COPY (reflink / copy_file_range / sendfile)
+# ============================================================================
+
+FICLONE = 0x40049409
+COPY_METHODS = ("reflink", "copy_file_range", "sendfile", "copyfile")
+# errnos meaning "this method does not work between these two filesystems".
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EBADF,
+}
+_copy_caps: Dict[Tuple[int, int], int] = {}
+_copy_caps_lock = threading.Lock()
+
+
+def _reflink(src_path: str, dst_path: str, on_bytes: ByteCallback = None) -> None:
+    import fcntl
+    with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        if on_bytes:
+            on_bytes(os.fstat(fsrc.fileno()).st_size)
+
+
+def _copy_file_range(src_path: str, dst_path: str, on_bytes: ByteCallback = None) -> None:
+    step = PROGRESS_CHUNK if on_bytes else 1 << 30
+    with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, step))
+            if n == 0:
+                # Some filesystems report success without copying anything.
+                raise OSError(errno.EINVAL, "copy_file_range made no progress")
+            remaining -= n
+            if on_bytes:
+                on_bytes(n)
+
+
+def _sendfile(src_path: str, dst_path: str, on_bytes: ByteCallback = None) -> None:
+    step = PROGRESS_CHUNK if on_bytes else 1 << 30
+    with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        while remaining > 0:
+            n = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, min(remaining, step))
+            if n == 0:
+                raise OSError(errno.EINVAL, "sendfile made no progress")
+            offset += n
+            remaining -= n
+            if on_bytes:
+                on_bytes(n)
+
+
+def _copyfile(src_path: str, dst_path: str, on_bytes: ByteCallback = None) -> None:
+    size = os.path.getsize(src_path)
+    if not on_bytes or size < PROGRESS_CHUNK:
+        shutil.copyfile(src_path, dst_path)
+        if on_bytes:
+            on_bytes(size)
+        return
+    # Large file with a progress listener: stream so progress moves mid-file.
+    with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+        while True:
+            buf = fsrc.read(COPY_CHUNK)
+            if not buf:
+                break
+            fdst.write(buf)
+            on_bytes(len(buf))
+
+
+def _method_available(method: str) -> bool:
+    if method == "reflink":
+        return os.name == "posix" and sys.platform.startswith("linux")
+    if method == "copy_file_range":
+        return hasattr(os, "copy_file_range")
+    if method == "sendfile":
+        return hasattr(os, "sendfile") and sys.platform.startswith("linux")
+    return True
+
+
+_COPIERS = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "copyfile": _copyfile,
+}
+
+
+def _volume_pair(src_path: str, dst_path: str) -> Tuple[int, int]:
+    try:
+        return os.stat(src_path).st_dev, os.stat(os.path.dirname(os.path.abspath(dst_path))).st_dev
+    except OSError:
+        return -1, -1
+
+
+def copy_method_for(src_path: str, dst_path: str) -> str:
+    """The first method fast_copy_file will try for this pair of volumes."""
+    forced = os.getenv("COPY_METHOD", "auto").strip().lower()
+    if forced in COPY_METHODS:
+        return forced
+    with _copy_caps_lock:
+        start = _copy_caps.get(_volume_pair(src_path, dst_path), 0)
+    return next(m for m in COPY_METHODS[start:] if _method_available(m))
+
+
+def fast_copy_file(src_path: str, dst_path: str, on_bytes: ByteCallback = None) -> str:
+    """Copy data and metadata letting the kernel do the work where it can.
+
+    Tries a copy-on-write clone, then copy_file_range, then sendfile, then
+    shutil.copyfile (CopyFile on Windows). A method that fails as unsupported
+    is remembered per (source volume, destination volume) and not tried again.
+    COPY_METHOD forces a starting method. ``on_bytes`` receives the byte
+    count of each chunk as it lands. Returns the method that worked.
+    """
+    key = _volume_pair(src_path, dst_path)
+    start = COPY_METHODS.index(copy_method_for(src_path, dst_path))
+    for index in range(start, len(COPY_METHODS)):
+        method = COPY_METHODS[index]
+        if not _method_available(method):
+            continue
+        reported = [0]
+
+        def counted(n: int) -> None:
+            reported[0] += n
+            on_bytes(n)
+
+        try:
+            if on_bytes:
+                _COPIERS[method](src_path, dst_path, counted)
+            else:
+                _COPIERS[method](src_path, dst_path)
+        except OSError as e:
+            if reported[0]:
+                on_bytes(-reported[0])  # the next method starts over
+            if method == "copyfile" or e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            with _copy_caps_lock:
+                _copy_caps[key] = max(_copy_caps.get(key, 0), index + 1)
+            continue
+        shutil.copystat(src_path, dst_path)
+        return method
+    raise OSError(errno.ENOSYS, "No copy method available")
+
+
+def copy_file(
+    src_path: str,
+    dst_path: str,
+    journal: Optional[TransferJournal] = None,
+    on_bytes: ByteCallback = None,
+    algorithm: Optional[str] = None,
+) -> Optional[str]:
+    """Copy one file; with ``algorithm`` the content is hashed while it streams
+    and the hex digest is returned."""
+    hasher = hashlib.new(algorithm) if algorithm else None
+    if journal is not None and os.path.getsize(src_path) >= _chunked_min_bytes():
+        _copy_chunked(src_path, dst_path, journal, on_bytes, hasher)
+    elif hasher is not None:
+        _copy_hashed(src_path, dst_path, hasher, on_bytes)
+    else:
+        fast_copy_file(src_path, dst_path, on_bytes)
+    return hasher.hexdigest() if hasher is not None else None
+
+
+def _copy_hashed(src_path: str, dst_path: str, hasher, on_bytes: ByteCallback = None) -> None:
+    """Read/write copy that feeds every byte to hasher (one read of src, none of dst)."""
+    written = 0
+    with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        while True:
+            buf = fsrc.read(COPY_CHUNK)
+            if not buf:
+                break
+            fdst.write(buf)
+            hasher.update(buf)
+            written += len(buf)
+            if on_bytes:
+                on_bytes(len(buf))
+    if written < size:
+        raise OSError(errno.EIO, f"short copy: {written} of {size} bytes")
+    shutil.copystat(src_path, dst_path)
+
+
+def _size_or_zero(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# ============================================================================
+# COMPRESSED TRANSFER
+# ============================================================================
+
+def compression_enabled() -> bool:
+    return os.getenv("TRANSFER_COMPRESS", "0").strip() == "1"
+
+
+def compressible(path: str) -> bool:
+    """Worth gzipping on the way to the cloud copy.
+
+    omni.json stays plain: it is read straight from the cloud copy.
+    """
+    name = os.path.basename(path)
+    if name == "omni.json" or os.path.splitext(name)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return False
+    return _size_or_zero(path) >= COMPRESS_MIN_BYTES
+
+
+def plain_name(rel: str) -> str:
+    """The project path a cloud copy entry stands for, compressed or not."""
+    return rel[: -len(COMPRESSED_SUFFIX)] if rel.endswith(COMPRESSED_SUFFIX) else rel
+
+
+def _compress_file(src_path: str, dst_path: str, on_bytes: ByteCallback = None, hasher=None) -> int:
+    """gzip src into dst_path + COMPRESSED_SUFFIX while streaming; returns the stored size.
+
+    The hasher sees the plain bytes, so checksums still describe the local file.
+    Not resumable mid-file like _copy_chunked: a gzip stream can't be appended to.
+    """
+    target = dst_path + COMPRESSED_SUFFIX
+    part = target + PART_SUFFIX
+    try:
+        with open(src_path, "rb") as fsrc, open(part, "wb") as raw:
+            # mtime=0 keeps the stream deterministic; the file's mtime comes from copystat.
+            with gzip.GzipFile(os.path.basename(dst_path), "wb", COMPRESS_LEVEL, raw, mtime=0) as fgz:
+                while True:
+                    buf = fsrc.read(COPY_CHUNK)
+                    if not buf:
+                        break
+                    fgz.write(buf)
+                    if hasher is not None:
+                        hasher.update(buf)
+                    if on_bytes:
+                        on_bytes(len(buf))
+            stored = raw.tell()
+        shutil.copystat(src_path, part)
+        os.replace(part, target)
+    except BaseException:
+        _remove_part(part)
+        raise
+    return stored
+
+
+def _expand_file(src_path: str, dst_path: str, on_bytes: ByteCallback = None, hasher=None) -> None:
+    """Restore a COMPRESSED_SUFFIX file to dst_path; progress counts compressed bytes read."""
+    part = dst_path + PART_SUFFIX
+    try:
+        with open(src_path, "rb") as raw, open(part, "wb") as fdst:
+            consumed = 0
+            with gzip.GzipFile(fileobj=raw, mode="rb") as fgz:
+                while True:
+                    buf = fgz.read(COPY_CHUNK)
+                    if not buf:
+                        break
+                    fdst.write(buf)
+                    if hasher is not None:
+                        hasher.update(buf)
+                    if on_bytes:
+                        pos = raw.tell()
+                        on_bytes(pos - consumed)
+                        consumed = pos
+        shutil.copystat(src_path, part)
+        os.replace(part, dst_path)
+    except BaseException:
+        _remove_part(part)
+        raise
+
+
+def _remove_part(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _place_new(staged: str, dst_path: str) -> bool:
+    """Move staged to dst_path unless a file appeared there; False if that file was kept."""
+    try:
+        # A hard link fails instead of replacing, so a file created meanwhile always wins.
+        os.link(staged, dst_path)
+    except FileExistsError:
+        _remove_part(staged)
+        return False
+    except OSError:
+        if os.path.lexists(dst_path):
+            _remove_part(staged)
+            return False
+        os.replace(staged, dst_path)
+        return True
+    _remove_part(staged)
+    return True
+
+
+def _remove_alternate(dst_path: str, compressed: bool) -> None:
+    """Drop the other form of dst_path, left by a sync with the other setting."""
+    try:
+        os.remove(dst_path if compressed else dst_path + COMPRESSED_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def _make_copier(
+    stats: CopyStats,
+    slots: threading.BoundedSemaphore,
+    skip_unchanged: bool,
+    on_file: Optional[Callable[[CopyStats], None]],
+    log: Optional[Callable[[str], None]],
+    journal: Optional[TransferJournal] = None,
+    algorithm: Optional[str] = None,
+    compress: bool = False,
+    replace_alternate: bool = False,
+    skip_existing: bool = False,
+) -> Callable[[str, str], None]:
+    throttle = current_throttle()
+
+    def copy_one(src_path: str, dst_path: str) -> None:
+        counted = [0]
+        # A compressed cloud entry is restored under its original name.
+        expand = src_path.endswith(COMPRESSED_SUFFIX) and dst_path.endswith(COMPRESSED_SUFFIX)
+        if expand:
+            dst_path = dst_path[: -len(COMPRESSED_SUFFIX)]
+        shrink = compress and not expand and compressible(src_path)
+        stored_path = dst_path + COMPRESSED_SUFFIX if shrink else dst_path
+
+        def on_bytes(n: int) -> None:
+            counted[0] += n
+            stats._add_bytes(n)
+            if throttle is not None:
+                throttle.consume(n, stats.cancel)
+            if on_file and stats._tick_due():
+                try:
+                    on_file(stats)
+                except Exception:
+                    pass
+
+        try:
+            if stats.cancelled:
+                stats._record(False, error=(src_path, "cancelled"))
+            elif (journal is not None and journal.is_done(dst_path)) or (
+                skip_existing and os.path.lexists(stored_path)
+            ) or (
+                skip_unchanged and is_same_file(src_path, stored_path, compare_size=not (expand or shrink))
+            ):
+                if algorithm:
+                    # Copied earlier: the journal has the digest of the bytes written,
+                    # else hash the (local) source; the Drive copy is never read back.
+                    digest = journal.digests.get(dst_path) if journal is not None else None
+                    stats._record_digest(src_path, digest or file_digest(src_path, algorithm))
+                stats._add_bytes(_size_or_zero(src_path))
+                stats._record(False)
+            else:
+                # With skip_existing the copy is staged and only placed if nothing appeared meanwhile.
+                write_path = dst_path + NEW_SUFFIX if skip_existing and not shrink else dst_path
+                if expand or shrink:
+                    hasher = hashlib.new(algorithm) if algorithm else None
+                    if shrink:
+                        stored = _compress_file(src_path, dst_path, on_bytes, hasher)
+                        stats._record_compressed(src_path, _size_or_zero(src_path) - stored)
+                    else:
+                        _expand_file(src_path, write_path, on_bytes, hasher)
+                    digest = hasher.hexdigest() if hasher is not None else None
+                else:
+                    digest = copy_file(src_path, write_path, journal, on_bytes, algorithm)
+                if write_path != dst_path and not _place_new(write_path, dst_path) and log:
+                    log(f"Kept local {dst_path}: it changed while the copy was running")
+                if replace_alternate:
+                    _remove_alternate(dst_path, shrink)
+                if journal is not None:
+                    journal.mark_done(dst_path, digest)
+                if digest:
+                    stats._record_digest(src_path, digest)
+                # Progress counts source bytes, which is what bytes_total was sized from.
+                size = _size_or_zero(src_path if expand or shrink else dst_path)
+                if counted[0] != size:
+                    stats._add_bytes(size - counted[0])
+                stats._record(True, size)
+        except Exception as e:
+            if counted[0]:
+                stats._add_bytes(-counted[0])
+            stats._record(False, error=(src_path, str(e)))
+            if log:
+                log(f"Copy failed: {src_path} -> {dst_path} ({e})")
+        finally:
+            slots.release()
+        if on_file:
+            try:
+                on_file(stats)
+            except Exception:
+                pass
+
+    return copy_one
+
+
+def copy_tree(
+    src: str,
+    dst: str,
+    workers: Optional[int] = None,
+    skip_unchanged: bool = True,
+    on_file: Optional[Callable[[CopyStats], None]] = None,
+    log: Optional[Callable[[str], None]] = None,
+    stats: Optional[CopyStats] = None,
+    journal: Optional[TransferJournal] = None,
+    rules: Optional[IgnoreRules] = None,
+    cancel: Optional[threading.Event] = None,
+    skip_existing: bool = False,
+) -> CopyStats:
+    """Copy src into dst using a bounded worker pool.
+
+    Per-file failures are collected in the returned stats (and passed to
+    ``log``) instead of aborting the whole tree. Paths matched by ``rules``
+    are skipped and listed in ``stats.excluded``. Setting ``cancel`` stops
+    the copy between files; the journal (if any) lets it resume later.
+    Compressed cloud entries are expanded under their original names.
+    With ``skip_existing`` only missing files are copied; an existing
+    destination file is never overwritten, whatever its size or mtime.
+    """
+    stats = stats or CopyStats()
+    stats.cancel = cancel or stats.cancel
+    if not os.path.exists(src):
+        return stats
+    workers = workers or copy_workers_for(dst)
+    # Bound in-flight work so a 50k-file tree doesn't queue 50k futures at once.
+    slots = threading.BoundedSemaphore(workers * 4)
+    copy_one = _make_copier(stats, slots, skip_unchanged, on_file, log, journal, skip_existing=skip_existing)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-copy",
+                            initializer=pool_initializer()) as pool:
+        for root, _dirs, files in walk_filtered(src, rules, stats.excluded):
+            if stats.cancelled:
+                break
+            rel = os.path.relpath(root, src)
+            dest_root = dst if rel == "." else os.path.join(dst, rel)
+            try:
+                # Walk is top-down, so parents always exist before children.
+                os.makedirs(dest_root, exist_ok=True)
+            except Exception as e:
+                for fname in files:
+                    stats._record(False, error=(os.path.join(root, fname), str(e)))
+                if log:
+                    log(f"Create dir failed: {dest_root} ({e})")
+                continue
+            # One walk: the tree is sized as it is enumerated, not counted up front.
+            paths = [os.path.join(root, fname) for fname in files]
+            size = sum(_size_or_zero(p) for p in paths)
+            with stats._lock:
+                stats.files_total += len(files)
+                stats.bytes_total += size
+            for path, fname in zip(paths, files):
+                slots.acquire()
+                pool.submit(copy_one, path, os.path.join(dest_root, fname))
+    return stats
+
+
+def copy_files(
+    pairs: Iterable[Tuple[str, str]],
+    workers: int,
+    skip_unchanged: bool = False,
+    on_file: Optional[Callable[[CopyStats], None]] = None,
+    log: Optional[Callable[[str], None]] = None,
+    stats: Optional[CopyStats] = None,
+    journal: Optional[TransferJournal] = None,
+    cancel: Optional[threading.Event] = None,
+    algorithm: Optional[str] = None,
+    compress: bool = False,
+    replace_alternate: bool = False,
+) -> CopyStats:
+    """Copy an explicit list of (src, dst) files; destination dirs must exist.
+
+    With ``algorithm`` each file is hashed while it is copied and the digests
+    are collected in ``stats.digests`` (keyed by source path). With
+    ``compress`` compressible files are stored gzipped as dst + COMPRESSED_SUFFIX;
+    ``replace_alternate`` removes the other form of each file written.
+    """
+    stats = stats or CopyStats()
+    stats.cancel = cancel or stats.cancel
+    slots = threading.BoundedSemaphore(workers * 4)
+    copy_one = _make_copier(stats, slots, skip_unchanged, on_file, log, journal, algorithm,
+                            compress, replace_alternate)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-copy",
+                            initializer=pool_initializer()) as pool:
+        for src_path, dst_path in pairs:
+            if stats.cancelled:
+                break
+            slots.acquire()
+            pool.submit(copy_one, src_path, dst_path)
+    return stats
+
+
+def copy_profile(
+    src: str,
+    dst: str,
+    include: IgnoreRules,
+    workers: Optional[int] = None,
+    on_file: Optional[Callable[[CopyStats], None]] = None,
+    log: Optional[Callable[[str], None]] = None,
+    journal: Optional[TransferJournal] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[CopyStats, int]:
+    """Copy only the files an activation profile needs first (plus omni.json).
+
+    Every directory is created so the project looks complete; a later
+    copy_tree fills in the rest. Returns the stats and the total byte size
+    of src, so callers can report how much of the project is local.
+    """
+    stats = CopyStats()
+    stats.cancel = cancel
+    if not os.path.exists(src):
+        return stats, 0
+    workers = workers or copy_workers_for(dst)
+    dirs, files = scan_tree(src)
+    os.makedirs(dst, exist_ok=True)
+    for rel in dirs:
+        try:
+            os.makedirs(os.path.join(dst, rel), exist_ok=True)
+        except OSError as e:
+            if log:
+                log(f"Create dir failed: {os.path.join(dst, rel)} ({e})")
+    selected = [rel for rel in files if _profile_includes(include, plain_name(rel))]
+    stats.files_total = len(selected)
+    stats.bytes_total = sum(files[rel]["size"] for rel in selected)
+    pairs = ((os.path.join(src, rel), os.path.join(dst, rel)) for rel in selected)
+    copy_files(pairs, workers, skip_unchanged=True, on_file=on_file, log=log, stats=stats, journal=journal)
+    return stats, sum(e["size"] for e in files.values())
+
+
+# ============================================================================
+# PER-PROJECT FILE INDEX (DELTA SYNC)
+# ============================================================================
+
+def project_index_path(drive_root: str, name: str) -> str:
+    """Index for a project's cloud copy, kept next to the cloud registry."""
+    return os.path.join(drive_root, CLOUD_META_DIRNAME, INDEX_DIRNAME, f"{name}.json")
+
+
+def _hash_enabled() -> bool:
+    return os.getenv("SYNC_INDEX_HASH", "").strip() == "1"
+
+
+def file_digest(path: str, algorithm: str = "sha1") -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _gzip_plain_size(path: str) -> int:
+    """Plain size modulo 2**32 from a gzip file's ISIZE trailer (a 4-byte read)."""
+    with open(path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+def load_index(index_path: Optional[str]) -> Optional[dict]:
+    if not index_path or not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return None
+    data.setdefault("files", {})
+    data.setdefault("dirs", [])
+    return data
+
+
+def has_compressed(index_path: Optional[str]) -> bool:
+    """The cloud copy holds gzipped entries, so it can't just be renamed into place."""
+    data = load_index(index_path)
+    return data is not None and any(entry.get("z") for entry in data["files"].values())
+
+
+def save_index(index_path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp = index_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, index_path)
+
+
+# ============================================================================
+# CHECKSUM MANIFEST (VERIFY BEFORE DELETE)
+# ============================================================================
+
+def project_checksum_path(drive_root: str, name: str) -> str:
+    """Content hashes of a project's cloud copy, next to its sync index."""
+    return os.path.join(drive_root, CLOUD_META_DIRNAME, CHECKSUM_DIRNAME, f"{name}.json")
+
+
+def load_checksums(checksum_path: Optional[str]) -> Optional[dict]:
+    if not checksum_path or not os.path.exists(checksum_path):
+        return None
+    try:
+        with open(checksum_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != CHECKSUM_VERSION:
+        return None
+    if data.get("algorithm") != CHECKSUM_ALGORITHM or not isinstance(data.get("files"), dict):
+        return None
+    return data
+
+
+def _write_checksums(
+    checksum_path: str,
+    src: str,
+    current: Dict[str, dict],
+    digests: Dict[str, str],
+    failed: set,
+    log: Optional[Callable[[str], None]] = None,
+) -> None:
+    """Record {rel: size, mtime, hash} for every file that is in the cloud copy.
+
+    Copied files use the digest of the bytes written. Files the sync skipped
+    keep their previous entry when size and mtime match, otherwise the local
+    source is hashed; the Drive copy is never read back.
+    """
+    previous = load_checksums(checksum_path)
+    old_files = previous["files"] if previous else {}
+    files = {}
+    for rel, entry in current.items():
+        if rel in failed:
+            continue
+        src_path = os.path.join(src, rel)
+        digest = digests.get(src_path)
+        old = old_files.get(rel)
+        if digest is None and old and old.get("size") == entry["size"] \
+                and abs(old.get("mtime", 0) - entry["mtime"]) < 1.0:
+            digest = old.get("hash")
+        if digest is None:
+            try:
+                digest = file_digest(src_path, CHECKSUM_ALGORITHM)
+            except OSError:
+                continue
+        files[rel] = {"size": entry["size"], "mtime": entry["mtime"], "hash": digest}
+    try:
+        save_index(checksum_path, {"version": CHECKSUM_VERSION, "algorithm": CHECKSUM_ALGORITHM, "files": files})
+    except Exception as e:
+        if log:
+            log(f"Checksum manifest save failed: {checksum_path} ({e})")
+
+
+def verify_copy(
+    src: str,
+    dst: str,
+    checksum_path: Optional[str],
+    rules: Optional[IgnoreRules] = None,
+) -> List[Tuple[str, str]]:
+    """Confirm dst holds every file of src before src is deleted.
+
+    A file is confirmed when the checksum manifest has a hash for it, src
+    has not changed since (size and mtime) and dst has it at the same size.
+    dst is never read in full: plain files are stat'ed and compressed
+    entries only have their gzip size trailer read, so a compressed entry's
+    content is not re-hashed. Returns (rel, problem) pairs; an empty list
+    means src is safe to delete.
+    """
+    data = load_checksums(checksum_path)
+    if data is None:
+        return [("", "no checksum manifest")]
+    recorded = data["files"]
+    _dirs, current = scan_tree(src, rules)
+    problems: List[Tuple[str, str]] = []
+    for rel, entry in current.items():
+        rec = recorded.get(rel)
+        if rec is None or not rec.get("hash"):
+            problems.append((rel, "not hashed during copy"))
+        elif rec.get("size") != entry["size"] or rec.get("mtime") != entry["mtime"]:
+            problems.append((rel, "changed since it was copied"))
+        else:
+            try:
+                size = os.path.getsize(os.path.join(dst, rel))
+            except OSError:
+                compressed = os.path.join(dst, rel + COMPRESSED_SUFFIX)
+                if not os.path.exists(compressed):
+                    problems.append((rel, "missing from copy"))
+                    continue
+                try:
+                    if _gzip_plain_size(compressed) != entry["size"] % 2 ** 32:
+                        problems.append((rel, "compressed copy has the wrong size"))
+                except OSError as e:
+                    problems.append((rel, f"compressed copy unreadable ({e})"))
+                continue
+            if size != entry["size"]:
+                problems.append((rel, f"copy has {size} of {entry['size']} bytes"))
+    return problems
+
+
+def scan_tree(
+    src: str,
+    rules: Optional[IgnoreRules] = None,
+    excluded: Optional[List[str]] = None,
+) -> Tuple[List[str], Dict[str, dict]]:
+    """Enumerate src once; returns (relative dirs top-down, {relpath: entry})."""
+    dirs: List[str] = []
+    files: Dict[str, dict] = {}
+    for root, dirnames, filenames in walk_filtered(src, rules, excluded):
+        rel_root = os.path.relpath(root, src)
+        rel_root = "" if rel_root == "." else rel_root.replace(os.sep, "/")
+        for d in dirnames:
+            dirs.append(f"{rel_root}/{d}" if rel_root else d)
+        for fname in filenames:
+            rel = f"{rel_root}/{fname}" if rel_root else fname
+            try:
+                st = os.stat(os.path.join(root, fname))
+            except OSError:
+                continue
+            files[rel] = {"size": st.st_size, "mtime": st.st_mtime}
+    return dirs, files
+
+
+def _entry_changed(src_path: str, entry: dict, previous: Optional[dict], use_hash: bool) -> bool:
+    if previous is None:
+        return True
+    if previous.get("size") != entry["size"]:
+        return True
+    if abs(previous.get("mtime", 0) - entry["mtime"]) < 1.0:
+        if use_hash and previous.get("sha1"):
+            entry["sha1"] = previous["sha1"]
+        return False
+    # Same size, new mtime (e.g. git checkout): content hash decides.
+    if use_hash and previous.get("sha1"):
+        try:
+            entry["sha1"] = file_digest(src_path)
+        except OSError:
+            return True
+        return entry["sha1"] != previous["sha1"]
+    return True
+
+
+class SyncTarget:
+    """One destination of a sync: its index, checksum manifest and worker count.
+
+    ``stats`` collects this destination's own skips, errors and digests, so
+    with several targets one failing copy is reported (and retried) alone.
+    """
+
+    def __init__(
+        self,
+        dst: str,
+        index_path: Optional[str] = None,
+        checksum_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        root: Optional[str] = None,
+    ):
+        self.dst = dst
+        self.index_path = index_path
+        self.checksum_path = checksum_path
+        self.workers = workers or copy_workers_for(dst)
+        self.root = root
+        self.stats = CopyStats()
+        self.files: Dict[str, dict] = {}
+        self.to_copy: List[str] = []
+        self.dst_existed = False
+        self.previous: Optional[dict] = None
+        self.old_files: Dict[str, dict] = {}
+
+    def plan(
+        self,
+        src: str,
+        current: Dict[str, dict],
+        dirs: List[str],
+        use_hash: bool,
+        log: Optional[Callable[[str], None]] = None,
+    ) -> bool:
+        """Pick the files to copy, apply deletions and create dirs; False if dst is unusable."""
+        stats = self.stats
+        self.dst_existed = os.path.isdir(self.dst)
+        self.previous = load_index(self.index_path) if self.dst_existed else None
+        self.old_files = self.previous["files"] if self.previous else {}
+        old_dirs = set(self.previous["dirs"]) if self.previous else set()
+        # Each target records its own index entries (hashes, "z", failures).
+        self.files = {rel: dict(entry) for rel, entry in current.items()}
+        self.to_copy = []
+        for rel, entry in self.files.items():
+            if self.previous is None or _entry_changed(os.path.join(src, rel), entry, self.old_files.get(rel), use_hash):
+                self.to_copy.append(rel)
+            else:
+                stats.files_skipped += 1
+        stats.files_total = len(self.to_copy)
+        stats.bytes_total = sum(self.files[rel]["size"] for rel in self.to_copy)
+        stats.files_done = 0
+
+        if self.previous is not None:
+            _propagate_deletions(self.dst, set(self.files), set(dirs), self.old_files, old_dirs, log)
+
+        try:
+            os.makedirs(self.dst, exist_ok=True)
+        except Exception as e:
+            stats.errors.append((self.dst, str(e)))
+            return False
+        for rel in dirs:
+            if rel in old_dirs:
+                continue
+            try:
+                os.makedirs(os.path.join(self.dst, rel), exist_ok=True)
+            except Exception as e:
+                if log:
+                    log(f"Create dir failed: {os.path.join(self.dst, rel)} ({e})")
+        return True
+
+    @property
+    def skip_unchanged(self) -> bool:
+        # Without an index, an existing destination still gets the stat-based skip.
+        return self.previous is None and self.dst_existed
+
+    def replace_alternate(self, compress: bool) -> bool:
+        # A file can only switch form (plain <-> compressed) if compression is or was in use.
+        return self.dst_existed and (
+            compress or self.previous is None or any(e.get("z") for e in self.old_files.values())
+        )
+
+    def finish(self, src: str, dirs: List[str], use_hash: bool, log: Optional[Callable[[str], None]] = None) -> None:
+        """Write the checksum manifest and index for what landed in this target."""
+        stats = self.stats
+        current = self.files
+        copied = set(self.to_copy)
+        for rel, entry in current.items():
+            if rel in copied:
+                if os.path.join(src, rel) in stats.compressed:
+                    entry["z"] = True
+            elif self.old_files.get(rel, {}).get("z"):
+                entry["z"] = True
+
+        if self.checksum_path and not stats.cancelled:
+            failed_paths = {os.path.relpath(p, src).replace(os.sep, "/") for p, _ in stats.errors}
+            _write_checksums(self.checksum_path, src, current, stats.digests, failed_paths, log)
+
+        # A cancelled sync leaves the old index; the journal covers what did land.
+        if self.index_path and not stats.cancelled:
+            failed = {os.path.relpath(p, src).replace(os.sep, "/") for p, _ in stats.errors}
+            for rel in failed:
+                # Keep the last known-good entry (or none) so the next sync retries.
+                if rel in self.old_files:
+                    current[rel] = self.old_files[rel]
+                else:
+                    current.pop(rel, None)
+            if use_hash:
+                for rel in self.to_copy:
+                    entry = current.get(rel)
+                    if rel in failed or entry is None or "sha1" in entry:
+                        continue
+                    try:
+                        entry["sha1"] = file_digest(os.path.join(src, rel))
+                    except OSError:
+                        pass
+            try:
+                save_index(self.index_path, {"version": INDEX_VERSION, "files": current, "dirs": dirs})
+            except Exception as e:
+                if log:
+                    log(f"Index save failed: {self.index_path} ({e})")
+
+
+def sync_tree(
+    src: str,
+    dst: str,
+    index_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    hash_files: Optional[bool] = None,
+    on_file: Optional[Callable[[CopyStats], None]] = None,
+    log: Optional[Callable[[str], None]] = None,
+    journal: Optional[TransferJournal] = None,
+    rules: Optional[IgnoreRules] = None,
+    cancel: Optional[threading.Event] = None,
+    checksum_path: Optional[str] = None,
+    compress: bool = False,
+) -> CopyStats:
+    """Mirror src into dst, transferring only what changed since the last sync.
+
+    With a valid index the destination is never stat'ed: unchanged files are
+    skipped from the index alone and files/dirs that vanished from src are
+    deleted from dst. Without one it falls back to a full copy that skips
+    files whose size and mtime already match. With checksum_path, copies are
+    hashed inline and the manifest is rewritten for verify_copy. With
+    compress, compressible files are stored gzipped (marked "z" in the index).
+    """
+    target = SyncTarget(dst, index_path, checksum_path, workers)
+    stats = target.stats
+    stats.cancel = cancel
+    if not os.path.exists(src):
+        return stats
+    use_hash = _hash_enabled() if hash_files is None else hash_files
+    dirs, current = scan_tree(src, rules, stats.excluded)
+    if not target.plan(src, current, dirs, use_hash, log):
+        return stats
+
+    pairs = ((os.path.join(src, rel), os.path.join(dst, rel)) for rel in target.to_copy)
+    copy_files(pairs, target.workers, skip_unchanged=target.skip_unchanged,
+               on_file=on_file, log=log, stats=stats, journal=journal,
+               algorithm=CHECKSUM_ALGORITHM if checksum_path else None,
+               compress=compress, replace_alternate=target.replace_alternate(compress))
+    target.finish(src, dirs, use_hash, log)
+    return stats
+
+
+def _tee_file(
+    src_path: str,
+    outputs: List[Tuple[str, ThreadPoolExecutor]],
+    compress: bool,
+    hasher=None,
+    on_bytes: ByteCallback = None,
+    journal: Optional[TransferJournal] = None,
+) -> Tuple[List[Optional[Exception]], int]:
+    """Read src once and write every chunk to all outputs, each on its own writer pool.
+
+    An output that fails is dropped and the rest carry on. With compress the
+    stream is gzipped once and the same bytes land as dst + COMPRESSED_SUFFIX
+    everywhere. Returns per-output errors and the stored size.
+
+    Every byte goes through userspace, so unlike copy_file there is no
+    reflink or copy_file_range even for a same-volume primary; one read for
+    all targets is the trade. Large plain files still resume like
+    _copy_chunked: each chunk is fsynced and its offset journaled per
+    output, and a retry continues from the smallest offset all outputs have.
+    """
+    suffix = COMPRESSED_SUFFIX if compress else ""
+    errors: List[Optional[Exception]] = [None] * len(outputs)
+    handles = {}
+    resumable = journal is not None and not compress and _size_or_zero(src_path) >= _chunked_min_bytes()
+    start = 0
+    if resumable:
+        offsets = []
+        for dst_path, _pool in outputs:
+            try:
+                part_size = os.path.getsize(dst_path + PART_SUFFIX)
+            except OSError:
+                part_size = 0
+            offsets.append(min(journal.offset(dst_path), part_size))
+        start = min(offsets)
+    for i, (dst_path, _pool) in enumerate(outputs):
+        try:
+            handle = open(dst_path + suffix + PART_SUFFIX, "r+b" if start else "wb")
+            if start:
+                handle.seek(start)
+                handle.truncate()
+            handles[i] = handle
+        except OSError as e:
+            errors[i] = e
+
+    def fail(i: int, error: Exception) -> None:
+        errors[i] = error
+        handle = handles.pop(i)
+        try:
+            handle.close()
+        except OSError:
+            pass
+        if not resumable:
+            _remove_part(handle.name)  # a resumable part is kept with its journaled offset
+
+    def write_durable(handle, data: bytes) -> None:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    write = write_durable if resumable else (lambda handle, data: handle.write(data))
+
+    def write_all(data: bytes) -> None:
+        futures = {i: outputs[i][1].submit(write, handle, data) for i, handle in handles.items()}
+        for i, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                fail(i, e)
+
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    stored = start
+    try:
+        with open(src_path, "rb") as fsrc:
+            if start:
+                if hasher is not None:
+                    remaining = start
+                    while remaining > 0:
+                        buf = fsrc.read(min(COPY_CHUNK, remaining))
+                        if not buf:
+                            break
+                        hasher.update(buf)
+                        remaining -= len(buf)
+                fsrc.seek(start)
+                if on_bytes:
+                    on_bytes(start)
+            offset = start
+            while handles:
+                buf = fsrc.read(COPY_CHUNK)
+                if not buf:
+                    break
+                if hasher is not None:
+                    hasher.update(buf)
+                data = compressor.compress(buf) if compressor else buf
+                if data:
+                    write_all(data)
+                    stored += len(data)
+                offset += len(buf)
+                if resumable:
+                    for i in handles:
+                        journal.record_offset(outputs[i][0], offset)
+                if on_bytes:
+                    on_bytes(len(buf))
+            if compressor is not None and handles:
+                data = compressor.flush()
+                write_all(data)
+                stored += len(data)
+    except Exception as e:
+        # The source itself failed: no output is complete.
+        for i in list(handles):
+            fail(i, e)
+    for i in list(handles):
+        handle = handles[i]
+        try:
+            handle.close()
+            shutil.copystat(src_path, handle.name)
+            os.replace(handle.name, outputs[i][0] + suffix)
+        except Exception as e:
+            fail(i, e)
+        else:
+            handles.pop(i)
+    return errors, stored
+
+
+def sync_targets(
+    src: str,
+    targets: List[SyncTarget],
+    hash_files: Optional[bool] = None,
+    on_file: Optional[Callable[[CopyStats], None]] = None,
+    log: Optional[Callable[[str], None]] = None,
+    journal: Optional[TransferJournal] = None,
+    rules: Optional[IgnoreRules] = None,
+    cancel: Optional[threading.Event] = None,
+    compress: bool = False,
+) -> CopyStats:
+    """sync_tree into several destinations, reading each source file once.
+
+    Every target keeps its own index, checksums and deletions, and writes
+    through its own pool of ``target.workers`` threads, so a slow NAS and a
+    Drive folder each get their own concurrency. A file that fails on one
+    target is an error in that target's stats only. Returns the overall
+    stats (source bytes read, for progress); check ``target.stats`` per target.
+    """
+    stats = CopyStats()
+    stats.cancel = cancel
+    if not os.path.exists(src):
+        return stats
+    use_hash = _hash_enabled() if hash_files is None else hash_files
+    dirs, current = scan_tree(src, rules, stats.excluded)
+    live = []
+    for target in targets:
+        target.stats.cancel = cancel
+        target.stats.excluded = stats.excluded
+        if target.plan(src, current, dirs, use_hash, log):
+            live.append(target)
+        elif log:
+            log(f"Sync target unavailable: {target.dst} ({target.stats.errors[0][1]})")
+    wanted: Dict[str, List[SyncTarget]] = {}
+    for target in live:
+        for rel in target.to_copy:
+            wanted.setdefault(rel, []).append(target)
+    stats.files_total = len(wanted)
+    stats.bytes_total = sum(current[rel]["size"] for rel in wanted)
+    stats.files_skipped = len(current) - len(wanted)
+    throttle = current_throttle()
+    writers = {
+        id(target): ThreadPoolExecutor(max_workers=target.workers, thread_name_prefix="omni-write",
+                                       initializer=pool_initializer())
+        for target in live
+    }
+
+    def tee_one(rel: str, wanting: List[SyncTarget]) -> None:
+        src_path = os.path.join(src, rel)
+        pending = []
+        try:
+            for target in wanting:
+                dst_path = os.path.join(target.dst, rel)
+                stored_path = dst_path + COMPRESSED_SUFFIX if compress and compressible(src_path) else dst_path
+                if stats.cancelled:
+                    target.stats._record(False, error=(src_path, "cancelled"))
+                elif (journal is not None and journal.is_done(dst_path)) or (
+                    target.skip_unchanged and is_same_file(src_path, stored_path, compare_size=stored_path == dst_path)
+                ):
+                    # A resumed run reuses the digest journaled when the file landed.
+                    digest = journal.digests.get(dst_path) if journal is not None else None
+                    if digest and target.checksum_path:
+                        target.stats._record_digest(src_path, digest)
+                    target.stats._record(False)
+                else:
+                    pending.append(target)
+            if not pending:
+                stats._add_bytes(current[rel]["size"])
+                stats._record(False)
+                return
+            shrink = compress and compressible(src_path)
+            hasher = hashlib.new(CHECKSUM_ALGORITHM) if any(t.checksum_path for t in pending) else None
+            counted = [0]
+
+            def on_bytes(n: int) -> None:
+                counted[0] += n
+                stats._add_bytes(n)
+                if throttle is not None:
+                    throttle.consume(n, stats.cancel)
+                if on_file and stats._tick_due():
+                    try:
+                        on_file(stats)
+                    except Exception:
+                        pass
+
+            outputs = [(os.path.join(t.dst, rel), writers[id(t)]) for t in pending]
+            errors, stored = _tee_file(src_path, outputs, shrink, hasher, on_bytes, journal)
+            size = _size_or_zero(src_path)
+            if counted[0] != size:
+                stats._add_bytes(size - counted[0])
+            digest = hasher.hexdigest() if hasher is not None else None
+            landed = 0
+            failures = []
+            for target, (dst_path, _pool), error in zip(pending, outputs, errors):
+                if error is None and target.replace_alternate(compress):
+                    try:
+                        _remove_alternate(dst_path, shrink)
+                    except OSError as e:
+                        error = e
+                if error is not None:
+                    failures.append(str(error))
+                    target.stats._record(False, error=(src_path, str(error)))
+                    if log:
+                        log(f"Copy failed: {src_path} -> {dst_path} ({error})")
+                    continue
+                if journal is not None:
+                    journal.mark_done(dst_path, digest)
+                if digest and target.checksum_path:
+                    target.stats._record_digest(src_path, digest)
+                if shrink:
+                    target.stats._record_compressed(src_path, size - stored)
+                target.stats._record(True, size)
+                landed += 1
+            if landed:
+                stats._record(True, size)
+            else:
+                stats._record(False, error=(src_path, failures[0]))
+        except Exception as e:
+            for target in pending:
+                target.stats._record(False, error=(src_path, str(e)))
+            stats._record(False, error=(src_path, str(e)))
+            if log:
+                log(f"Copy failed: {src_path} ({e})")
+        finally:
+            slots.release()
+        if on_file:
+            try:
+                on_file(stats)
+            except Exception:
+                pass
+
+    readers = max([t.workers for t in live] or [1])
+    slots = threading.BoundedSemaphore(readers * 4)
+    try:
+        with ThreadPoolExecutor(max_workers=readers, thread_name_prefix="omni-copy",
+                                initializer=pool_initializer()) as pool:
+            for rel, wanting in wanted.items():
+                if stats.cancelled:
+                    break
+                slots.acquire()
+                pool.submit(tee_one, rel, wanting)
+    finally:
+        for writer in writers.values():
+            writer.shutdown()
+    for target in live:
+        target.finish(src, dirs, use_hash, log)
+    return stats
+
+
+def target_status(state: str, message: str = "") -> dict:
+    """A backup target's outcome for one project: ok, failed, offline or skipped."""
+    return {"state": state, "message": message, "updated": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def mirror_targets(name: str, primary_root: Optional[str] = None) -> Tuple[List[SyncTarget], Dict[str, dict]]:
+    """SyncTargets for a project under each reachable BACKUP_MIRRORS root.
+
+    Roots that don't exist (an unmounted NAS) are not created; they come
+    back as "offline" statuses instead.
+    """
+    targets: List[SyncTarget] = []
+    statuses: Dict[str, dict] = {}
+    primary = os.path.abspath(primary_root) if primary_root else None
+    for root, workers in mirror_roots():
+        if root == primary:
+            continue
+        if not os.path.isdir(root):
+            statuses[root] = target_status("offline", "backup root not reachable")
+            continue
+        targets.append(SyncTarget(os.path.join(root, name), project_index_path(root, name),
+                                  project_checksum_path(root, name), workers, root=root))
+    return targets, statuses
+
+
+def settle_mirrors(
+    src: str,
+    targets: List[SyncTarget],
+    rules: Optional[IgnoreRules],
+    excluded: List[str],
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, dict]:
+    """Finish each mirror after sync_targets: note excluded paths, verify, and report its status."""
+    statuses: Dict[str, dict] = {}
+    for target in targets:
+        errors = target.stats.errors
+        if errors:
+            rel, error = errors[0]
+            message = f"{len(errors)} file(s) failed, first: {rel} ({error})"
+        elif target.stats.cancelled:
+            message = "cancelled"
+        else:
+            record_excluded(target.dst, excluded)
+            problems = verify_copy(src, target.dst, target.checksum_path, rules)
+            if not problems:
+                statuses[target.root] = target_status("ok")
+                continue
+            rel, problem = problems[0]
+            message = f"{len(problems)} file(s) not confirmed, first: {rel} ({problem})"
+        statuses[target.root] = target_status("failed", message)
+        if log:
+            log(f"Mirror {target.dst} failed: {message}")
+    return statuses
+
+
+def prune_extraneous(
+    dst: str,
+    keep_files: Iterable[str],
+    keep_dirs: Iterable[str] = (),
+    rules: Optional[IgnoreRules] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> int:
+    """Delete files and dirs from dst that are not in keep_* (relative "/" paths).
+
+    Paths the ignore rules exclude are spared, so build outputs kept in a
+    reused local tree survive. Returns the number of files removed.
+    """
+    keep_files = {plain_name(rel) for rel in keep_files}
+    keep_dirs = set(keep_dirs)
+    dst_dirs, dst_files = scan_tree(dst, rules)
+    removed = 0
+    for rel in dst_files:
+        if rel not in keep_files:
+            try:
+                os.remove(os.path.join(dst, rel))
+                removed += 1
+            except OSError as e:
+                if log:
+                    log(f"Delete failed: {os.path.join(dst, rel)} ({e})")
+    for rel in reversed(dst_dirs):
+        if rel not in keep_dirs:
+            try:
+                os.rmdir(os.path.join(dst, rel))
+            except OSError:
+                pass  # not empty: holds excluded content
+    return removed
+
+
+def _propagate_deletions(
+    dst: str,
+    files: set,
+    dirs: set,
+    old_files: Dict[str, dict],
+    old_dirs: set,
+    log: Optional[Callable[[str], None]],
+) -> None:
+    for rel, entry in old_files.items():
+        if rel in files:
+            continue
+        try:
+            os.remove(os.path.join(dst, rel + COMPRESSED_SUFFIX if entry.get("z") else rel))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            if log:
+                log(f"Delete failed: {os.path.join(dst, rel)} ({e})")
+    # Deepest first so children are gone before their parents.
+    for rel in sorted(old_dirs - dirs, key=lambda d: d.count("/"), reverse=True):
+        try:
+            os.rmdir(os.path.join(dst, rel))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            shutil.rmtree(os.path.join(dst, rel), ignore_errors=True)
+
+
+# ============================================================================
+# SAME-VOLUME FAST PATH
+# ============================================================================
+
+def _rename_enabled() -> bool:
+    return os.getenv("SAME_VOLUME_RENAME", "1").strip() != "0"
+
+
+def _existing_ancestor(path: str) -> Optional[str]:
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    return path
+
+
+def same_volume(a: str, b: str) -> bool:
+    """True when a and b (or their nearest existing ancestors) share a device."""
+    try:
+        a_path = _existing_ancestor(a)
+        b_path = _existing_ancestor(b)
+        if not a_path or not b_path:
+            return False
+        return os.stat(a_path).st_dev == os.stat(b_path).st_dev
+    except OSError:
+        return False
+
+
+def rename_tree(src: str, dst: str, log: Optional[Callable[[str], None]] = None) -> bool:
+    """Move src to dst with a single rename when both sit on one volume.
+
+    Returns False (leaving src untouched) whenever the caller should fall
+    back to copying: different devices, an existing destination, the fast
+    path disabled via SAME_VOLUME_RENAME=0, or the rename itself failing
+    (e.g. a file held open on Windows).
+    """
+    if not _rename_enabled() or not os.path.isdir(src) or os.path.exists(dst):
+        return False
+    parent = os.path.dirname(os.path.abspath(dst))
+    if not same_volume(src, parent):
+        return False
+    try:
+        os.makedirs(parent, exist_ok=True)
+        os.rename(src, dst)
+    except OSError as e:
+        if log:
+            log(f"Rename fast path failed: {src} -> {dst} ({e})")
+        return False
+    return True
+
+
+def invalidate_index(index_path: Optional[str]) -> None:
+    """Drop a project's sync index and the checksum manifest kept beside it."""
+    if not index_path:
+        return
+    meta_dir, fname = os.path.split(os.path.dirname(index_path))[0], os.path.basename(index_path)
+    for path in (index_path, os.path.join(meta_dir, CHECKSUM_DIRNAME, fname)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ============================================================================
+# BACKGROUND DELETION (TOMBSTONES)
+# ============================================================================
+
+TRASH_DIRNAME = ".omni_trash"
+
+
+def _hide_path(path: str) -> None:
+    if os.name != "nt":
+        return
+    try:
+        import ctypes
+        ctypes.windll.kernel32.SetFileAttributesW(path, 0x02)  # FILE_ATTRIBUTE_HIDDEN
+    except Exception:
+        pass
+
+
+def tombstone(path: str) -> Optional[str]:
+    """Rename path into a hidden trash dir beside it; None if that fails.
+
+    The rename is atomic and stays on the same volume, so the project
+    disappears from the workspace immediately while deletion happens later.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    trash = os.path.join(parent, TRASH_DIRNAME)
+    target = os.path.join(trash, f"{os.path.basename(path)}-{int(time.time() * 1000)}")
+    try:
+        if not os.path.isdir(trash):
+            os.makedirs(trash, exist_ok=True)
+            _hide_path(trash)
+        os.rename(path, target)
+    except OSError:
+        return None
+    return target
+
+
+def _is_link(path: str) -> bool:
+    # Junctions are Windows directory links that islink() does not report before 3.12.
+    return os.path.islink(path) or getattr(os.path, "isjunction", lambda _p: False)(path)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        if _is_link(path):
+            # A Windows directory link is removed with rmdir; never chmod through a link.
+            os.rmdir(path)
+            return
+        # Git packs and other read-only files on Windows.
+        os.chmod(path, stat.S_IWRITE)
+        os.remove(path)
+
+
+def delete_tree(path: str, workers: Optional[int] = None, log: Optional[Callable[[str], None]] = None) -> int:
+    """Delete a tree with files removed in parallel; returns the failure count.
+
+    Links to directories (e.g. ``.venv/lib64 -> lib``) are unlinked like
+    files; nothing outside the tree is entered, deleted or chmod'ed.
+    """
+    if _is_link(path):
+        try:
+            _remove_file(path)
+        except OSError as e:
+            if log:
+                log(f"Delete failed: {e}")
+            return 1
+        return 0
+    workers = workers or copy_workers_for(path)
+    errors = 0
+    dirs: List[str] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-delete") as pool:
+        futures = []
+        for root, dirnames, filenames in os.walk(path):
+            dirs.append(root)
+            links = [d for d in dirnames if _is_link(os.path.join(root, d))]
+            if links:
+                dirnames[:] = [d for d in dirnames if d not in links]
+            futures.extend(pool.submit(_remove_file, os.path.join(root, f)) for f in filenames + links)
+        for future in futures:
+            try:
+                future.result()
+            except OSError as e:
+                errors += 1
+                if log:
+                    log(f"Delete failed: {e}")
+    # Reversed top-down walk order: children before their parents.
+    for d in reversed(dirs):
+        try:
+            os.rmdir(d)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            try:
+                os.chmod(d, stat.S_IWRITE | stat.S_IREAD | stat.S_IEXEC)
+                os.rmdir(d)
+            except OSError as e:
+                errors += 1
+                if log:
+                    log(f"Delete failed: {d} ({e})")
+    return errors
+
+
+class TombstoneReaper:
+    """Single background thread that deletes tombstoned trees one at a time."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[str, Optional[Callable[[str], None]]]]" = queue.Queue()
+        self._queued: set = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, path: str, log: Optional[Callable[[str], None]] = None) -> None:
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+            self._queue.put((path, log))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="omni-reaper", daemon=True)
+                self._thread.start()
+
+    def resume(self, roots: Iterable[Optional[str]], log: Optional[Callable[[str], None]] = None) -> int:
+        """Queue tombstones left behind by an earlier run."""
+        count = 0
+        for root in roots:
+            if not root:
+                continue
+            trash = os.path.join(root, TRASH_DIRNAME)
+            try:
+                names = os.listdir(trash)
+            except OSError:
+                continue
+            for name in names:
+                self.submit(os.path.join(trash, name), log)
+                count += 1
+        return count
+
+    def wait(self) -> None:
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                path, log = self._queue.get(timeout=5)
+            except queue.Empty:
+                # Exit when idle; submit() starts a new thread under the same lock.
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            try:
+                started = time.time()
+                errors = delete_tree(path, log=log)
+                if log:
+                    if errors:
+                        log(f"Background delete of {path}: {errors} item(s) left, will retry next start")
+                    else:
+                        log(f"Background delete of {os.path.basename(path)} done ({time.time() - started:.1f}s)")
+                trash = os.path.dirname(path)
+                try:
+                    os.rmdir(trash)  # only succeeds once the trash is empty
+                except OSError:
+                    pass
+            except Exception as e:
+                if log:
+                    log(f"Background delete of {path} failed: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(path)
+                self._queue.task_done()
+
+
+_reaper = TombstoneReaper()
+
+
+def remove_tree_later(path: str, log: Optional[Callable[[str], None]] = None) -> bool:
+    """Tombstone path and delete it in the background.
+
+    Returns False when the rename is not possible (file locked, odd
+    filesystem); the caller should then delete synchronously.
+    """
+    target = tombstone(path)
+    if target is None:
+        return False
+    _reaper.submit(target, log)
+    return True
+
+
+def resume_tombstones(roots: Iterable[Optional[str]], log: Optional[Callable[[str], None]] = None) -> int:
+    return _reaper.resume(roots, log)
+
+
+def wait_for_deletions() -> None:
+    _reaper.wait()
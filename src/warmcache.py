@@ -0,0 +1,154 @@
+"""Local warm cache of recently deactivated projects.
+
+Instead of deleting a deactivated tree, it is renamed into a hidden
+``.omni_cache`` folder in the workspace (same volume, so the move is instant
+and needs no extra space). Re-activating the project renames it back and
+only the delta against the cloud copy is transferred. Entries are evicted
+least-recently-used first to stay within WARM_CACHE_MB (0 disables the
+cache); evicted trees go through the usual background deletion.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import transfer
+
+CACHE_DIRNAME = ".omni_cache"
+CACHE_INDEX_FILENAME = "cache.json"
+
+_lock = threading.Lock()
+
+
+def cache_dir(workspace_root: str) -> str:
+    return os.path.join(workspace_root, CACHE_DIRNAME)
+
+
+def budget_bytes() -> int:
+    return max(0, transfer._int_env("WARM_CACHE_MB", 0)) * 1024 * 1024
+
+
+def tree_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for fname in files:
+            try:
+                total += os.lstat(os.path.join(root, fname)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class WarmCache:
+    def __init__(self, workspace_root: str, budget: int):
+        self.root = cache_dir(workspace_root)
+        self.budget = budget
+        self.index_path = os.path.join(self.root, CACHE_INDEX_FILENAME)
+
+    @classmethod
+    def for_workspace(cls, workspace_root: Optional[str]) -> Optional["WarmCache"]:
+        """The workspace's cache, or None when WARM_CACHE_MB is unset/0."""
+        budget = budget_bytes()
+        if not workspace_root or budget <= 0:
+            return None
+        return cls(workspace_root, budget)
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        entries = data.get("entries") if isinstance(data, dict) else None
+        if not isinstance(entries, dict):
+            return {}
+        # Drop entries whose tree vanished (manual cleanup, crash mid-eviction).
+        return {n: e for n, e in entries.items() if os.path.isdir(self.path_for(n))}
+
+    def _save(self, entries: Dict[str, dict]) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def entries(self) -> Dict[str, dict]:
+        with _lock:
+            return self._load()
+
+    def put(self, name: str, path: str, log: Optional[Callable[[str], None]] = None) -> bool:
+        """Move a deactivated tree into the cache.
+
+        Returns False (path untouched) if it doesn't fit the budget or can't be
+        renamed; the caller then deletes it as before.
+        """
+        size = tree_size(path)
+        if size > self.budget:
+            return False
+        with _lock:
+            entries = self._load()
+            try:
+                if not os.path.isdir(self.root):
+                    os.makedirs(self.root, exist_ok=True)
+                    transfer._hide_path(self.root)
+                self._evict(entries, name, log)
+                os.rename(path, self.path_for(name))
+            except OSError as e:
+                if log:
+                    log(f"Warm cache: could not keep {name} ({e})")
+                return False
+            entries[name] = {"bytes": size, "stored": time.time()}
+            self._evict_to_budget(entries, log)
+            self._save_quietly(entries, log)
+        if log:
+            log(f"Warm cache: kept {name} ({transfer.format_size(size)})")
+        return True
+
+    def take(self, name: str, dst: str) -> bool:
+        """Move a cached tree to dst (which must not exist); False on a miss."""
+        with _lock:
+            entries = self._load()
+            if name not in entries or os.path.exists(dst):
+                return False
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+                os.rename(self.path_for(name), dst)
+            except OSError:
+                return False
+            entries.pop(name, None)
+            self._save_quietly(entries)
+        return True
+
+    def discard(self, name: str, log: Optional[Callable[[str], None]] = None) -> None:
+        with _lock:
+            entries = self._load()
+            if name in entries:
+                self._evict(entries, name, log)
+                self._save_quietly(entries, log)
+
+    def _evict(self, entries: Dict[str, dict], name: str, log: Optional[Callable[[str], None]]) -> None:
+        entries.pop(name, None)
+        path = self.path_for(name)
+        if os.path.exists(path) and not transfer.remove_tree_later(path, log=log):
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _evict_to_budget(self, entries: Dict[str, dict], log: Optional[Callable[[str], None]]) -> None:
+        total = sum(e.get("bytes", 0) for e in entries.values())
+        for name in sorted(entries, key=lambda n: entries[n].get("stored", 0)):
+            if total <= self.budget:
+                break
+            total -= entries[name].get("bytes", 0)
+            self._evict(entries, name, log)
+            if log:
+                log(f"Warm cache: evicted {name}")
+
+    def _save_quietly(self, entries: Dict[str, dict], log: Optional[Callable[[str], None]] = None) -> None:
+        try:
+            self._save(entries)
+        except OSError as e:
+            if log:
+                log(f"Warm cache index save failed: {e}")
@@ -0,0 +1,229 @@
+"""Directory watcher that tells the agent when its project registry is stale.
+
+The registry is derived from the top-level folders of the workspace, the
+transfer journals and the registry file itself. Instead of rescanning them
+on every request, a background thread watches those directories and calls
+``on_change`` after each burst of changes:
+
+- ``inotify`` (Linux): the kernel reports folder creates, deletes and
+  renames; nothing is scanned until something actually changed.
+- ``poll`` (elsewhere, or when inotify is unavailable): every
+  REGISTRY_POLL_SECONDS the watched directories are stat'ed and a change of
+  their mtime counts as a change.
+
+REGISTRY_WATCH selects auto (default), poll or off.
+"""
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+import transfer
+
+WATCH_AUTO = "auto"
+WATCH_POLL = "poll"
+WATCH_OFF = "off"
+WATCH_INOTIFY = "inotify"
+DEFAULT_POLL_SECONDS = 2
+DEBOUNCE_SECONDS = 0.2
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+
+def watch_mode() -> str:
+    mode = os.getenv("REGISTRY_WATCH", WATCH_AUTO).strip().lower()
+    return mode if mode in (WATCH_POLL, WATCH_OFF) else WATCH_AUTO
+
+
+def poll_seconds() -> float:
+    return max(1, transfer._int_env("REGISTRY_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+
+
+class _Watch:
+    """One watched directory: only folders (dirs_only) or only the given names count."""
+
+    def __init__(self, path: str, names: Optional[Set[str]], dirs_only: bool):
+        self.path = path
+        self.names = names
+        self.dirs_only = dirs_only
+
+    def matches(self, name: str, is_dir: bool) -> bool:
+        if self.names is not None:
+            return name in self.names
+        return is_dir or not self.dirs_only
+
+
+class DirectoryWatcher:
+    def __init__(self, on_change: Callable[[], None], mode: Optional[str] = None,
+                 interval: Optional[float] = None, log: Optional[Callable[[str], None]] = None):
+        self.on_change = on_change
+        self.requested = mode or watch_mode()
+        self.interval = interval or poll_seconds()
+        self.log = log
+        self.mode = WATCH_OFF
+        self._watches: List[_Watch] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+
+    def watch(self, path: str, names: Optional[Set[str]] = None, dirs_only: bool = False) -> None:
+        """Watch path (created if missing); call before start()."""
+        os.makedirs(path, exist_ok=True)
+        self._watches.append(_Watch(os.path.abspath(path), names, dirs_only))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> str:
+        """Start watching in the background; returns the mode in use (off when disabled)."""
+        if self.requested == WATCH_OFF or not self._watches or self.running:
+            return self.mode
+        wds = self._init_inotify() if self.requested == WATCH_AUTO else None
+        if wds is not None:
+            self.mode = WATCH_INOTIFY
+            target = lambda: self._inotify_loop(wds)  # noqa: E731
+        else:
+            self.mode = WATCH_POLL
+            # Baseline now, so a change made right after start() is not missed.
+            baseline = self._snapshot()
+            target = lambda: self._poll_loop(baseline)  # noqa: E731
+        self._stop.clear()
+        self._thread = threading.Thread(target=target, name="omni-watch", daemon=True)
+        self._thread.start()
+        return self.mode
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._close_fd()
+        self.mode = WATCH_OFF
+
+    def _notify(self) -> None:
+        try:
+            self.on_change()
+        except Exception as e:
+            if self.log:
+                self.log(f"Watcher callback failed: {e}")
+
+    # --- inotify -------------------------------------------------------
+
+    def _init_inotify(self) -> Optional[Dict[int, _Watch]]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return None
+            self._fd = fd
+            wds = {}
+            for w in self._watches:
+                wd = libc.inotify_add_watch(fd, os.fsencode(w.path), _WATCH_MASK)
+                if wd < 0:
+                    # e.g. the per-user watch limit is exhausted.
+                    self._close_fd()
+                    return None
+                wds[wd] = w
+            return wds
+        except Exception:
+            self._close_fd()
+            return None
+
+    def _close_fd(self) -> None:
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+    def _read_events(self, wds: Dict[int, _Watch]) -> Optional[bool]:
+        """Drain pending events: True if one is relevant, None if a watch was lost."""
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        relevant = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                return None
+            if mask & IN_Q_OVERFLOW:
+                relevant = True
+                continue
+            w = wds.get(wd)
+            if w is not None and w.matches(name, bool(mask & IN_ISDIR)):
+                relevant = True
+        return relevant
+
+    def _inotify_loop(self, wds: Dict[int, _Watch]) -> None:
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 1.0)
+                if not ready:
+                    continue
+                changed = self._read_events(wds)
+                # Let a burst (a tree being moved in, a journal rewritten) settle first.
+                while changed is not None and select.select([self._fd], [], [], DEBOUNCE_SECONDS)[0]:
+                    more = self._read_events(wds)
+                    changed = None if more is None else changed or more
+            except (OSError, ValueError):
+                changed = None
+            if changed is None:
+                # A watched directory was removed or renamed: fall back to polling.
+                self._close_fd()
+                self.mode = WATCH_POLL
+                if self.log:
+                    self.log("Watcher: inotify watch lost, polling instead")
+                self._notify()
+                self._poll_loop()
+                return
+            if changed:
+                self._notify()
+
+    # --- polling -------------------------------------------------------
+
+    def _snapshot(self) -> Dict[str, float]:
+        stamps = {}
+        for w in self._watches:
+            paths = [os.path.join(w.path, n) for n in w.names] if w.names is not None else [w.path]
+            for path in paths:
+                try:
+                    stamps[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    stamps[path] = -1
+        return stamps
+
+    def _poll_loop(self, last: Optional[Dict[str, float]] = None) -> None:
+        if last is None:
+            last = self._snapshot()
+        while not self._stop.wait(self.interval):
+            current = self._snapshot()
+            if current != last:
+                last = current
+                self._notify()
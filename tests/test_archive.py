@@ -0,0 +1,100 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+import shutil
+import zipfile
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import archive
+
+
+def _write(path, data="content"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class TestPackedArchive(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "workspace", "proj")
+        self.drive = os.path.join(self.test_dir, "drive")
+        self.dst = os.path.join(self.test_dir, "restored", "proj")
+        _write(os.path.join(self.src, "omni.json"), json.dumps({"storage": "archive", "software": ["Git.Git"]}))
+        for i in range(5):
+            _write(os.path.join(self.src, ".git", "objects", f"{i:02d}", "obj"), f"blob {i}")
+        _write(os.path.join(self.src, "app", "Main.kt"), "fun main() {}")
+        os.makedirs(os.path.join(self.src, "empty"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_storage_mode_from_manifest_and_env(self):
+        self.assertEqual(archive.storage_mode(self.src), archive.STORAGE_ARCHIVE)
+        other = os.path.join(self.test_dir, "plain")
+        os.makedirs(other)
+        self.assertEqual(archive.storage_mode(other), archive.STORAGE_FOLDER)
+        with patch.dict(os.environ, {"CLOUD_STORAGE_MODE": "archive"}):
+            self.assertEqual(archive.storage_mode(other), archive.STORAGE_ARCHIVE)
+
+    def test_zip_round_trip_with_index(self):
+        os.makedirs(os.path.join(self.drive, "proj"))  # stale folder-mode copy
+        info = archive.pack_project(self.src, self.drive, "proj", fmt=archive.FORMAT_ZIP)
+        self.assertEqual(info["files"], 7)
+        self.assertFalse(os.path.exists(os.path.join(self.drive, "proj")))
+        self.assertEqual(archive.list_archived(self.drive), ["proj"])
+
+        # Manifest readers see omni.json without unpacking.
+        self.assertEqual(archive.archive_info(self.drive, "proj")["manifest"]["software"], ["Git.Git"])
+        with open(archive.cloud_manifest_path(self.drive, "proj")) as f:
+            self.assertEqual(json.load(f)["storage"], "archive")
+
+        count = archive.unpack_project(self.drive, "proj", self.dst)
+        self.assertEqual(count, 7)
+        with open(os.path.join(self.dst, "app", "Main.kt")) as f:
+            self.assertEqual(f.read(), "fun main() {}")
+        self.assertTrue(os.path.isdir(os.path.join(self.dst, "empty")))
+
+    @unittest.skipIf(os.name == "nt", "POSIX permission bits")
+    def test_zip_keeps_mode_and_exact_mtime(self):
+        gradlew = os.path.join(self.src, "gradlew")
+        _write(gradlew, "#!/bin/sh\n")
+        os.chmod(gradlew, 0o755)
+        os.utime(gradlew, ns=(1_700_000_001_234_567_800, 1_700_000_001_234_567_800))
+        archive.pack_project(self.src, self.drive, "proj", fmt=archive.FORMAT_ZIP)
+        archive.unpack_project(self.drive, "proj", self.dst)
+
+        restored = os.stat(os.path.join(self.dst, "gradlew"))
+        self.assertEqual(restored.st_mode & 0o777, 0o755)
+        self.assertEqual(restored.st_mtime_ns, 1_700_000_001_234_567_800)
+        self.assertEqual(os.stat(os.path.join(self.dst, "app", "Main.kt")).st_mode & 0o777,
+                         os.stat(os.path.join(self.src, "app", "Main.kt")).st_mode & 0o777)
+
+    def test_unpack_skips_traversal_members(self):
+        archive.pack_project(self.src, self.drive, "proj", fmt=archive.FORMAT_ZIP)
+        path = os.path.join(self.drive, "proj" + archive.ARCHIVE_EXTENSIONS[archive.FORMAT_ZIP])
+        with zipfile.ZipFile(path, "a") as zf:
+            zf.writestr("../escape.txt", "nope")
+        messages = []
+        archive.unpack_project(self.drive, "proj", self.dst, log=messages.append)
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.dst), "escape.txt")))
+        self.assertTrue(any("unsafe" in m for m in messages))
+
+    def test_remove_archive(self):
+        archive.pack_project(self.src, self.drive, "proj", fmt=archive.FORMAT_ZIP)
+        archive.remove_archive(self.drive, "proj")
+        self.assertIsNone(archive.archive_info(self.drive, "proj"))
+
+    @unittest.skipUnless(archive._zstd_available(), "zstandard not installed")
+    def test_tar_zst_round_trip(self):
+        archive.pack_project(self.src, self.drive, "proj", fmt=archive.FORMAT_TAR_ZST)
+        self.assertEqual(archive.unpack_project(self.drive, "proj", self.dst), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
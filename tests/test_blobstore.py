@@ -0,0 +1,102 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import blobstore
+
+
+def _write(path, data="content"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.drive = os.path.join(self.test_dir, "drive")
+        self.fork_a = os.path.join(self.test_dir, "workspace", "fork_a")
+        self.fork_b = os.path.join(self.test_dir, "workspace", "fork_b")
+        for fork in (self.fork_a, self.fork_b):
+            _write(os.path.join(fork, "gradle", "wrapper", "gradle-wrapper.jar"), "jar" * 1000)
+            _write(os.path.join(fork, "omni.json"), json.dumps({"storage": "blobs"}))
+            os.makedirs(os.path.join(fork, "empty"))
+        _write(os.path.join(self.fork_b, "src", "Only.kt"), "only in b")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _blob_count(self):
+        root = os.path.join(self.drive, blobstore.CLOUD_META_DIRNAME, blobstore.BLOBS_DIRNAME)
+        return sum(len(files) for _r, _d, files in os.walk(root))
+
+    def test_shared_files_stored_once(self):
+        first = blobstore.store_project(self.fork_a, self.drive, "fork_a")
+        second = blobstore.store_project(self.fork_b, self.drive, "fork_b")
+        self.assertEqual(first["uploaded_bytes"], first["bytes"])
+        # Only the file unique to fork_b is uploaded.
+        self.assertEqual(second["uploaded_bytes"], len("only in b"))
+        self.assertEqual(self._blob_count(), 3)
+        self.assertEqual(sorted(blobstore.list_stored(self.drive)), ["fork_a", "fork_b"])
+
+    def test_materialize_round_trip(self):
+        blobstore.store_project(self.fork_b, self.drive, "fork_b")
+        dst = os.path.join(self.test_dir, "restored")
+        stats = blobstore.materialize(self.drive, "fork_b", dst)
+        self.assertTrue(stats.ok)
+        self.assertEqual(stats.files_copied, 3)
+        with open(os.path.join(dst, "src", "Only.kt")) as f:
+            self.assertEqual(f.read(), "only in b")
+        self.assertTrue(os.path.isdir(os.path.join(dst, "empty")))
+
+    def test_hardlinks_when_enabled(self):
+        blobstore.store_project(self.fork_a, self.drive, "fork_a")
+        dst = os.path.join(self.test_dir, "restored")
+        with patch.dict(os.environ, {"BLOB_HARDLINKS": "1"}):
+            blobstore.materialize(self.drive, "fork_a", dst)
+        self.assertGreater(os.stat(os.path.join(dst, "gradle", "wrapper", "gradle-wrapper.jar")).st_nlink, 1)
+
+    def test_remove_manifest_collects_only_orphans(self):
+        blobstore.store_project(self.fork_a, self.drive, "fork_a")
+        blobstore.store_project(self.fork_b, self.drive, "fork_b")
+        blobstore.remove_manifest(self.drive, "fork_b")
+        self.assertEqual(self._blob_count(), 2)
+        self.assertIsNone(blobstore.manifest_info(self.drive, "fork_b"))
+        self.assertIsNotNone(blobstore.manifest_info(self.drive, "fork_a"))
+
+    def test_gc_waits_for_store_lock(self):
+        blobstore.store_project(self.fork_a, self.drive, "fork_a")
+        blobstore.store_project(self.fork_b, self.drive, "fork_b")
+        lock_file = os.path.join(self.drive, blobstore.CLOUD_META_DIRNAME, blobstore.STORE_LOCK_FILENAME)
+        with blobstore.store_lock(self.drive):
+            self.assertTrue(os.path.exists(lock_file))
+            gc = threading.Thread(target=blobstore.remove_manifest, args=(self.drive, "fork_b"))
+            gc.start()
+            gc.join(0.3)
+            # Still blocked: a store holding the lock may rely on fork_b's blobs.
+            self.assertTrue(gc.is_alive())
+            self.assertIsNotNone(blobstore.manifest_info(self.drive, "fork_b"))
+        gc.join(5)
+        self.assertIsNone(blobstore.manifest_info(self.drive, "fork_b"))
+        self.assertFalse(os.path.exists(lock_file))
+
+    def test_stale_lock_file_is_taken_over(self):
+        lock_file = os.path.join(self.drive, blobstore.CLOUD_META_DIRNAME, blobstore.STORE_LOCK_FILENAME)
+        _write(lock_file, "{}")
+        old = os.path.getmtime(lock_file) - blobstore.LOCK_STALE_SECONDS - 1
+        os.utime(lock_file, (old, old))
+        blobstore.store_project(self.fork_a, self.drive, "fork_a")
+        self.assertIsNotNone(blobstore.manifest_info(self.drive, "fork_a"))
+        self.assertFalse(os.path.exists(lock_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import gitpack
+import transfer
+
+
+def _loose_objects(project):
+    objects = os.path.join(project, ".git", "objects")
+    return [d for d in os.listdir(objects) if len(d) == 2]
+
+
+@unittest.skipUnless(gitpack._git_available(), "gitpython or git not installed")
+class TestGitTransfer(unittest.TestCase):
+    def setUp(self):
+        import git
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "workspace", "proj")
+        self.dst = os.path.join(self.test_dir, "cloud", "proj")
+        repo = git.Repo.init(self.src)
+        with repo.config_writer() as cw:
+            cw.set_value("user", "name", "Test")
+            cw.set_value("user", "email", "test@example.com")
+        for i in range(5):
+            with open(os.path.join(self.src, f"f{i}.txt"), "w") as f:
+                f.write(f"version {i}")
+            repo.git.add(f"f{i}.txt")
+            repo.git.commit("-q", "-m", f"commit {i}")
+        with open(os.path.join(self.src, "staged.txt"), "w") as f:
+            f.write("staged only")
+        repo.git.add("staged.txt")
+        repo.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_mode_from_manifest_and_env(self):
+        self.assertEqual(gitpack.git_transfer_mode(self.src), gitpack.GIT_OFF)
+        with patch.dict(os.environ, {"GIT_TRANSFER": "bundle"}):
+            self.assertEqual(gitpack.git_transfer_mode(self.src), gitpack.GIT_BUNDLE)
+
+    def test_repack_packs_loose_objects(self):
+        self.assertTrue(_loose_objects(self.src))
+        with patch.dict(os.environ, {"GIT_TRANSFER": "repack"}):
+            rules = gitpack.prepare(self.src, transfer.IgnoreRules([]))
+        self.assertFalse(rules)
+        self.assertEqual(_loose_objects(self.src), [])
+
+    def test_bundle_round_trip(self):
+        import git
+        with patch.dict(os.environ, {"GIT_TRANSFER": "bundle"}):
+            rules = gitpack.prepare(self.src, transfer.IgnoreRules([]))
+        stats = transfer.sync_tree(self.src, self.dst, rules=rules)
+        self.assertTrue(stats.ok)
+        self.assertEqual(len(stats.excluded), 1)
+        self.assertEqual(gitpack.user_excluded(stats.excluded), [])
+        self.assertFalse(os.path.exists(os.path.join(self.dst, ".git", "objects")))
+        self.assertTrue(os.path.exists(gitpack.bundle_path(self.dst)))
+
+        self.assertTrue(gitpack.restore(self.dst))
+        self.assertFalse(os.path.exists(gitpack.bundle_path(self.dst)))
+        cmd = git.Git(self.dst)
+        self.assertEqual(cmd.rev_list("--count", "HEAD"), "5")
+        # Staged-only content survives too.
+        self.assertEqual(cmd.diff("--cached", "--name-only"), "staged.txt")
+
+
+if __name__ == '__main__':
+    unittest.main()
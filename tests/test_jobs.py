@@ -0,0 +1,165 @@
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import threading
+import time
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import jobs
+import transfer
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.test_dir, "config", "jobs.json")
+        self.gate = threading.Event()
+        self.order = []
+
+    def tearDown(self):
+        self.gate.set()
+        shutil.rmtree(self.test_dir)
+
+    def _scheduler(self, **kwargs):
+        scheduler = jobs.JobScheduler(state_path=self.state_path, **kwargs)
+
+        def blocking(job):
+            self.gate.wait(5)
+            self.order.append(job.name)
+            return {"status": "ok"}
+
+        def quick(job):
+            self.order.append(job.name)
+            return {"status": "ok", "message": "done"}
+
+        scheduler.register("block", blocking)
+        scheduler.register("copy", quick)
+        return scheduler
+
+    def test_user_jobs_run_before_bulk(self):
+        scheduler = self._scheduler(max_workers=1)
+        blocker = scheduler.submit("block", "first")
+        bulk = scheduler.submit("copy", "bulk", priority=jobs.PRIORITY_BULK)
+        user = scheduler.submit("copy", "user", priority=jobs.PRIORITY_USER)
+        self.gate.set()
+        for job in (blocker, bulk, user):
+            self.assertTrue(job.wait(5))
+        self.assertEqual(self.order, ["first", "user", "bulk"])
+        self.assertEqual(user.state, jobs.STATE_DONE)
+
+    def test_disk_limit_serialises_same_disk(self):
+        scheduler = self._scheduler(max_workers=4, disk_limit=1)
+        a = scheduler.submit("block", "a", paths=[self.test_dir])
+        b = scheduler.submit("copy", "b", paths=[self.test_dir])
+        time.sleep(0.2)
+        self.assertEqual(b.state, jobs.STATE_QUEUED)
+        self.gate.set()
+        self.assertTrue(b.wait(5))
+        self.assertEqual(self.order, ["a", "b"])
+
+    def test_cancel_queued_job_and_dedupe(self):
+        scheduler = self._scheduler(max_workers=1)
+        first = scheduler.submit("block", "first")
+        queued = scheduler.submit("copy", "proj")
+        self.assertIs(scheduler.submit("copy", "proj"), queued)
+        self.assertTrue(scheduler.cancel(queued.id))
+        self.assertEqual(queued.state, jobs.STATE_CANCELLED)
+        self.gate.set()
+        self.assertTrue(first.wait(5))
+        self.assertNotIn("proj", self.order)
+
+    def test_failed_result_and_progress_events(self):
+        scheduler = jobs.JobScheduler(max_workers=1)
+        events = []
+        scheduler.subscribe(events.append)
+
+        def failing(job):
+            job.update(phase="copy", files_done=1)
+            return {"status": "error", "message": "Backup not found"}
+
+        scheduler.register("activate", failing)
+        job = scheduler.submit("activate", "proj")
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.state, jobs.STATE_FAILED)
+        self.assertEqual(job.message, "Backup not found")
+        self.assertIn("copy", [e["progress"].get("phase") for e in events])
+
+    def test_pending_jobs_restored(self):
+        first = self._scheduler(max_workers=1)
+        originals = [
+            first.submit("block", "running"),
+            first.submit("copy", "waiting", priority=jobs.PRIORITY_BULK),
+        ]
+
+        second = self._scheduler(max_workers=1)
+        restored = second.restore()
+        self.assertEqual(sorted(j.name for j in restored), ["running", "waiting"])
+        self.gate.set()
+        for job in restored + originals:
+            self.assertTrue(job.wait(5))
+
+    def test_run_batch_waits_for_all_and_flags_members(self):
+        scheduler = self._scheduler(max_workers=2)
+        seen = []
+        scheduler.register("note", lambda job: seen.append(job.batched) or {"status": "ok"})
+        finished = scheduler.run_batch([("note", "a"), ("note", "b"), ("copy", "c")])
+        self.assertEqual([j.state for j in finished], [jobs.STATE_DONE] * 3)
+        self.assertEqual(seen, [True, True])
+
+    def test_restored_batch_member_runs_standalone(self):
+        first = self._scheduler(max_workers=1)
+        blocker = first.submit("block", "running")
+        member = first.submit("copy", "member", args={jobs.BATCH_ARG: True})
+        restored = self._scheduler(max_workers=1).restore()
+        self.assertEqual([j.batched for j in restored if j.name == "member"], [False])
+        self.gate.set()
+        for job in restored + [blocker, member]:
+            self.assertTrue(job.wait(5))
+
+    def test_bulk_jobs_run_in_background_io_context(self):
+        seen = {}
+        scheduler = jobs.JobScheduler(state_path=self.state_path)
+
+        def probe(job):
+            seen[job.name] = (threading.current_thread().name, transfer.current_throttle())
+            if job.name == "broken":
+                raise RuntimeError("disk gone")
+            return {"status": "ok"}
+
+        scheduler.register("probe", probe)
+        with patch.dict(os.environ, {"JOB_BULK_MAX_MBPS": "5"}):
+            submitted = [
+                scheduler.submit("probe", "user"),
+                scheduler.submit("probe", "bulk", priority=jobs.PRIORITY_BULK),
+                scheduler.submit("probe", "broken", priority=jobs.PRIORITY_BULK),
+            ]
+            for job in submitted:
+                self.assertTrue(job.wait(5))
+        self.assertIsNone(seen["user"][1])
+        self.assertTrue(seen["bulk"][0].startswith("omni-bulk-"))
+        self.assertEqual(seen["bulk"][1].rate, 5 * 1024 * 1024)
+        self.assertEqual(submitted[2].state, jobs.STATE_FAILED)
+        self.assertEqual(submitted[2].message, "disk gone")
+
+    def test_progress_reports_throughput_and_eta(self):
+        job = jobs.Job("activate", "proj")
+        job.state = jobs.STATE_RUNNING
+        job.update(phase="copy")
+        job._phase_started -= 10
+        job.update(files_done=25, files_total=100, bytes_done=1000, bytes_total=5000)
+        progress = job.to_dict()["progress"]
+        self.assertEqual(progress["phase"], "copy")
+        self.assertAlmostEqual(progress["throughput_bps"], 100, delta=1)
+        self.assertAlmostEqual(progress["eta_seconds"], 40, delta=1)
+        # A new phase restarts the counters.
+        job.update(phase="delete")
+        self.assertNotIn("files_done", job.to_dict()["progress"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import projectstats
+import statestore
+
+
+def _write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+
+
+class TestScanProject(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.project = os.path.join(self.test_dir, "alpha")
+        _write(os.path.join(self.project, "omni.json"), 10)
+        _write(os.path.join(self.project, "Assets", "a.bin"), 300)
+        _write(os.path.join(self.project, "Assets", "Textures", "t.png"), 500)
+        _write(os.path.join(self.project, "Source", "main.cpp"), 40)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_summary_totals_and_largest_folders(self):
+        dirs, listed = projectstats.scan_project(self.project)
+        self.assertEqual(listed, 4)
+        stats = projectstats.summarize(dirs)
+        self.assertEqual(stats["bytes"], 850)
+        self.assertEqual(stats["files"], 4)
+        self.assertGreater(stats["modified"], 0)
+        self.assertEqual(stats["largest"], [{"path": "Assets", "bytes": 800}, {"path": "Source", "bytes": 40}])
+
+    def test_rescan_lists_only_changed_directories(self):
+        dirs, _ = projectstats.scan_project(self.project)
+        _write(os.path.join(self.project, "Source", "extra.cpp"), 60)
+        dirs, listed = projectstats.scan_project(self.project, dirs)
+        self.assertEqual(listed, 1)
+        self.assertEqual(projectstats.summarize(dirs)["bytes"], 910)
+
+        shutil.rmtree(os.path.join(self.project, "Assets", "Textures"))
+        dirs, listed = projectstats.scan_project(self.project, dirs)
+        self.assertEqual(listed, 1)
+        self.assertNotIn("Assets/Textures", dirs)
+        self.assertEqual(projectstats.summarize(dirs)["bytes"], 410)
+
+
+class TestStatsIndexer(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.test_dir, "workspace")
+        _write(os.path.join(self.workspace, "alpha", "a.bin"), 100)
+        self.store = statestore.StateStore.open(os.path.join(self.test_dir, "config"))
+        self.indexer = projectstats.StatsIndexer(self.store, self.workspace, lambda: ["alpha", "missing"],
+                                                 interval=600)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_recent_scan_is_skipped_unless_kicked(self):
+        self.assertEqual(self.indexer.run_once(), ["alpha"])
+        self.assertEqual(self.store.project_stats()["alpha"]["bytes"], 100)
+
+        _write(os.path.join(self.workspace, "alpha", "b.bin"), 50)
+        self.assertEqual(self.indexer.run_once(), [])
+        self.assertEqual(self.store.project_stats()["alpha"]["bytes"], 100)
+
+        self.indexer.kick("alpha")
+        self.assertEqual(self.indexer.run_once(), ["alpha"])
+        self.assertEqual(self.store.project_stats()["alpha"]["files"], 2)
+        self.assertNotIn("missing", self.store.project_stats())
+
+    def test_kick_picks_up_in_place_edit(self):
+        self.indexer.run_once()
+        path = os.path.join(self.workspace, "alpha", "a.bin")
+        with open(path, "ab") as f:
+            f.write(b"y" * 20)  # leaves the directory mtime unchanged
+        self.indexer.kick("alpha")
+        self.indexer.run_once()
+        self.assertEqual(self.store.project_stats()["alpha"]["bytes"], 120)
+
+    def test_stats_removed_with_project(self):
+        self.indexer.run_once()
+        self.store.remove_project("alpha")
+        self.assertEqual(self.store.project_stats(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from unittest.mock import MagicMock, patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Mock dependencies
+sys.modules["firebase_admin"] = MagicMock()
+sys.modules["firebase_admin.credentials"] = MagicMock()
+sys.modules["firebase_admin.firestore"] = MagicMock()
+sys.modules["starlette.concurrency"] = MagicMock()
+sys.modules["dotenv"] = MagicMock()
+sys.modules["uvicorn"] = MagicMock()
+
+# Mock fastapi
+mock_fastapi = MagicMock()
+sys.modules["fastapi"] = mock_fastapi
+sys.modules["fastapi.responses"] = MagicMock()
+
+
+class MockHTTPException(Exception):
+    def __init__(self, status_code, detail):
+        self.status_code = status_code
+        self.detail = detail
+
+mock_fastapi.HTTPException = MockHTTPException
+mock_fastapi.Request = MagicMock
+mock_fastapi.WebSocket = MagicMock
+mock_fastapi.WebSocketDisconnect = Exception
+mock_fastapi.FastAPI = MagicMock
+
+import remote_agent
+
+
+class TestProjectBatch(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_batch_syncs_once_and_reports_per_item(self):
+        def deactivate(name, job=None):
+            if name == "broken":
+                return {"status": "error", "message": "Project not found locally"}
+            return {"status": "ok", "message": "Deactivated"}
+
+        operations = [
+            {"name": "alpha", "action": "deactivate"},
+            {"name": "broken", "action": "deactivate"},
+            {"name": "beta", "action": "activate"},
+            {"name": "beta", "action": "open"},
+            {"name": "alpha", "action": "activate"},
+            {"name": "gamma", "action": "explode"},
+        ]
+        with patch.object(remote_agent, "DRIVE_ROOT_FOLDER_ID", self.test_dir), \
+             patch.object(remote_agent, "LOCAL_WORKSPACE_ROOT", self.test_dir), \
+             patch.object(remote_agent, "deactivate_project", side_effect=deactivate), \
+             patch.object(remote_agent, "activate_project", return_value={"status": "ok", "message": "Activated"}), \
+             patch.object(remote_agent, "open_studio_project", return_value={"status": "ok", "message": "Studio launched"}), \
+             patch.object(remote_agent, "sync_to_firestore") as mock_sync:
+            results = remote_agent.run_project_batch(operations)
+
+        self.assertEqual(mock_sync.call_count, 1)
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "ok", "ok", "error", "error"])
+        self.assertEqual(results[1]["message"], "Project not found locally")
+        self.assertIn("Duplicate", results[4]["message"])
+        self.assertEqual(results[3]["action"], "open")
+        self.assertTrue(results[0]["job_id"])
+
+    def test_batch_rejects_names_outside_workspace(self):
+        workspace = os.path.join(self.test_dir, "workspace")
+        os.makedirs(os.path.join(workspace, "alpha"))
+        names = ["../outside", "..", ".", "a/b", "a\\b", os.path.join(self.test_dir, "victim"), ""]
+        operations = [{"name": n, "action": "deactivate"} for n in names]
+        operations.append({"name": "..", "action": "open"})
+        with patch.object(remote_agent, "DRIVE_ROOT_FOLDER_ID", self.test_dir), \
+             patch.object(remote_agent, "LOCAL_WORKSPACE_ROOT", workspace), \
+             patch.object(remote_agent, "deactivate_project") as mock_deactivate, \
+             patch.object(remote_agent, "open_studio_project") as mock_open, \
+             patch.object(remote_agent, "sync_to_firestore"):
+            results = remote_agent.run_project_batch(operations)
+            self.assertTrue(remote_agent.is_valid_project_name("alpha"))
+
+        self.assertEqual([r["status"] for r in results], ["error"] * len(operations))
+        mock_deactivate.assert_not_called()
+        mock_open.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import sys
 import os
+import asyncio
 import unittest
 import tempfile
 import shutil
+import threading
 from unittest.mock import MagicMock, patch
 
 # Add src to path
@@ -64,5 +66,97 @@ class TestRegistryOptimization(unittest.TestCase):
                 self.assertEqual(registry["project1"], "Local")
                 self.assertEqual(registry["project2"], "Local")
 
+    def test_compute_registry_pending_activation_not_local(self):
+        """A project with an unfinished activation journal is not reported as Local."""
+        journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, journal_dir)
+        open(os.path.join(journal_dir, "activate-project2.journal"), "w").close()
+        with patch.object(remote_agent, 'TRANSFER_JOURNAL_DIR', journal_dir), \
+             patch.object(remote_agent, 'load_registry', return_value={}), \
+             patch.object(remote_agent, 'save_registry'):
+            registry = remote_agent.compute_registry()
+        self.assertEqual(registry["project1"], "Local")
+        self.assertEqual(registry["project2"], "Cloud")
+
+    def test_watched_registry_served_from_memory(self):
+        """With the watcher running, reads skip the scan until something changes."""
+        config_dir = os.path.join(self.test_dir, ".config")
+        with patch.dict(os.environ, {"REGISTRY_WATCH": "poll", "REGISTRY_POLL_SECONDS": "1"}), \
+             patch.object(remote_agent, 'CONFIG_DIR', config_dir), \
+             patch.object(remote_agent, 'TRANSFER_JOURNAL_DIR', os.path.join(config_dir, "journals")):
+            self.addCleanup(lambda: remote_agent.statestore.StateStore.open(config_dir).close())
+            self.assertEqual(remote_agent.start_registry_watcher(), "poll")
+            self.addCleanup(remote_agent.stop_registry_watcher)
+            with patch('remote_agent.os.scandir') as scandir:
+                registry = remote_agent.compute_registry()
+            scandir.assert_not_called()
+            self.assertEqual(registry["project1"], "Local")
+
+            shutil.rmtree(os.path.join(self.test_dir, "project1"))
+            self.assertEqual(remote_agent.compute_registry(rescan=True)["project1"], "Cloud")
+            self.assertEqual(remote_agent.state_store().status("project1"), "Cloud")
+
+            # A write from the GUI's connection invalidates the in-memory copy.
+            gui = remote_agent.statestore.StateStore(os.path.join(config_dir, "omni_state.db"))
+            self.addCleanup(gui.close)
+            gui.set_status("archived", "Cloud")
+            self.assertEqual(remote_agent.compute_registry()["archived"], "Cloud")
+
+
+class TestProjectFeed(unittest.TestCase):
+    def test_version_moves_only_on_change(self):
+        feed = remote_agent.ProjectFeed()
+        start = feed.update([{"name": "a", "status": "Local"}, {"name": "b", "status": "Cloud"}])
+        self.assertEqual(feed.update([{"name": "a", "status": "Local"}, {"name": "b", "status": "Cloud"}]), start)
+        self.assertIsNone(feed.changes_since(start))
+
+        version = feed.update([{"name": "a", "status": "Cloud"}])
+        self.assertGreater(version, start)
+        delta = feed.changes_since(start)
+        self.assertEqual(delta["version"], version)
+        self.assertEqual(delta["changes"], [{"name": "a", "status": "Cloud"}])
+        self.assertEqual(delta["removed"], ["b"])
+
+    def test_unknown_cursor_gets_full_list(self):
+        feed = remote_agent.ProjectFeed(history=1)
+        start = feed.update([{"name": "a", "status": "Local"}])
+        feed.update([{"name": "a", "status": "Cloud"}])
+        feed.update([{"name": "a", "status": "Local"}])
+        for cursor in (0, start, feed.version + 5):
+            delta = feed.changes_since(cursor)
+            self.assertTrue(delta["reset"])
+            self.assertEqual(delta["projects"], [{"name": "a", "status": "Local"}])
+
+    def test_wait_wakes_on_update_without_a_thread(self):
+        feed = remote_agent.ProjectFeed()
+        start = feed.update([{"name": "a", "status": "Local"}])
+
+        async def scenario():
+            self.assertIsNone(await feed.wait(start, 0.05))
+            waiter = asyncio.ensure_future(feed.wait(start, 5))
+            await asyncio.sleep(0.05)
+            self.assertEqual(feed.waiters, 1)
+            # Published from another thread, as the feed thread does.
+            threading.Thread(target=feed.update, args=([{"name": "a", "status": "Local"}],)).start()
+            await asyncio.sleep(0.1)
+            self.assertFalse(waiter.done())  # an unchanged list does not wake it
+            threading.Thread(target=feed.update, args=([{"name": "a", "status": "Cloud"}],)).start()
+            return await asyncio.wait_for(waiter, 5)
+
+        delta = asyncio.run(scenario())
+        self.assertEqual(delta["changes"], [{"name": "a", "status": "Cloud"}])
+        self.assertEqual(feed.waiters, 0)
+
+    def test_matching_etag_answers_304(self):
+        request = MagicMock()
+        request.headers = {"if-none-match": 'W/"41", "42"'}
+        with patch.object(remote_agent, "Response") as response, \
+             patch.object(remote_agent, "JSONResponse") as json_response:
+            remote_agent._conditional_json(request, {"projects": []}, '"42"')
+            response.assert_called_once_with(status_code=304, headers={"ETag": '"42"'})
+            remote_agent._conditional_json(request, {"projects": []}, '"43"')
+            json_response.assert_called_once_with(content={"projects": []}, headers={"ETag": '"43"'})
+
+
 if __name__ == '__main__':
     unittest.main()
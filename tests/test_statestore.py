@@ -0,0 +1,138 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+import shutil
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import statestore
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.config = os.path.join(self.test_dir, "config")
+        os.makedirs(self.config)
+
+    def tearDown(self):
+        statestore.StateStore.open(self.config).close()
+        shutil.rmtree(self.test_dir)
+
+    def test_imports_legacy_json_once(self):
+        _write_json(os.path.join(self.config, "project_registry.json"), {"alpha": "Local", "beta": "Cloud"})
+        _write_json(os.path.join(self.config, "categories.json"), {"Apps": ["alpha"], "Games": ["beta"]})
+        _write_json(os.path.join(self.config, "target_status.json"),
+                    {"beta": {"/nas": {"state": "ok", "message": "", "updated": "2024-01-01T00:00:00"}}})
+        store = statestore.StateStore.open(self.config)
+        self.assertEqual(store.statuses(), {"alpha": "Local", "beta": "Cloud"})
+        self.assertEqual(store.categories(), {"Apps": ["alpha"], "Games": ["beta"]})
+        self.assertEqual(store.target_statuses()["beta"]["/nas"]["state"], "ok")
+
+        # Later edits to the old files are not re-imported.
+        _write_json(os.path.join(self.config, "project_registry.json"), {"gamma": "Local"})
+        self.assertFalse(store.import_legacy(self.config))
+        self.assertNotIn("gamma", store.statuses())
+
+    def test_save_statuses_writes_only_differences(self):
+        store = statestore.StateStore.open(self.config)
+        self.assertEqual(store.save_statuses({"a": "Local", "b": "Cloud"}), 2)
+        self.assertEqual(store.save_statuses({"a": "Local", "b": "Cloud"}), 0)
+        self.assertEqual(store.save_statuses({"a": "Cloud"}), 2)
+        self.assertEqual(store.statuses(), {"a": "Cloud"})
+
+    def test_set_category_drops_emptied_categories(self):
+        store = statestore.StateStore.open(self.config)
+        store.set_category("alpha", "Apps")
+        store.set_category("beta", "Apps")
+        store.set_category("alpha", "Games")
+        self.assertEqual(store.categories(), {"Apps": ["beta"], "Games": ["alpha"]})
+        store.set_category("beta", "Games")
+        self.assertEqual(store.categories(), {"Games": ["alpha", "beta"]})
+        self.assertEqual(store.category_of("beta"), "Games")
+        self.assertIsNone(store.category_of("missing"))
+
+    def test_manifest_index_follows_file_changes(self):
+        store = statestore.StateStore.open(self.config)
+        path = os.path.join(self.test_dir, "workspace", "alpha", "omni.json")
+        _write_json(path, {"software": ["Git.Git"]})
+        self.assertEqual(store.manifest(path), {"software": ["Git.Git"]})
+        self.assertEqual(store.manifest_paths_using("Git.Git"), {path})
+
+        _write_json(path, {"software": ["Python.Python.3.11", "Git.Git"], "name": "alpha"})
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(store.manifest(path)["name"], "alpha")
+        self.assertEqual(store.manifest_paths_using("Python.Python.3.11"), {path})
+
+        os.remove(path)
+        self.assertIsNone(store.manifest(path))
+        self.assertEqual(store.manifest_paths_using("Git.Git"), set())
+
+    def test_only_finished_jobs_enter_history(self):
+        store = statestore.StateStore.open(self.config)
+        job = {"id": "j1", "kind": "deactivate", "name": "alpha", "state": "running", "message": "",
+               "created": "2024-01-01T00:00:00", "started": "2024-01-01T00:00:01", "finished": None,
+               "progress": {"files_done": 1, "bytes_done": 10}}
+        self.assertFalse(store.record_job(job, "agent"))
+        job.update(state="done", finished="2024-01-01T00:00:05", progress={"files_done": 3, "bytes_done": 30})
+        self.assertTrue(store.record_job(job, "agent"))
+        self.assertTrue(store.record_job(dict(job, id="j2", name="beta", finished="2024-01-01T00:01:00"), "gui"))
+        history = store.transfers()
+        self.assertEqual([h["job_id"] for h in history], ["j2", "j1"])
+        self.assertEqual(store.transfers("alpha")[0]["bytes"], 30)
+
+
+class TestCategoryIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = statestore.StateStore.open(self.test_dir)
+        self.store.set_categories([("alpha", "Apps"), ("beta", "Games")])
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_lookups_do_not_touch_the_database(self):
+        index = statestore.CategoryIndex(self.store)
+        index.refresh()
+        with patch.object(self.store, "categories", side_effect=AssertionError("reloaded")):
+            index.refresh()
+            self.assertEqual([index.category_of(n) for n in ("alpha", "beta", "gamma")], ["Apps", "Games", None])
+
+    def test_moves_are_written_in_one_flush(self):
+        index = statestore.CategoryIndex(self.store)
+        index.refresh()
+        with patch.object(self.store, "set_categories", wraps=self.store.set_categories) as write:
+            index.move("alpha", "Games")
+            index.move("gamma", "Tools")
+            self.assertEqual(index.categories(), {"Games": ["beta", "alpha"], "Tools": ["gamma"]})
+            self.assertEqual(self.store.category_of("alpha"), "Apps")
+            self.assertEqual(index.flush(), 2)
+            self.assertEqual(index.flush(), 0)
+        write.assert_called_once()
+        self.assertEqual(self.store.categories(), index.categories())
+
+    def test_reloads_after_another_process_writes(self):
+        index = statestore.CategoryIndex(self.store)
+        index.refresh()
+        index.move("alpha", "Tools")
+        other = statestore.StateStore(self.store.path)
+        self.addCleanup(other.close)
+        other.set_category("delta", "Games")
+        index.refresh()
+        self.assertEqual(index.category_of("delta"), "Games")
+        # The unflushed local move survives the reload.
+        self.assertEqual(index.category_of("alpha"), "Tools")
+
+
+if __name__ == '__main__':
+    unittest.main()
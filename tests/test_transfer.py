@@ -0,0 +1,723 @@
+import sys
+import os
+import errno
+import gzip
+import hashlib
+import unittest
+import tempfile
+import shutil
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import transfer
+
+
+def _write(path, data="content"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class TestCopyEngine(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "src")
+        self.dst = os.path.join(self.test_dir, "dst")
+        for i in range(20):
+            _write(os.path.join(self.src, "app", "build", f"f{i}.txt"), f"data {i}")
+        _write(os.path.join(self.src, ".git", "objects", "ab", "cdef"), "blob")
+        _write(os.path.join(self.src, "README.md"), "readme")
+        os.makedirs(os.path.join(self.src, "empty"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_copy_tree_parallel(self):
+        """All files and directories (including empty ones) land in the destination."""
+        stats = transfer.copy_tree(self.src, self.dst, workers=4)
+        self.assertTrue(stats.ok)
+        self.assertEqual(stats.files_total, 22)
+        self.assertEqual(stats.files_copied, 22)
+        self.assertTrue(os.path.isdir(os.path.join(self.dst, "empty")))
+        with open(os.path.join(self.dst, "app", "build", "f7.txt")) as f:
+            self.assertEqual(f.read(), "data 7")
+
+    def test_copy_tree_skips_unchanged(self):
+        transfer.copy_tree(self.src, self.dst, workers=2)
+        stats = transfer.copy_tree(self.src, self.dst, workers=2)
+        self.assertEqual(stats.files_skipped, 22)
+        self.assertEqual(stats.files_copied, 0)
+
+    def test_copy_tree_collects_errors(self):
+        """A failing file is reported without aborting the rest of the tree."""
+        real_copy = transfer.fast_copy_file
+
+        def flaky_copy(s, d, on_bytes=None):
+            if s.endswith("README.md"):
+                raise OSError("disk full")
+            return real_copy(s, d, on_bytes)
+
+        messages = []
+        with patch("transfer.fast_copy_file", side_effect=flaky_copy):
+            stats = transfer.copy_tree(self.src, self.dst, workers=4, log=messages.append)
+        self.assertFalse(stats.ok)
+        self.assertEqual(len(stats.errors), 1)
+        self.assertEqual(stats.files_copied, 21)
+        self.assertTrue(any("README.md" in m for m in messages))
+
+    def test_progress_is_counted_in_bytes(self):
+        total = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(self.src) for f in fs)
+        seen = []
+        stats = transfer.copy_tree(self.src, self.dst, workers=4, on_file=lambda s: seen.append(s.bytes_done))
+        self.assertEqual(stats.bytes_total, total)
+        self.assertEqual(stats.bytes_done, total)
+        self.assertEqual(stats.fraction, 1.0)
+        self.assertEqual(max(seen), total)
+        progress = stats.progress()
+        self.assertEqual(progress["bytes_done"], total)
+        self.assertEqual(progress["files_total"], 22)
+        # Skipped files still count towards the bar.
+        again = transfer.copy_tree(self.src, self.dst, workers=2)
+        self.assertEqual(again.bytes_done, total)
+        self.assertEqual(again.bytes_copied, 0)
+
+    def test_large_file_reports_progress_mid_copy(self):
+        big = os.path.join(self.src, "big.bin")
+        with open(big, "wb") as f:
+            f.write(os.urandom(4 * 1024 * 1024))
+        chunks = []
+        with patch.dict(os.environ, {"COPY_METHOD": "copyfile"}), \
+                patch("transfer.PROGRESS_CHUNK", 1024 * 1024), patch("transfer.COPY_CHUNK", 1024 * 1024):
+            transfer.fast_copy_file(big, os.path.join(self.test_dir, "big.bin"), chunks.append)
+        self.assertEqual(chunks, [1024 * 1024] * 4)
+
+    def test_rate_meter_moving_average(self):
+        meter = transfer.RateMeter(window=10.0)
+        meter.add(0, now=0.0)
+        meter.add(100, now=1.0)
+        self.assertAlmostEqual(meter.rate(), 100.0)
+        # Old samples fall out of the window: a stall shows as a zero rate.
+        meter.add(100, now=30.0)
+        meter.add(100, now=31.0)
+        self.assertEqual(meter.rate(), 0.0)
+
+    def test_copy_workers_for_overrides(self):
+        with patch.dict(os.environ, {
+            "COPY_WORKERS": "12",
+            "COPY_WORKERS_OVERRIDES": f"{self.test_dir}=3;{self.dst}=2",
+        }):
+            self.assertEqual(transfer.copy_workers_for(self.dst), 2)
+            self.assertEqual(transfer.copy_workers_for(self.src), 3)
+            self.assertEqual(transfer.copy_workers_for("/elsewhere"), 12)
+
+
+class TestFastCopy(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "asset.bin")
+        with open(self.src, "wb") as f:
+            f.write(os.urandom(256 * 1024))
+        os.utime(self.src, (1_600_000_000, 1_600_000_000))
+        transfer._copy_caps.clear()
+
+    def tearDown(self):
+        transfer._copy_caps.clear()
+        shutil.rmtree(self.test_dir)
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_unsupported_method_falls_back_once_per_volume_pair(self):
+        calls = []
+
+        def no_reflink(s, d):
+            calls.append(s)
+            raise OSError(errno.EOPNOTSUPP, "not supported")
+
+        with patch.dict(transfer._COPIERS, {"reflink": no_reflink}), \
+                patch("transfer._method_available", return_value=True):
+            first = transfer.fast_copy_file(self.src, os.path.join(self.test_dir, "a.bin"))
+            second = transfer.fast_copy_file(self.src, os.path.join(self.test_dir, "b.bin"))
+        self.assertEqual(len(calls), 1)
+        self.assertNotEqual(first, "reflink")
+        self.assertEqual(first, second)
+        self.assertEqual(self._read(os.path.join(self.test_dir, "b.bin")), self._read(self.src))
+        self.assertEqual(int(os.path.getmtime(os.path.join(self.test_dir, "b.bin"))), 1_600_000_000)
+
+    def test_real_errors_are_not_swallowed(self):
+        def disk_full(s, d):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        with patch.dict(os.environ, {"COPY_METHOD": "copy_file_range"}), \
+                patch.dict(transfer._COPIERS, {"copy_file_range": disk_full}), \
+                patch("transfer._method_available", return_value=True):
+            with self.assertRaises(OSError):
+                transfer.fast_copy_file(self.src, os.path.join(self.test_dir, "c.bin"))
+
+    def test_forced_method(self):
+        with patch.dict(os.environ, {"COPY_METHOD": "copyfile"}):
+            method = transfer.fast_copy_file(self.src, os.path.join(self.test_dir, "d.bin"))
+        self.assertEqual(method, "copyfile")
+
+
+class TestDeltaSync(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "src")
+        self.dst = os.path.join(self.test_dir, "cloud", "proj")
+        self.index = transfer.project_index_path(os.path.join(self.test_dir, "cloud"), "proj")
+        for i in range(10):
+            _write(os.path.join(self.src, "lib", f"m{i}.py"), f"print({i})")
+        _write(os.path.join(self.src, "old", "gone.txt"), "bye")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_first_sync_writes_index(self):
+        stats = transfer.sync_tree(self.src, self.dst, index_path=self.index)
+        self.assertEqual(stats.files_copied, 11)
+        index = transfer.load_index(self.index)
+        self.assertIn("lib/m3.py", index["files"])
+        self.assertIn("old", index["dirs"])
+
+    def test_resync_copies_only_changes_and_propagates_deletes(self):
+        transfer.sync_tree(self.src, self.dst, index_path=self.index)
+        path = os.path.join(self.src, "lib", "m1.py")
+        _write(path, "print('edited')")
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 2.0))
+        shutil.rmtree(os.path.join(self.src, "old"))
+
+        with patch("transfer.is_same_file") as mock_same:
+            stats = transfer.sync_tree(self.src, self.dst, index_path=self.index)
+            # The index alone decides; the destination is never stat'ed per file.
+            mock_same.assert_not_called()
+        self.assertEqual(stats.files_copied, 1)
+        self.assertEqual(stats.files_skipped, 9)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "old")))
+        with open(os.path.join(self.dst, "lib", "m1.py")) as f:
+            self.assertEqual(f.read(), "print('edited')")
+
+    def test_touched_file_skipped_when_hash_matches(self):
+        transfer.sync_tree(self.src, self.dst, index_path=self.index, hash_files=True)
+        path = os.path.join(self.src, "lib", "m2.py")
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 5.0))
+        stats = transfer.sync_tree(self.src, self.dst, index_path=self.index, hash_files=True)
+        self.assertEqual(stats.files_copied, 0)
+
+    def test_missing_destination_ignores_stale_index(self):
+        transfer.sync_tree(self.src, self.dst, index_path=self.index)
+        shutil.rmtree(self.dst)
+        stats = transfer.sync_tree(self.src, self.dst, index_path=self.index)
+        self.assertEqual(stats.files_copied, 11)
+
+
+class TestVerifyBeforeDelete(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "src")
+        cloud = os.path.join(self.test_dir, "cloud")
+        self.dst = os.path.join(cloud, "proj")
+        self.index = transfer.project_index_path(cloud, "proj")
+        self.checksums = transfer.project_checksum_path(cloud, "proj")
+        for i in range(5):
+            _write(os.path.join(self.src, "lib", f"m{i}.py"), f"print({i})")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _sync(self):
+        return transfer.sync_tree(self.src, self.dst, index_path=self.index, checksum_path=self.checksums)
+
+    def test_copy_hashes_inline_and_verifies(self):
+        with patch("transfer.file_digest", side_effect=AssertionError("second read")):
+            stats = self._sync()
+        self.assertEqual(len(stats.digests), 5)
+        data = transfer.load_checksums(self.checksums)
+        self.assertEqual(data["files"]["lib/m2.py"]["hash"], hashlib.sha256(b"print(2)").hexdigest())
+        self.assertEqual(transfer.verify_copy(self.src, self.dst, self.checksums), [])
+
+    def test_unchanged_files_keep_checksums_on_resync(self):
+        self._sync()
+        _write(os.path.join(self.src, "lib", "m0.py"), "print('new')")
+        with patch("transfer.file_digest", side_effect=AssertionError("second read")):
+            stats = self._sync()
+        self.assertEqual(stats.files_copied, 1)
+        self.assertEqual(len(transfer.load_checksums(self.checksums)["files"]), 5)
+        self.assertEqual(transfer.verify_copy(self.src, self.dst, self.checksums), [])
+
+    def test_failed_or_truncated_copy_is_not_confirmed(self):
+        real_copy = transfer.copy_file
+
+        def flaky(s, d, *args, **kwargs):
+            if s.endswith("m3.py"):
+                raise OSError("drive went away")
+            return real_copy(s, d, *args, **kwargs)
+
+        with patch("transfer.copy_file", side_effect=flaky):
+            stats = self._sync()
+        self.assertFalse(stats.ok)
+        problems = dict(transfer.verify_copy(self.src, self.dst, self.checksums))
+        self.assertEqual(list(problems), ["lib/m3.py"])
+
+        self._sync()
+        with open(os.path.join(self.dst, "lib", "m1.py"), "w") as f:
+            f.write("p")
+        self.assertIn("lib/m1.py", dict(transfer.verify_copy(self.src, self.dst, self.checksums)))
+
+    def test_skipped_file_without_checksum_never_reads_the_copy(self):
+        transfer.sync_tree(self.src, self.dst, index_path=self.index)
+        real_digest = transfer.file_digest
+
+        def source_only(path, *args):
+            self.assertTrue(path.startswith(self.src), f"read back {path}")
+            return real_digest(path, *args)
+
+        with patch("transfer.file_digest", side_effect=source_only):
+            stats = self._sync()
+        self.assertEqual(stats.files_copied, 0)
+        self.assertEqual(transfer.verify_copy(self.src, self.dst, self.checksums), [])
+
+    def test_verify_without_manifest_refuses(self):
+        self.assertTrue(transfer.verify_copy(self.src, self.dst, self.checksums))
+
+
+class TestThrottle(unittest.TestCase):
+    def test_shared_rate_across_workers(self):
+        throttle = transfer.Throttle(2000)
+        start = time.monotonic()
+        workers = [threading.Thread(target=throttle.consume, args=(200,)) for _ in range(3)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.28)
+
+    def test_copies_in_background_context_are_throttled(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            _write(os.path.join(test_dir, "src", "a.bin"), "x" * 3000)
+            with patch.dict(os.environ, {"JOB_BULK_PRIORITY": "normal"}), \
+                    patch("transfer.bulk_throttle", return_value=transfer.Throttle(10000)):
+                start = time.monotonic()
+                with transfer.background_io():
+                    transfer.copy_tree(os.path.join(test_dir, "src"), os.path.join(test_dir, "dst"))
+            self.assertGreaterEqual(time.monotonic() - start, 0.25)
+            self.assertIsNone(transfer.current_throttle())
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+
+class TestCompressedTransfer(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "src")
+        self.dst = os.path.join(self.test_dir, "dst")
+        self.back = os.path.join(self.test_dir, "back")
+        self.index = os.path.join(self.test_dir, "index.json")
+        self.checksums = os.path.join(self.test_dir, "checksums.json")
+        _write(os.path.join(self.src, "app", "Main.kt"), "fun main() {}\n" * 500)
+        _write(os.path.join(self.src, "omni.json"), '{"name": "proj"}' + " " * 2000)
+        _write(os.path.join(self.src, "icon.png"), "p" * 4096)
+        _write(os.path.join(self.src, "tiny.txt"), "x")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _sync(self, compress=True):
+        return transfer.sync_tree(self.src, self.dst, index_path=self.index,
+                                  checksum_path=self.checksums, compress=compress)
+
+    def test_round_trip(self):
+        stats = self._sync()
+        self.assertTrue(stats.ok)
+        self.assertEqual(len(stats.compressed), 1)
+        self.assertGreater(stats.bytes_saved, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "app", "Main.kt" + transfer.COMPRESSED_SUFFIX)))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "app", "Main.kt")))
+        for plain in ("omni.json", "icon.png", "tiny.txt"):
+            self.assertTrue(os.path.exists(os.path.join(self.dst, plain)))
+        self.assertEqual(transfer.verify_copy(self.src, self.dst, self.checksums), [])
+        self.assertTrue(transfer.has_compressed(self.index))
+
+        restored = transfer.copy_tree(self.dst, self.back)
+        self.assertTrue(restored.ok)
+        self.assertEqual(transfer.scan_tree(self.back)[1].keys(), transfer.scan_tree(self.src)[1].keys())
+        with open(os.path.join(self.back, "app", "Main.kt")) as f:
+            self.assertEqual(f.read(), "fun main() {}\n" * 500)
+
+    def test_verify_checks_compressed_size_trailer(self):
+        self._sync()
+        stored = os.path.join(self.dst, "app", "Main.kt" + transfer.COMPRESSED_SUFFIX)
+        with gzip.open(stored, "wb") as f:
+            f.write(b"fun main() {}\n" * 499)
+        self.assertIn("app/Main.kt", dict(transfer.verify_copy(self.src, self.dst, self.checksums)))
+
+    def test_switching_off_replaces_compressed_copy(self):
+        self._sync()
+        stored = os.path.join(self.dst, "app", "Main.kt")
+        _write(os.path.join(self.src, "app", "Main.kt"), "changed\n" * 500)
+        stats = self._sync(compress=False)
+        self.assertEqual(stats.files_copied, 1)
+        self.assertTrue(os.path.exists(stored))
+        self.assertFalse(os.path.exists(stored + transfer.COMPRESSED_SUFFIX))
+        self.assertFalse(transfer.has_compressed(self.index))
+
+    def test_deleted_file_removes_compressed_copy(self):
+        self._sync()
+        os.remove(os.path.join(self.src, "app", "Main.kt"))
+        self._sync()
+        self.assertEqual(os.listdir(os.path.join(self.dst, "app")), [])
+
+
+class TestFanOutSync(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "src")
+        _write(os.path.join(self.src, "app", "Main.kt"), "fun main() {}\n" * 200)
+        _write(os.path.join(self.src, "omni.json"), '{"name": "proj"}')
+        _write(os.path.join(self.src, "res", "icon.png"), "p" * 4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _target(self, root):
+        return transfer.SyncTarget(os.path.join(self.test_dir, root, "proj"),
+                                   os.path.join(self.test_dir, root, "index.json"),
+                                   os.path.join(self.test_dir, root, "checksums.json"), root=root)
+
+    def test_each_file_read_once_for_all_targets(self):
+        targets = [self._target("drive"), self._target("nas")]
+        with patch("transfer._tee_file", wraps=transfer._tee_file) as tee:
+            transfer.sync_targets(self.src, targets)
+        self.assertEqual(tee.call_count, 3)
+        for target in targets:
+            self.assertEqual(target.stats.errors, [])
+            self.assertEqual(transfer.verify_copy(self.src, target.dst, target.checksum_path), [])
+
+    def test_failing_target_does_not_affect_others(self):
+        good, bad = self._target("drive"), self._target("nas")
+        # A file where a directory must go: every write under app/ fails on this target.
+        _write(os.path.join(bad.dst, "app"), "not a dir")
+        transfer.sync_targets(self.src, [good, bad])
+        self.assertEqual(good.stats.errors, [])
+        self.assertEqual(transfer.verify_copy(self.src, good.dst, good.checksum_path), [])
+        self.assertTrue(bad.stats.errors)
+        statuses = transfer.settle_mirrors(self.src, [good, bad], None, [])
+        self.assertEqual(statuses["drive"]["state"], "ok")
+        self.assertEqual(statuses["nas"]["state"], "failed")
+
+    def test_resumed_fan_out_reuses_journaled_digests(self):
+        journal_dir = os.path.join(self.test_dir, "journals")
+        targets = [self._target("drive"), self._target("nas")]
+        journal = transfer.TransferJournal.open(journal_dir, "deactivate", "proj", self.src, targets[0].dst)
+        transfer.sync_targets(self.src, targets, journal=journal)
+        journal.close()
+        # As if the run died before writing its index and checksums.
+        for target in targets:
+            os.remove(target.checksum_path)
+            os.remove(target.index_path)
+
+        targets = [self._target("drive"), self._target("nas")]
+        journal = transfer.TransferJournal.open(journal_dir, "deactivate", "proj", self.src, targets[0].dst)
+        self.assertTrue(journal.resumed)
+        with patch("transfer.file_digest", side_effect=AssertionError("hashed again")):
+            transfer.sync_targets(self.src, targets, journal=journal)
+        journal.close()
+        for target in targets:
+            self.assertEqual(transfer.verify_copy(self.src, target.dst, target.checksum_path), [])
+
+    def test_teed_large_file_resumes_from_journaled_offset(self):
+        big = os.path.join(self.src, "big.bin")
+        with open(big, "wb") as f:
+            f.write(os.urandom(2 * 1024 * 1024))
+        outputs = [(os.path.join(self.test_dir, root, "big.bin"), ThreadPoolExecutor(1)) for root in ("drive", "nas")]
+        for dst_path, pool in outputs:
+            os.makedirs(os.path.dirname(dst_path))
+            self.addCleanup(pool.shutdown)
+        journal = transfer.TransferJournal.open(os.path.join(self.test_dir, "journals"), "deactivate", "proj",
+                                                self.src, self.test_dir)
+        self.addCleanup(journal.close)
+        chunk = 256 * 1024
+        seen = []
+
+        def interrupt(n):
+            seen.append(n)
+            if len(seen) == 3:
+                raise OSError("cancelled")
+
+        with patch.dict(os.environ, {"TRANSFER_CHUNKED_MIN_MB": "1"}), patch("transfer.COPY_CHUNK", chunk):
+            errors, _ = transfer._tee_file(big, outputs, False, on_bytes=interrupt, journal=journal)
+            self.assertTrue(all(errors))
+            self.assertEqual(journal.offset(outputs[1][0]), 3 * chunk)
+
+            read = []
+            hasher = hashlib.sha256()
+            errors, _ = transfer._tee_file(big, outputs, False, hasher, on_bytes=read.append, journal=journal)
+        self.assertEqual(errors, [None, None])
+        self.assertEqual(read[0], 3 * chunk)  # the resumed prefix, reported at once
+        with open(big, "rb") as f:
+            data = f.read()
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(data).hexdigest())
+        for dst_path, _pool in outputs:
+            with open(dst_path, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_unreachable_mirror_reported_offline(self):
+        online = os.path.join(self.test_dir, "nas")
+        offline = os.path.join(self.test_dir, "unmounted")
+        os.makedirs(online)
+        with patch.dict(os.environ, {"BACKUP_MIRRORS": f"{online}=2;{offline}"}):
+            targets, statuses = transfer.mirror_targets("proj")
+        self.assertEqual([t.dst for t in targets], [os.path.join(online, "proj")])
+        self.assertEqual(targets[0].workers, 2)
+        self.assertEqual(statuses[offline]["state"], "offline")
+        self.assertFalse(os.path.exists(offline))
+
+
+class TestSameVolumeRename(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "workspace", "proj")
+        self.dst = os.path.join(self.test_dir, "cloud", "proj")
+        _write(os.path.join(self.src, "a", "b.txt"), "data")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_rename_tree_same_volume(self):
+        self.assertTrue(transfer.same_volume(self.src, self.dst))
+        with patch("transfer.fast_copy_file") as mock_copy:
+            self.assertTrue(transfer.rename_tree(self.src, self.dst))
+            mock_copy.assert_not_called()
+        self.assertFalse(os.path.exists(self.src))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "a", "b.txt")))
+
+    def test_rename_tree_refuses_existing_destination(self):
+        os.makedirs(self.dst)
+        self.assertFalse(transfer.rename_tree(self.src, self.dst))
+        self.assertTrue(os.path.exists(self.src))
+
+    def test_rename_tree_falls_back_across_devices(self):
+        with patch("transfer.same_volume", return_value=False):
+            self.assertFalse(transfer.rename_tree(self.src, self.dst))
+        self.assertTrue(os.path.exists(self.src))
+
+    def test_rename_tree_disabled(self):
+        with patch.dict(os.environ, {"SAME_VOLUME_RENAME": "0"}):
+            self.assertFalse(transfer.rename_tree(self.src, self.dst))
+
+
+class TestIgnoreRules(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "proj")
+        self.dst = os.path.join(self.test_dir, "cloud", "proj")
+        _write(os.path.join(self.src, "app", "src", "Main.kt"), "fun main() {}")
+        _write(os.path.join(self.src, "app", "build", "out.apk"), "apk")
+        _write(os.path.join(self.src, ".gradle", "cache.bin"), "cache")
+        _write(os.path.join(self.src, "docs", "build", "keep.md"), "keep")
+        _write(os.path.join(self.src, "logs", "run.log"), "log")
+        _write(os.path.join(self.src, transfer.IGNORE_FILENAME), "*.log\n!docs/build/\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_match_semantics(self):
+        rules = transfer.IgnoreRules(["build/", "/local.properties", "gen/**/*.java", "*.tmp", "!keep.tmp"])
+        self.assertTrue(rules.match("app/build", True))
+        self.assertFalse(rules.match("app/build", False))
+        self.assertTrue(rules.match("local.properties", False))
+        self.assertFalse(rules.match("app/local.properties", False))
+        self.assertTrue(rules.match("gen/a/b/C.java", False))
+        self.assertTrue(rules.match("x/y.tmp", False))
+        self.assertFalse(rules.match("x/keep.tmp", False))
+
+    def test_sync_skips_and_records_excluded(self):
+        rules = transfer.IgnoreRules.for_project(self.src)
+        stats = transfer.sync_tree(self.src, self.dst, rules=rules)
+        transfer.record_excluded(self.dst, stats.excluded)
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "app", "src", "Main.kt")))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "docs", "build", "keep.md")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "app", "build")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, ".gradle")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "logs", "run.log")))
+        self.assertEqual(transfer.read_excluded(self.dst), [".gradle/", "app/build/", "logs/run.log"])
+
+    def test_global_file_replaces_defaults(self):
+        global_file = os.path.join(self.test_dir, "omniignore")
+        _write(global_file, "# only caches\n.gradle/\n")
+        rules = transfer.IgnoreRules.for_project(self.src, global_file)
+        self.assertFalse(rules.match("app/build", True))
+        self.assertTrue(rules.match(".gradle", True))
+
+
+class TestTransferJournal(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.journal_dir = os.path.join(self.test_dir, "config", "transfers")
+        self.src = os.path.join(self.test_dir, "cloud", "proj")
+        self.dst = os.path.join(self.test_dir, "workspace", "proj")
+        for i in range(5):
+            _write(os.path.join(self.src, f"f{i}.txt"), f"data {i}")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_resume_skips_completed_files(self):
+        os.makedirs(self.dst)
+        journal = transfer.TransferJournal.open(self.journal_dir, "activate", "proj", self.src, self.dst)
+        shutil.copy2(os.path.join(self.src, "f0.txt"), os.path.join(self.dst, "f0.txt"))
+        journal.mark_done(os.path.join(self.dst, "f0.txt"))
+        journal.close()  # simulated crash: journal left behind
+        self.assertEqual(transfer.pending_journals(self.journal_dir), {"proj": "activate"})
+
+        journal = transfer.TransferJournal.open(self.journal_dir, "activate", "proj", self.src, self.dst)
+        self.assertTrue(journal.resumed)
+        stats = transfer.copy_tree(self.src, self.dst, skip_unchanged=False, journal=journal)
+        journal.complete()
+        self.assertEqual(stats.files_copied, 4)
+        self.assertEqual(stats.files_skipped, 1)
+        self.assertEqual(transfer.pending_journals(self.journal_dir), {})
+
+    def test_mismatched_or_vanished_destination_starts_fresh(self):
+        os.makedirs(self.dst)
+        journal = transfer.TransferJournal.open(self.journal_dir, "activate", "proj", self.src, self.dst)
+        journal.mark_done(os.path.join(self.dst, "f0.txt"))
+        journal.close()
+        shutil.rmtree(self.dst)
+        journal = transfer.TransferJournal.open(self.journal_dir, "activate", "proj", self.src, self.dst)
+        self.assertFalse(journal.resumed)
+        self.assertEqual(journal.done, set())
+        journal.complete()
+
+    def test_chunked_copy_resumes_from_offset(self):
+        big_src = os.path.join(self.test_dir, "big.bin")
+        payload = os.urandom(3 * 1024 * 1024 + 123)
+        with open(big_src, "wb") as f:
+            f.write(payload)
+        os.makedirs(self.dst)
+        big_dst = os.path.join(self.dst, "big.bin")
+        journal = transfer.TransferJournal.open(self.journal_dir, "activate", "proj", self.src, self.dst)
+        # First chunk landed before the crash.
+        with open(big_dst + transfer.PART_SUFFIX, "wb") as f:
+            f.write(payload[:1024 * 1024])
+        journal.record_offset(big_dst, 1024 * 1024)
+        journal.close()
+
+        journal = transfer.TransferJournal.open(self.journal_dir, "activate", "proj", self.src, self.dst)
+        self.assertEqual(journal.offset(big_dst), 1024 * 1024)
+        with patch.dict(os.environ, {"TRANSFER_CHUNKED_MIN_MB": "1"}), patch("transfer.COPY_CHUNK", 1024 * 1024):
+            transfer.copy_file(big_src, big_dst, journal)
+        journal.complete()
+        with open(big_dst, "rb") as f:
+            self.assertEqual(f.read(), payload)
+        self.assertFalse(os.path.exists(big_dst + transfer.PART_SUFFIX))
+
+
+class TestActivationProfile(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.test_dir, "src")
+        self.dst = os.path.join(self.test_dir, "dst")
+        _write(os.path.join(self.src, "omni.json"),
+               '{"activation_profiles": {"source": ["app/src/", "*.gradle"]}}')
+        _write(os.path.join(self.src, "app", "src", "Main.kt"), "fun main() {}")
+        _write(os.path.join(self.src, "build.gradle"), "plugins {}")
+        _write(os.path.join(self.src, "assets", "big.bin"), "x" * 4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_profile_lookup(self):
+        self.assertIsNone(transfer.activation_profile(self.src))
+        self.assertIsNone(transfer.activation_profile(self.src, "missing"))
+        self.assertIsNotNone(transfer.activation_profile(self.src, "source"))
+
+    def test_copy_profile_then_hydrate(self):
+        include = transfer.activation_profile(self.src, "source")
+        stats, total = transfer.copy_profile(self.src, self.dst, include)
+        self.assertTrue(stats.ok)
+        self.assertEqual(stats.files_copied, 3)  # omni.json is always included
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "app", "src", "Main.kt")))
+        self.assertTrue(os.path.isdir(os.path.join(self.dst, "assets")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "assets", "big.bin")))
+        self.assertLess(stats.bytes_total, total)
+
+        rest = transfer.copy_tree(self.src, self.dst)
+        self.assertEqual(rest.files_copied, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "assets", "big.bin")))
+
+    def test_hydrate_keeps_local_edits(self):
+        include = transfer.activation_profile(self.src, "source")
+        transfer.copy_profile(self.src, self.dst, include)
+        edited = os.path.join(self.dst, "app", "src", "Main.kt")
+        _write(edited, "fun main() { println() }")
+        # Older than the cloud copy, so a size/mtime check alone would overwrite it.
+        os.utime(edited, (1, 1))
+
+        rest = transfer.copy_tree(self.src, self.dst, skip_existing=True)
+        self.assertTrue(rest.ok)
+        self.assertEqual(rest.files_copied, 1)
+        with open(edited) as f:
+            self.assertEqual(f.read(), "fun main() { println() }")
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "assets", "big.bin")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "assets", "big.bin" + transfer.NEW_SUFFIX)))
+
+
+class TestTombstoneDeletion(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.test_dir, "workspace")
+        self.project = os.path.join(self.workspace, "proj")
+        for i in range(30):
+            _write(os.path.join(self.project, ".git", "objects", f"{i:02d}", "pack"), f"obj {i}")
+        readonly = os.path.join(self.project, ".git", "objects", "00", "pack")
+        os.chmod(readonly, 0o444)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_remove_tree_later_returns_before_delete(self):
+        with patch("transfer.delete_tree", wraps=transfer.delete_tree) as mock_delete:
+            self.assertTrue(transfer.remove_tree_later(self.project))
+            self.assertFalse(os.path.exists(self.project))
+            transfer.wait_for_deletions()
+            mock_delete.assert_called_once()
+        self.assertEqual(os.listdir(self.workspace), [])
+
+    def test_resume_pending_tombstones(self):
+        target = transfer.tombstone(self.project)
+        self.assertTrue(target.startswith(os.path.join(self.workspace, transfer.TRASH_DIRNAME)))
+        self.assertEqual(transfer.resume_tombstones([self.workspace, None]), 1)
+        transfer.wait_for_deletions()
+        self.assertFalse(os.path.exists(os.path.join(self.workspace, transfer.TRASH_DIRNAME)))
+
+    @unittest.skipUnless(hasattr(os, "symlink") and os.name != "nt", "needs POSIX symlinks")
+    def test_delete_tree_unlinks_directory_symlinks(self):
+        outside = os.path.join(self.test_dir, "outside")
+        _write(os.path.join(outside, "keep.txt"), "keep")
+        os.chmod(outside, 0o555)
+        venv = os.path.join(self.project, ".venv")
+        _write(os.path.join(venv, "lib", "site.py"), "x")
+        os.symlink("lib", os.path.join(venv, "lib64"))
+        os.symlink(outside, os.path.join(venv, "external"))
+
+        target = transfer.tombstone(self.project)
+        self.assertEqual(transfer.delete_tree(target), 0)
+        self.assertFalse(os.path.lexists(target))
+        self.assertTrue(os.path.exists(os.path.join(outside, "keep.txt")))
+        self.assertEqual(stat.S_IMODE(os.stat(outside).st_mode), 0o555)
+        os.chmod(outside, 0o755)
+
+
+if __name__ == '__main__':
+    unittest.main()
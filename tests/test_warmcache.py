@@ -0,0 +1,84 @@
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import transfer
+import warmcache
+
+
+def _write(path, data="content"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class TestWarmCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.test_dir, "workspace")
+        self.cloud = os.path.join(self.test_dir, "cloud")
+        os.makedirs(self.workspace)
+
+    def tearDown(self):
+        transfer.wait_for_deletions()
+        shutil.rmtree(self.test_dir)
+
+    def _project(self, name, size):
+        path = os.path.join(self.workspace, name)
+        _write(os.path.join(path, "data.bin"), "x" * size)
+        return path
+
+    def test_disabled_without_budget(self):
+        with patch.dict(os.environ, {"WARM_CACHE_MB": "0"}):
+            self.assertIsNone(warmcache.WarmCache.for_workspace(self.workspace))
+
+    def test_put_take_and_lru_eviction(self):
+        cache = warmcache.WarmCache(self.workspace, budget=250)
+        for name in ("a", "b", "c"):
+            self.assertTrue(cache.put(name, self._project(name, 100)))
+        # The oldest entry made room for the newest.
+        self.assertEqual(sorted(cache.entries()), ["b", "c"])
+        self.assertFalse(cache.put("huge", self._project("huge", 500)))
+        self.assertTrue(os.path.isdir(os.path.join(self.workspace, "huge")))
+
+        dst = os.path.join(self.workspace, "b")
+        self.assertTrue(cache.take("b", dst))
+        self.assertTrue(os.path.exists(os.path.join(dst, "data.bin")))
+        self.assertEqual(sorted(cache.entries()), ["c"])
+        self.assertFalse(cache.take("a", os.path.join(self.workspace, "a")))
+
+    def test_reactivation_copies_only_the_delta(self):
+        src = os.path.join(self.workspace, "proj")
+        for i in range(5):
+            _write(os.path.join(src, "lib", f"m{i}.py"), f"print({i})")
+        _write(os.path.join(src, "build", "out.o"), "object code")
+        dest = os.path.join(self.cloud, "proj")
+        transfer.sync_tree(src, dest, rules=transfer.IgnoreRules(["build/"]))
+
+        cache = warmcache.WarmCache(self.workspace, budget=1024 * 1024)
+        self.assertTrue(cache.put("proj", src))
+        self.assertFalse(os.path.exists(src))
+        # The cloud copy moves on while the project is cached.
+        _write(os.path.join(dest, "lib", "m0.py"), "print('changed elsewhere')")
+        os.remove(os.path.join(dest, "lib", "m4.py"))
+
+        self.assertTrue(cache.take("proj", src))
+        stats = transfer.copy_tree(dest, src)
+        cloud_dirs, cloud_files = transfer.scan_tree(dest)
+        removed = transfer.prune_extraneous(src, cloud_files, cloud_dirs, transfer.IgnoreRules(["build/"]))
+        self.assertEqual(stats.files_copied, 1)
+        self.assertEqual(removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(src, "lib", "m4.py")))
+        self.assertTrue(os.path.exists(os.path.join(src, "build", "out.o")))
+        with open(os.path.join(src, "lib", "m0.py")) as f:
+            self.assertEqual(f.read(), "print('changed elsewhere')")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import watcher
+
+
+class TestDirectoryWatcher(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.test_dir, "workspace")
+        self.config = os.path.join(self.test_dir, "config")
+        self.changed = threading.Event()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _start(self, mode):
+        w = watcher.DirectoryWatcher(self.changed.set, mode=mode, interval=0.05)
+        w.watch(self.workspace, dirs_only=True)
+        w.watch(self.config, names={"registry.json"})
+        started = w.start()
+        self.addCleanup(w.stop)
+        return started
+
+    def _check_events(self):
+        os.makedirs(os.path.join(self.workspace, "proj"))
+        self.assertTrue(self.changed.wait(5))
+        self.changed.clear()
+        with open(os.path.join(self.config, "registry.json"), "w") as f:
+            f.write("{}")
+        self.assertTrue(self.changed.wait(5))
+
+    def test_poll_reports_new_folder_and_named_file(self):
+        self.assertEqual(self._start(watcher.WATCH_POLL), watcher.WATCH_POLL)
+        self._check_events()
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+    def test_inotify_ignores_unrelated_files(self):
+        if self._start(watcher.WATCH_AUTO) != watcher.WATCH_INOTIFY:
+            self.skipTest("inotify not available")
+        with open(os.path.join(self.workspace, "notes.txt"), "w") as f:
+            f.write("x")
+        with open(os.path.join(self.config, "agent.log"), "w") as f:
+            f.write("x")
+        self.assertFalse(self.changed.wait(0.5))
+        self._check_events()
+
+    def test_off_does_not_start(self):
+        self.assertEqual(self._start(watcher.WATCH_OFF), watcher.WATCH_OFF)
+
+
+if __name__ == '__main__':
+    unittest.main()